@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import zlib
+import sqlite3
+import atexit
+import hashlib
+import logging
+import threading
+from contextlib import contextmanager
+import metrics
+
+logger = logging.getLogger(__name__)
+
+CACHE_ENABLED = os.getenv('CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+CACHE_PATH = os.getenv('CACHE_PATH', os.path.join('cache', 'analysis_cache.sqlite3'))
+CACHE_MAX_MB = float(os.getenv('CACHE_MAX_MB', '512'))
+# Reads are batched: a hit refreshes an entry's last_access only when it is older than
+# ACCESS_RESOLUTION, and access times and hit/miss counters are written at most every FLUSH_INTERVAL
+ACCESS_RESOLUTION = 60  # seconds
+FLUSH_INTERVAL = 5  # seconds
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    namespace TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL,
+    PRIMARY KEY (namespace, key)
+);
+CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+CREATE TABLE IF NOT EXISTS counters (
+    namespace TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+def file_sha256(file_path, chunk_size=1024 * 1024):
+    """Return the hex SHA-256 of a file's contents (or of in-memory bytes)."""
+    if isinstance(file_path, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(file_path).hexdigest()
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def make_key(*parts):
+    """Combine key parts into one hex digest."""
+    return hashlib.sha256('\x1f'.join(str(part) for part in parts).encode('utf-8')).hexdigest()
+
+class DiskCache:
+    """Size-bounded LRU cache of JSON values in a local SQLite file.
+
+    Entries live in named namespaces (e.g. ``extraction`` and ``analysis``)
+    and are stored zlib-compressed. When the stored size exceeds
+    ``CACHE_MAX_MB`` the least recently read entries are evicted. Hit and
+    miss counters are kept in the database so lookups made by worker
+    processes are counted too. Reads do not write on every lookup: access
+    times and counters are batched in memory and written by the next lookup
+    after ``FLUSH_INTERVAL`` seconds, and always before eviction or ``stats``.
+    """
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or CACHE_PATH
+        self.max_bytes = max_bytes if max_bytes is not None else int(CACHE_MAX_MB * 1024 * 1024)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+        self._pending_lock = threading.Lock()
+        self._reset_pending()
+
+    def _reset_pending(self):
+        self._pending_access = {}  # (namespace, key) -> last read time not yet written
+        self._pending_counts = {}  # (namespace, 'hits' or 'misses') -> lookups not yet counted
+        self._last_flush = time.monotonic()
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, namespace, key):
+        """Return the cached value or None, counting the hit or miss."""
+        try:
+            with self._connect() as conn:
+                row = conn.execute('SELECT value, last_access FROM entries WHERE namespace = ? AND key = ?', (namespace, key)).fetchone()
+                now = time.time()
+                with self._pending_lock:
+                    if self._pid != os.getpid():
+                        self._reset_pending()  # a forked child must not write its parent's batch again
+                    if row is not None and now - row[1] > ACCESS_RESOLUTION:
+                        self._pending_access[(namespace, key)] = now
+                    column = 'hits' if row is not None else 'misses'
+                    self._pending_counts[(namespace, column)] = self._pending_counts.get((namespace, column), 0) + 1
+                    due = time.monotonic() - self._last_flush >= FLUSH_INTERVAL
+                if due:
+                    self._flush(conn)
+            metrics.inc(metrics.CACHE_LOOKUPS, namespace=namespace, result='hit' if row is not None else 'miss')
+            if row is None:
+                return None
+            return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+        except Exception as e:
+            logger.error(f"Cache read failed for {namespace}/{key}: {str(e)}", exc_info=True)
+            return None
+
+    def set(self, namespace, key, value):
+        """Store a JSON-serializable value, evicting old entries past the size limit."""
+        try:
+            blob = zlib.compress(json.dumps(value).encode('utf-8'))
+            if len(blob) > self.max_bytes:
+                logger.warning(f"Cache entry {namespace}/{key} larger than the cache, not stored")
+                return
+            with self._connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO entries (namespace, key, value, size, last_access) VALUES (?, ?, ?, ?, ?)',
+                    (namespace, key, blob, len(blob), time.time())
+                )
+                self._flush(conn)
+                self._evict(conn)
+        except Exception as e:
+            logger.error(f"Cache write failed for {namespace}/{key}: {str(e)}", exc_info=True)
+
+    def stats(self):
+        """Return entry counts, sizes and hit/miss counters per namespace."""
+        with self._connect() as conn:
+            self._flush(conn)
+            sizes = conn.execute('SELECT namespace, COUNT(*), SUM(size) FROM entries GROUP BY namespace').fetchall()
+            counters = conn.execute('SELECT namespace, hits, misses FROM counters').fetchall()
+        namespaces = {}
+        for namespace, hits, misses in counters:
+            namespaces[namespace] = {'entries': 0, 'bytes': 0, 'hits': hits, 'misses': misses}
+        for namespace, count, size in sizes:
+            namespaces.setdefault(namespace, {'hits': 0, 'misses': 0}).update({'entries': count, 'bytes': size or 0})
+        return {
+            'namespaces': namespaces,
+            'total_bytes': sum(n['bytes'] for n in namespaces.values()),
+            'max_bytes': self.max_bytes,
+        }
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        with self._pending_lock:
+            self._reset_pending()
+        with self._connect() as conn:
+            conn.execute('DELETE FROM entries')
+            conn.execute('DELETE FROM counters')
+
+    def flush(self):
+        """Write batched access times and hit/miss counters now."""
+        try:
+            with self._connect() as conn:
+                self._flush(conn)
+        except Exception as e:
+            logger.error(f"Cache flush failed: {str(e)}", exc_info=True)
+
+    def _flush(self, conn):
+        with self._pending_lock:
+            if self._pid != os.getpid():
+                self._reset_pending()
+            access, counts = self._pending_access, self._pending_counts
+            self._pending_access, self._pending_counts = {}, {}
+            self._last_flush = time.monotonic()
+        if access:
+            conn.executemany(
+                'UPDATE entries SET last_access = MAX(last_access, ?) WHERE namespace = ? AND key = ?',
+                [(when, namespace, key) for (namespace, key), when in access.items()]
+            )
+        for (namespace, column), count in counts.items():
+            conn.execute('INSERT OR IGNORE INTO counters (namespace) VALUES (?)', (namespace,))
+            conn.execute(f'UPDATE counters SET {column} = {column} + ? WHERE namespace = ?', (count, namespace))
+
+    def _evict(self, conn):
+        total = conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        evicted = 0
+        for namespace, key, size in conn.execute('SELECT namespace, key, size FROM entries ORDER BY last_access').fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute('DELETE FROM entries WHERE namespace = ? AND key = ?', (namespace, key))
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} cache entries to stay under {self.max_bytes} bytes")
+
+_cache = None
+
+def get_cache():
+    """Return this process's cache, or None when caching is disabled."""
+    global _cache
+    if not CACHE_ENABLED:
+        return None
+    if _cache is None:
+        _cache = DiskCache()
+        # Write the last batch of access times and counters on a clean exit
+        atexit.register(_cache.flush)
+    return _cache
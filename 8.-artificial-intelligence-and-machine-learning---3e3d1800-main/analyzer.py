@@ -1,22 +1,27 @@
 import os
-import re
-import logging
+import io
 import time
+import logging
+import importlib
 from collections import Counter
 from dotenv import load_dotenv
-from ibm_watson import NaturalLanguageUnderstandingV1
-from ibm_watson.natural_language_understanding_v1 import Features, KeywordsOptions, EntitiesOptions, SentimentOptions
-from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import pdfplumber
-import fitz  # PyMuPDF
-import docx
-import pytesseract
-from PIL import Image
-import cv2
-import numpy as np
-from transformers import pipeline
-from langdetect import detect, LangDetectException
+import metrics
+from model_registry import registry as model_registry
+from watson_client import get_watson_client
+from stages import Stage, run_stages
+from document import Document, as_document
+from matchers import scan_entities, first_entity, phrase_counts
+from passage_index import get_passage_index
+from sentiment import SENTIMENT_MODE, get_vader, sentence_sentiment, document_sentiment
+from analysis_cache import get_cache, file_sha256, make_key
+from near_duplicates import get_index as get_near_duplicate_index, signature_for
+from language import identify_language, is_mixed
+from pdf_extraction import iter_pdf_pages, source_label
+from ocr import image_dpi, scale_to_target_dpi, recognize_image
+from summarization import (
+    SUMMARY_LONG_DOCUMENTS, SUMMARY_LONG_THRESHOLD, SUMMARY_LANGUAGES,
+    summary_lengths, generate_summaries, summarize_long_texts
+)
 
 # Ensure logs directory exists
 logs_dir = 'logs'
@@ -36,68 +41,152 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
-# Configure pytesseract
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+# Bump when extraction or analysis output changes so cached results are not reused
+ANALYZER_VERSION = '1.8'
+
+# Stop reading long documents early (0 = no limit)
+EXTRACT_MAX_PAGES = int(os.getenv('EXTRACT_MAX_PAGES', '0'))
+EXTRACT_MAX_CHARS = int(os.getenv('EXTRACT_MAX_CHARS', '0'))
+
+# Number of documents per summarizer forward pass
+SUMMARY_BATCH_SIZE = int(os.getenv('SUMMARY_BATCH_SIZE', '4'))
+
+# Passages read by the QA model per question
+QA_TOP_K = int(os.getenv('QA_TOP_K', '3'))
+
+# The summarizer is English-only; other languages get this instead of a summary
+UNSUPPORTED_LANGUAGE_SUMMARY = "No summary: the summarizer does not support this language."
+
+# Summaries that only explain why there is none; analyses with these are neither cached nor offered for reuse
+PLACEHOLDER_SUMMARIES = (
+    "No text provided.", "Text too short to summarize.", "Error generating summary.", UNSUPPORTED_LANGUAGE_SUMMARY
+)
+
+# Dependencies are imported on first use; ``preload`` imports them up front.
+# Group name -> modules
+PRELOAD_GROUPS = {
+    'image': ['cv2', 'numpy', 'PIL.Image', 'pytesseract'],
+    'pdf': ['fitz', 'pdfplumber'],
+    'docx': ['docx'],
+    'language': ['langdetect'],
+    'sentiment': ['vaderSentiment.vaderSentiment'],
+    'watson': ['requests', 'ibm_watson'],
+    'models': ['transformers'],
+}
+# Comma-separated groups for servers to preload at startup, or 'all'
+ANALYZER_PRELOAD = os.getenv('ANALYZER_PRELOAD', '')
 
-# Initialize VADER for sentiment analysis
-vader_analyzer = SentimentIntensityAnalyzer()
+def preload(groups=None):
+    """Import the dependencies of ``groups`` now instead of on first use.
+
+    With no arguments the ``ANALYZER_PRELOAD`` setting is used. The
+    ``sentiment`` group also loads the VADER lexicon; models themselves are
+    loaded by ``model_registry.warmup``. Returns the groups that loaded;
+    missing optional packages are logged and skipped.
+    """
+    if groups is None:
+        setting = ANALYZER_PRELOAD.strip()
+        groups = list(PRELOAD_GROUPS) if setting.lower() == 'all' else [g.strip() for g in setting.split(',') if g.strip()]
+    loaded = []
+    for group in groups:
+        if group not in PRELOAD_GROUPS:
+            logger.warning(f"Unknown preload group {group!r}")
+            continue
+        start = time.perf_counter()
+        try:
+            for module in PRELOAD_GROUPS[group]:
+                importlib.import_module(module)
+            if group == 'sentiment':
+                get_vader()
+        except ImportError as e:
+            logger.warning(f"Could not preload {group}: {str(e)}")
+            continue
+        loaded.append(group)
+        logger.info(f"Preloaded {group} in {time.perf_counter() - start:.2f}s")
+    return loaded
+
+def is_buffer(source):
+    """Return True for in-memory document contents rather than a file path."""
+    return isinstance(source, (bytes, bytearray, memoryview))
 
 def preprocess_image(image_path):
-    """Enhance image for better OCR accuracy."""
+    """Enhance image for better OCR accuracy, scaling it to the OCR target DPI.
+
+    ``image_path`` may also be the encoded image bytes.
+    """
+    import cv2
+    import numpy as np
+    from PIL import Image
     try:
-        if not os.path.exists(image_path):
-            raise ValueError(f"Image file not found: {image_path}")
-        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        if is_buffer(image_path):
+            img = cv2.imdecode(np.frombuffer(image_path, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+        else:
+            if not os.path.exists(image_path):
+                raise ValueError(f"Image file not found: {image_path}")
+            img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
         if img is None:
-            raise ValueError(f"Failed to load image: {image_path}")
+            raise ValueError(f"Failed to load image: {source_label(image_path)}")
         img = cv2.GaussianBlur(img, (5, 5), 0)
         _, img = cv2.threshold(img, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-        img = cv2.resize(img, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+        img = scale_to_target_dpi(img, image_dpi(image_path))
         return Image.fromarray(img)
     except Exception as e:
-        logger.error(f"Image preprocessing failed for {image_path}: {str(e)}", exc_info=True)
+        logger.error(f"Image preprocessing failed for {source_label(image_path)}: {str(e)}", exc_info=True)
         raise ValueError(f"Image preprocessing failed: {str(e)}")
 
+def ocr_image(img):
+    """Run OCR on a PIL image; tall pages are split into tiles recognized in parallel."""
+    with metrics.timer(metrics.STAGE_SECONDS, stage='ocr'):
+        return recognize_image(img)
+
 def extract_text(file_path, file_type):
-    """Extract text from various file types (images, PDFs, DOCX, TXT)."""
+    """Extract text from various file types (images, PDFs, DOCX, TXT).
+
+    ``file_path`` may be a path or the file's contents as bytes, so uploads
+    can be extracted without writing them to disk.
+    """
+    start = time.perf_counter()
     try:
-        if not os.path.exists(file_path):
+        if is_buffer(file_path):
+            file_path = bytes(file_path) if isinstance(file_path, memoryview) else file_path
+        elif not os.path.exists(file_path):
             raise ValueError(f"File not found: {file_path}")
 
         if file_type in ['.png', '.jpg', '.jpeg']:
             img = preprocess_image(file_path)
-            text = pytesseract.image_to_string(img, config='--psm 6').strip()
+            text = ocr_image(img)
         elif file_type == '.pdf':
-            # Try pdfplumber first
-            try:
-                with pdfplumber.open(file_path) as pdf:
-                    text = ''.join(page.extract_text() or '' for page in pdf.pages).strip()
-            except Exception:
-                # Fallback to PyMuPDF
-                doc = fitz.open(file_path)
-                text = ''.join(page.get_text() for page in doc).strip()
-                doc.close()
+            pages = iter_pdf_pages(file_path, max_pages=EXTRACT_MAX_PAGES, max_chars=EXTRACT_MAX_CHARS, ocr=ocr_image)
+            text = '\n'.join(page_text for _, page_text in pages if page_text).strip()
+            if EXTRACT_MAX_CHARS:
+                text = text[:EXTRACT_MAX_CHARS]
         elif file_type == '.docx':
-            doc = docx.Document(file_path)
+            import docx
+            doc = docx.Document(io.BytesIO(file_path) if is_buffer(file_path) else file_path)
             text = '\n'.join(para.text for para in doc.paragraphs if para.text).strip()
         elif file_type == '.txt':
-            with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
-                text = f.read().strip()
+            if is_buffer(file_path):
+                text = bytes(file_path).decode('utf-8', errors='ignore').strip()
+            else:
+                with open(file_path, 'r', encoding='utf-8', errors='ignore') as f:
+                    text = f.read().strip()
         else:
             raise ValueError(f"Unsupported file type: {file_type}")
 
-        logger.info(f"Extracted text from {file_path} ({len(text)} characters)")
+        metrics.observe(metrics.EXTRACT_SECONDS, time.perf_counter() - start, file_type=file_type.lstrip('.'))
+        logger.info(f"Extracted text from {source_label(file_path)} ({len(text)} characters)")
         return text or "No text extracted."
     except Exception as e:
-        logger.error(f"Text extraction failed for {file_path}: {str(e)}", exc_info=True)
+        logger.error(f"Text extraction failed for {source_label(file_path)}: {str(e)}", exc_info=True)
+        metrics.inc(metrics.ERRORS, stage='extract')
         return ""
 
 def local_keyword_extraction(text):
-    """Extract keywords using frequency analysis."""
+    """Extract keywords using frequency analysis (``text`` may be a Document)."""
     try:
-        words = re.findall(r'\b\w+\b', text.lower())
+        doc = as_document(text)
         stop_words = {'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'has', 'he', 'in', 'is', 'it', 'its', 'of', 'on', 'that', 'the', 'to', 'was', 'were', 'will', 'with'}
-        word_counts = Counter(word for word in words if word not in stop_words and len(word) > 3)
+        word_counts = Counter({word: count for word, count in doc.term_frequencies() if word not in stop_words and len(word) > 3})
         total_count = sum(word_counts.values())
         keywords = [
             {'text': word, 'relevance': round(count / total_count, 4) if total_count else 0.5}
@@ -110,91 +199,115 @@ def local_keyword_extraction(text):
         return []
 
 def local_entity_extraction(text):
-    """Extract entities using regex patterns."""
+    """Extract entities using regex patterns (``text`` may be a Document)."""
     try:
-        entities = []
-        # Name (e.g., Mohammed Musaib)
-        name_pattern = r'\b[A-Z][a-z]+ [A-Z][a-z]+\b'
-        for match in re.finditer(name_pattern, text):
-            entities.append({'text': match.group(), 'type': 'Person', 'relevance': 0.95})
-
-        # Phone (e.g., +91-7795888591, flexible formats)
-        phone_pattern = r'\+?\d{1,4}[-.\s]?\(?\d{1,3}?\)?[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,9}\b'
-        for match in re.finditer(phone_pattern, text):
-            entities.append({'text': match.group(), 'type': 'Phone', 'relevance': 0.95})
-
-        # Email
-        email_pattern = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
-        for match in re.finditer(email_pattern, text):
-            entities.append({'text': match.group(), 'type': 'Email', 'relevance': 0.95})
-
-        # Location (e.g., Bagepalli, Karnataka)
-        location_pattern = r'\b[A-Z][a-z]+, [A-Z][a-z]+\b'
-        for match in re.finditer(location_pattern, text):
-            entities.append({'text': match.group(), 'type': 'Location', 'relevance': 0.90})
-
+        if isinstance(text, Document):
+            text = text.text
+        entities = scan_entities(text)
         logger.info(f"Extracted {len(entities)} local entities")
-        return entities[:10]
+        return entities
     except Exception as e:
         logger.error(f"Local entity extraction failed: {str(e)}", exc_info=True)
         return []
 
-def local_sentiment_analysis(text):
-    """Perform sentiment analysis using VADER."""
+def local_sentiment_analysis(text, detail=None):
+    """Perform sentiment analysis using VADER (``text`` may be a Document).
+
+    By default sentences are scored separately and averaged by length (see
+    ``sentiment.sentence_sentiment``); ``SENTIMENT_MODE=document`` scores
+    the whole text at once.
+    """
     try:
-        scores = vader_analyzer.polarity_scores(text)
-        compound = scores['compound']  # Range: -1 to 1
-        if compound > 0.05:
-            label = 'Positive'
-        elif compound < -0.05:
-            label = 'Negative'
+        if SENTIMENT_MODE == 'document':
+            result = document_sentiment(text.text if isinstance(text, Document) else text)
         else:
-            label = 'Neutral'
-        logger.info(f"Local sentiment: {label} (Score: {compound})")
-        return {'label': label, 'score': compound}
+            result = sentence_sentiment(text, detail=detail)
+        logger.info(f"Local sentiment: {result['label']} (Score: {result['score']})")
+        return result
     except Exception as e:
         logger.error(f"Local sentiment analysis failed: {str(e)}", exc_info=True)
         return {'label': 'Neutral', 'score': 0.0}
 
-def summarize_text(text):
+def summarize_text(text, long_document=None):
     """Generate a summary using BART."""
-    try:
+    return summarize_texts([text], long_document=long_document)[0]
+
+def summarize_texts(texts, batch_size=None, long_document=None):
+    """Generate BART summaries for several texts in padded batches.
+
+    Texts sharing the same generation bounds are grouped, sorted by input
+    length to keep padding small, and run through the summarizer
+    ``SUMMARY_BATCH_SIZE`` at a time. Each summary matches what
+    ``summarize_text`` produces for that text alone.
+
+    In long-document mode (``SUMMARY_LONG_DOCUMENTS``, on by default) texts
+    longer than ``SUMMARY_LONG_THRESHOLD`` characters are summarized from
+    the whole document with ``summarize_long_texts`` instead of from their
+    first 1000 characters; the chunks of all long texts share batches.
+    """
+    batch_size = max(batch_size or SUMMARY_BATCH_SIZE, 1)
+    if long_document is None:
+        long_document = SUMMARY_LONG_DOCUMENTS
+    summaries = [None] * len(texts)
+    short, long = [], []
+    for i, text in enumerate(texts):
         if len(text.split()) < 10:
             logger.warning("Text too short for summarization")
-            return "Text too short to summarize."
-        
-        # Lazy initialization of summarizer
-        summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-        max_length = min(len(text.split()) // 2, 150)
-        min_length = min(max_length // 2, 50)
-        summary = summarizer(text[:1000], max_length=max_length, min_length=min_length, do_sample=False)[0]['summary_text']
-        logger.info("Summary generated successfully")
-        return summary
+            summaries[i] = "Text too short to summarize."
+        elif long_document and len(text) > SUMMARY_LONG_THRESHOLD:
+            long.append(i)
+        else:
+            short.append(i)
+    if not short and not long:
+        return summaries
+
+    try:
+        summarizer = model_registry.get('summarization')
     except Exception as e:
         logger.error(f"Summary generation failed: {str(e)}", exc_info=True)
-        return "Error generating summary."
+        metrics.inc(metrics.ERRORS, stage='summary')
+        return [s if s is not None else "Error generating summary." for s in summaries]
+
+    jobs = [(texts[i][:1000], *summary_lengths(texts[i])) for i in short]
+    for i, summary in zip(short, generate_summaries(summarizer, jobs, batch_size)):
+        summaries[i] = summary
+    if long:
+        try:
+            long_summaries = summarize_long_texts([texts[i] for i in long], summarizer, batch_size)
+        except Exception as e:
+            logger.error(f"Long-document summary generation failed: {str(e)}", exc_info=True)
+            long_summaries = [None] * len(long)
+        for i, summary in zip(long, long_summaries):
+            summaries[i] = summary
+            if summary is None:
+                metrics.inc(metrics.ERRORS, stage='summary')
+    return [s if s is not None else "Error generating summary." for s in summaries]
+
+def detect_language_details(text):
+    """Identify the language from a bounded sample of the text (see ``language.identify_language``)."""
+    result = identify_language(text)
+    if result['confidence']:
+        logger.info(f"Detected language: {result['language']} (confidence {result['confidence']})")
+    else:
+        logger.warning(f"Language detection found no language features; assuming {result['language']}")
+    return result
 
 def detect_language(text):
     """Detect the language of the text."""
-    try:
-        lang = detect(text)
-        logger.info(f"Detected language: {lang}")
-        return lang
-    except LangDetectException as e:
-        logger.error(f"Language detection failed: {str(e)}", exc_info=True)
-        return 'en'
+    return detect_language_details(text)['language']
 
 def extract_custom_keywords(text, custom_keywords):
-    """Extract user-defined keywords with frequency-based relevance."""
+    """Extract user-defined keywords with frequency-based relevance (``text`` may be a Document)."""
     try:
         if not text or not custom_keywords:
             return []
-        words = re.findall(r'\b\w+\b', text.lower())
-        total_words = len(words)
-        word_counts = Counter(words)
+        doc = as_document(text)
+        total_words = len(doc)
+        keywords = [kw.strip().lower() for kw in custom_keywords if kw.strip()]
+        counts = phrase_counts(doc, keywords)
         results = []
-        for kw in (kw.strip().lower() for kw in custom_keywords if kw.strip()):
-            count = word_counts.get(kw, 0)
+        for kw in keywords:
+            count = counts[kw]
             relevance = min(count / total_words * 10, 1.0) if total_words else 0.0
             if count > 0:
                 results.append({'text': kw, 'relevance': round(relevance, 4)})
@@ -204,8 +317,113 @@ def extract_custom_keywords(text, custom_keywords):
         logger.error(f"Custom keyword extraction failed: {str(e)}", exc_info=True)
         return []
 
-def analyze_text(text, custom_keywords=None):
-    """Analyze text using Watson NLU or local fallback."""
+def sanitize_text(text):
+    """Replace characters that cannot round-trip through UTF-8 (keeps PDF export safe)."""
+    return text.encode('utf-8', errors='replace').decode('utf-8')
+
+def watson_analysis(text, language):
+    """Return the Watson NLU result for the text, or None to use local analysis."""
+    client = get_watson_client()
+    if client is None:
+        logger.warning("Watson API credentials missing, using local analysis")
+        metrics.inc(metrics.FALLBACKS, reason='no_credentials')
+        return None
+    return client.analyze(text, language=language if language != 'en' else None)
+
+def nlu_fields(doc, nlu_result):
+    """Map a Watson NLU result to keywords, entities and sentiment, falling back to local analysis.
+
+    When Watson is configured but gave no usable result (an outage, an open
+    circuit breaker or a malformed response) the fields carry
+    ``fallback: True``.
+    """
+    if nlu_result is not None:
+        try:
+            fields = {
+                'keywords': [{'text': k['text'], 'relevance': k['relevance']} for k in nlu_result.get('keywords', [])],
+                'entities': [{'text': e['text'], 'type': e['type'], 'relevance': e['relevance']} for e in nlu_result.get('entities', [])],
+                'sentiment': {
+                    'label': nlu_result['sentiment']['document']['label'].capitalize(),
+                    'score': nlu_result['sentiment']['document']['score']
+                }
+            }
+            logger.info("Watson NLU analysis successful")
+            return fields
+        except (KeyError, TypeError) as e:
+            logger.error(f"Unexpected Watson NLU response: {str(e)}", exc_info=True)
+            metrics.inc(metrics.FALLBACKS, reason='bad_response')
+    with metrics.timer(metrics.STAGE_SECONDS, stage='local_fallback'):
+        fields = {
+            'keywords': local_keyword_extraction(doc),
+            'entities': local_entity_extraction(doc),
+            'sentiment': local_sentiment_analysis(doc)
+        }
+    if get_watson_client() is not None:
+        fields['fallback'] = True
+    return fields
+
+def find_near_duplicate(text, owner=None):
+    """Return ``owner``'s earlier analysis of a near-identical text from the near-duplicate index, or None.
+
+    Without an ``owner`` nothing is looked up: matches never cross owners.
+    An index that cannot be opened or queried counts as no match.
+    """
+    if owner is None:
+        return None
+    try:
+        index = get_near_duplicate_index()
+        if index is None:
+            return None
+        signature = signature_for(text)
+        match = index.query(signature, ANALYZER_VERSION, owner) if signature is not None else None
+    except Exception as e:
+        logger.error(f"Near-duplicate lookup failed: {str(e)}", exc_info=True)
+        return None
+    metrics.inc(metrics.CACHE_LOOKUPS, namespace='near_duplicate', result='hit' if match else 'miss')
+    if match is not None:
+        logger.info(f"Near-duplicate of {match['name']} (similarity {match['similarity']}); reusing its summary")
+    return match
+
+def remember_analysis(text, analysis, owner, name):
+    """Add a finished analysis to ``owner``'s near-duplicate index entries so their near-identical documents can reuse it.
+
+    Analyses that were themselves reused, have no real summary, or already
+    have a near-duplicate in the index are not added; nothing is added
+    without an ``owner``. ``name`` is only logged; index errors are logged
+    and otherwise ignored.
+    """
+    summary = analysis.get('summary')
+    if owner is None or not text or analysis.get('near_duplicate') or not summary or summary in PLACEHOLDER_SUMMARIES:
+        return
+    try:
+        index = get_near_duplicate_index()
+        if index is None:
+            return
+        signature = signature_for(sanitize_text(text))
+        if signature is None or index.query(signature, ANALYZER_VERSION, owner) is not None:
+            return
+        index.add(signature, ANALYZER_VERSION, owner, name, {'summary': summary})
+    except Exception as e:
+        logger.error(f"Could not add {name} to the near-duplicate index: {str(e)}", exc_info=True)
+
+def analyze_text(text, custom_keywords=None, include_summary=True, owner=None):
+    """Analyze text using Watson NLU or local fallback.
+
+    With ``include_summary=False`` the summary is left empty so callers can
+    batch summarization across documents (see ``analyze_texts``). When
+    ``owner`` is given and the near-duplicate index holds that owner's
+    analysis of near-identical text, its summary is reused and
+    ``near_duplicate`` gives that document's ``name`` and the ``similarity``.
+    """
+    return analyze_text_timed(text, custom_keywords, include_summary, owner)[0]
+
+def analyze_text_timed(text, custom_keywords=None, include_summary=True, owner=None):
+    """Like ``analyze_text`` but return ``(result, timings)``.
+
+    The analysis runs as a stage graph: the Watson request waits only for
+    language detection and overlaps with the summary, and ``timings`` maps
+    each stage name to the seconds it took.
+    """
     if not isinstance(text, str) or not text.strip():
         logger.warning("Empty or invalid text input")
         return {
@@ -214,121 +432,217 @@ def analyze_text(text, custom_keywords=None):
             'sentiment': {'label': 'Neutral', 'score': 0.0},
             'summary': "No text provided.",
             'language': 'en',
+            'language_confidence': 0.0,
             'custom_keywords': []
-        }
+        }, {}
 
     if custom_keywords is None:
         custom_keywords = []
 
-    # Sanitize text for PDF compatibility
-    text = text.encode('utf-8', errors='replace').decode('utf-8')
+    text = sanitize_text(text)
+
+    stages = [
+        Stage('language', lambda: detect_language_details(text), [], 'cpu'),
+        Stage('document', lambda: Document(text), [], 'cpu'),
+        Stage('custom_keywords', lambda doc: extract_custom_keywords(doc, custom_keywords), ['document'], 'cpu'),
+        Stage('near_duplicate', lambda: find_near_duplicate(text, owner), [], 'cpu'),
+        Stage('watson', lambda language: watson_analysis(text, language['language']), ['language'], 'io'),
+        Stage('nlu', lambda doc, nlu_result: nlu_fields(doc, nlu_result), ['document', 'watson'], 'cpu'),
+    ]
+    if include_summary:
+        stages.append(Stage('summary', lambda match, language: summarize_for_language(text, language['language'], match), ['near_duplicate', 'language'], 'cpu'))
+    outputs, timings = run_stages(stages)
+    for name, seconds in timings.items():
+        metrics.observe(metrics.STAGE_SECONDS, seconds, stage=name)
 
     result = {
-        'keywords': [],
-        'entities': [],
-        'sentiment': {'label': 'Neutral', 'score': 0.0},
-        'summary': "",
-        'language': detect_language(text),
-        'custom_keywords': extract_custom_keywords(text, custom_keywords)
+        'keywords': outputs['nlu']['keywords'],
+        'entities': outputs['nlu']['entities'],
+        'sentiment': outputs['nlu']['sentiment'],
+        'summary': outputs.get('summary', ""),
+        'language': outputs['language']['language'],
+        'language_confidence': outputs['language']['confidence'],
+        'custom_keywords': outputs['custom_keywords']
     }
+    if outputs['nlu'].get('fallback'):
+        result['fallback'] = True
+    if is_mixed(outputs['language']):
+        result['language_segments'] = outputs['language']['segments']
+    match = outputs['near_duplicate']
+    if match:
+        result['summary'] = match['payload']['summary']
+        result['near_duplicate'] = {'name': match['name'], 'similarity': match['similarity'], 'reused': ['summary']}
+    logger.debug("Stage timings: " + ", ".join(f"{name}={seconds:.3f}s" for name, seconds in timings.items()))
+    return result, timings
 
-    # Watson NLU with retry
-    api_key = os.getenv('WATSON_API_KEY')
-    service_url = os.getenv('WATSON_SERVICE_URL')
-    if api_key and service_url:
-        for attempt in range(3):
-            try:
-                authenticator = IAMAuthenticator(api_key)
-                nlu = NaturalLanguageUnderstandingV1(version='2021-08-01', authenticator=authenticator)
-                nlu.set_service_url(service_url)
-                nlu_result = nlu.analyze(
-                    text=text,
-                    features=Features(
-                        keywords=KeywordsOptions(limit=10),
-                        entities=EntitiesOptions(limit=10),
-                        sentiment=SentimentOptions()
-                    ),
-                    language=result['language'] if result['language'] != 'en' else None
-                ).get_result()
-                result['keywords'] = [{'text': k['text'], 'relevance': k['relevance']} for k in nlu_result.get('keywords', [])]
-                result['entities'] = [{'text': e['text'], 'type': e['type'], 'relevance': e['relevance']} for k in nlu_result.get('entities', [])]
-                result['sentiment'] = {
-                    'label': nlu_result['sentiment']['document']['label'].capitalize(),
-                    'score': nlu_result['sentiment']['document']['score']
-                }
-                logger.info("Watson NLU analysis successful")
-                break
-            except Exception as e:
-                logger.error(f"Watson NLU attempt {attempt + 1} failed: {str(e)}", exc_info=True)
-                if attempt == 2:
-                    logger.warning("Max Watson NLU retries reached, using local analysis")
-                    result['keywords'] = local_keyword_extraction(text)
-                    result['entities'] = local_entity_extraction(text)
-                    result['sentiment'] = local_sentiment_analysis(text)
-                time.sleep(1)
+def summarize_for_language(text, language, match=None):
+    """Reuse a near-duplicate's summary, or summarize ``text`` if the summarizer supports ``language``."""
+    if match:
+        return match['payload']['summary']
+    if language not in SUMMARY_LANGUAGES:
+        logger.info(f"Skipping summary for {language} text")
+        return UNSUPPORTED_LANGUAGE_SUMMARY
+    return summarize_text(text)
 
-    else:
-        logger.warning("Watson API credentials missing, using local analysis")
-        result['keywords'] = local_keyword_extraction(text)
-        result['entities'] = local_entity_extraction(text)
-        result['sentiment'] = local_sentiment_analysis(text)
+def analyze_texts(texts, custom_keywords=None):
+    """Analyze several texts, summarizing them together in padded batches."""
+    results = [analyze_text(text, custom_keywords, include_summary=False) for text in texts]
+    return attach_summaries(texts, results)
 
-    result['summary'] = summarize_text(text)
-    return result
+def attach_summaries(texts, results):
+    """Fill in summaries for results produced with ``include_summary=False`` (reused summaries are kept).
+
+    Results in a language the summarizer does not support are not summarized.
+    """
+    pending = []
+    for i, text in enumerate(texts):
+        if not isinstance(text, str) or not text.strip() or results[i].get('summary'):
+            continue
+        if results[i].get('language', 'en') not in SUMMARY_LANGUAGES:
+            results[i]['summary'] = UNSUPPORTED_LANGUAGE_SUMMARY
+            continue
+        pending.append(i)
+    if not pending:
+        return results
+    with metrics.timer(metrics.SUMMARY_BATCH_SECONDS):
+        summaries = summarize_texts([sanitize_text(texts[i]) for i in pending])
+    for i, summary in zip(pending, summaries):
+        results[i]['summary'] = summary
+    return results
+
+def normalize_keywords(custom_keywords):
+    """Return the sorted, lowercased, de-duplicated custom keyword set."""
+    return sorted({kw.strip().lower() for kw in custom_keywords or [] if kw.strip()})
+
+def analysis_cache_key(file_hash, custom_keywords):
+    """Cache key for a full analysis: file bytes, keyword set, extraction limits and analyzer version."""
+    return make_key(
+        'analysis', file_hash, ','.join(normalize_keywords(custom_keywords)), EXTRACT_MAX_PAGES, EXTRACT_MAX_CHARS, ANALYZER_VERSION
+    )
+
+def cached_extract_text(file_path, file_type, file_hash=None):
+    """Extract text, reusing an earlier extraction of identical file bytes."""
+    cache = get_cache()
+    if cache is None:
+        return extract_text(file_path, file_type)
+    try:
+        file_hash = file_hash or file_sha256(file_path)
+    except OSError:
+        return extract_text(file_path, file_type)
+    # The limits change what is extracted, so extractions under other limits are not reused
+    key = make_key('extraction', file_hash, file_type.lower(), EXTRACT_MAX_PAGES, EXTRACT_MAX_CHARS, ANALYZER_VERSION)
+    cached = cache.get('extraction', key)
+    if cached is not None:
+        logger.info(f"Extraction cache hit for {source_label(file_path)}")
+        return cached['text']
+    text = extract_text(file_path, file_type)
+    if text:
+        cache.set('extraction', key, {'text': text})
+    return text
+
+def get_cached_analysis(file_hash, custom_keywords=None):
+    """Return a cached (text, analysis) for these file bytes and keywords, or None."""
+    cache = get_cache()
+    if cache is None or not file_hash:
+        return None
+    cached = cache.get('analysis', analysis_cache_key(file_hash, custom_keywords))
+    if cached is None:
+        return None
+    text, analysis = cached['text'], cached['analysis']
+    # The key uses the keyword set; recompute so the result follows this request's keyword order
+    analysis['custom_keywords'] = extract_custom_keywords(sanitize_text(text), custom_keywords or [])
+    logger.info(f"Analysis cache hit for {file_hash[:12]}")
+    return text, analysis
+
+def cache_analysis(file_hash, custom_keywords, text, analysis):
+    """Store a complete analysis for these file bytes and keywords.
+
+    Analyses that reused a near-duplicate's summary are not stored: the
+    cache is shared by everyone uploading the same bytes. Nor are analyses
+    with a placeholder summary or a transient local ``fallback``, so the
+    next upload retries the summarizer and Watson.
+    """
+    cache = get_cache()
+    if cache is None or not file_hash or not text or analysis.get('near_duplicate'):
+        return
+    if analysis.get('fallback') or analysis.get('summary') in PLACEHOLDER_SUMMARIES:
+        logger.info(f"Not caching the analysis of {file_hash[:12]}: it is a fallback or has no summary")
+        return
+    cache.set('analysis', analysis_cache_key(file_hash, custom_keywords), {'text': text, 'analysis': analysis})
+
+def process_file(file_path, file_type, custom_keywords=None, file_hash=None, owner=None):
+    """Extract and analyze one file, leaving the summary to the caller.
+
+    This is the unit of work run on the analysis process pool; summaries are
+    added afterwards in the parent with ``attach_summaries`` so the
+    summarizer is loaded once and batched across files. Returns
+    ``(text, analysis, events)``; the caller records the metric ``events``
+    with ``metrics.apply`` since the worker's own metrics are never scraped.
+    ``owner`` scopes near-duplicate reuse (see ``analyze_text``).
+    """
+    with metrics.collect() as events:
+        text = cached_extract_text(file_path, file_type, file_hash)
+        analysis = analyze_text(text, custom_keywords, include_summary=False, owner=owner)
+    return text, analysis, events
 
 def answer_question(text, question):
     """Answer a question based on the text."""
+    return answer_question_details(text, question)['answer']
+
+def answer_question_details(text, question, top_k=None):
+    """Answer a question from the whole text and say where the answer was found.
+
+    The ``top_k`` passages that best match the question (BM25 over a
+    per-document passage index) are read by the QA model in one batch.
+    Returns a dict with the ``answer``, its QA ``score``, its ``start`` and
+    ``end`` offsets in the text and the ``passage_start`` offset of the
+    passage it came from; offsets are None for regex shortcuts and errors.
+    """
+    details = {'answer': "", 'score': None, 'start': None, 'end': None, 'passage_start': None}
     try:
         if not isinstance(text, str) or not text.strip() or not isinstance(question, str) or not question.strip():
             logger.warning("Invalid text or question input")
-            return "Invalid input."
+            return dict(details, answer="Invalid input.")
 
         # Quick regex for common questions
         if "phone" in question.lower():
-            phone_pattern = r'\+?\d{1,4}[-.\s]?\(?\d{1,3}?\)?[-.\s]?\d{1,4}[-.\s]?\d{1,4}[-.\s]?\d{1,9}\b'
-            match = re.search(phone_pattern, text)
-            if match:
-                return match.group()
+            phone = first_entity(text, 'Phone')
+            if phone:
+                return dict(details, answer=phone)
 
         if "name" in question.lower():
-            name_pattern = r'\b[A-Z][a-z]+ [A-Z][a-z]+\b'
-            match = re.search(name_pattern, text)
-            if match:
-                return match.group()
-
-        # Lazy initialization of QA pipeline
-        qa_pipeline = pipeline("question-answering", model="deepset/roberta-base-squad2")
-        result = qa_pipeline(question=question, context=text[:1000])  # Limit context
-        logger.info(f"Answered question: {question} -> {result['answer']}")
-        return result['answer'].strip()
+            name = first_entity(text, 'Person')
+            if name:
+                return dict(details, answer=name)
+
+        with metrics.timer(metrics.STAGE_SECONDS, stage='qa'):
+            index = get_passage_index(text)
+            hits = index.search(question, k=top_k or QA_TOP_K)
+            if not hits:
+                return dict(details, answer="Unable to answer the question.")
+            contexts = [index.passage(passage) for passage, _ in hits]
+            qa_pipeline = model_registry.get('question-answering')
+            answers = qa_pipeline(question=[question] * len(contexts), context=contexts)
+        if isinstance(answers, dict):
+            answers = [answers]
+        best = max(range(len(answers)), key=lambda i: answers[i]['score'])
+        passage_start = index.starts[hits[best][0]]
+        answer = answers[best]
+        logger.info(f"Answered question: {question} -> {answer['answer']} (passage at {passage_start})")
+        return {
+            'answer': answer['answer'].strip(),
+            'score': round(float(answer['score']), 4),
+            'start': passage_start + answer['start'],
+            'end': passage_start + answer['end'],
+            'passage_start': passage_start
+        }
     except Exception as e:
         logger.error(f"Question answering failed: {str(e)}", exc_info=True)
-        return "Unable to answer the question."
+        metrics.inc(metrics.ERRORS, stage='qa')
+        return dict(details, answer="Unable to answer the question.")
 
 if __name__ == '__main__':
-    try:
-        # Test with sample file
-        file_path = 'documents/Resume_Musaib.pdf'
-        file_type = '.pdf'
-        text = extract_text(file_path, file_type)
-        logger.info(f"Extracted Text (first 100 chars): {text[:100]}...")
-        analysis = analyze_text(text, custom_keywords=["project", "deadline"])
-        logger.info("Analysis Results:")
-        logger.info(f"Language: {analysis['language']}")
-        logger.info(f"Sentiment: {analysis['sentiment']['label']} (Score: {analysis['sentiment']['score']})")
-        logger.info(f"Summary: {analysis['summary']}")
-        logger.info("Keywords:")
-        for kw in analysis['keywords']:
-            logger.info(f"  {kw['text']} (Relevance: {kw['relevance']})")
-        logger.info("Entities:")
-        for ent in analysis['entities']:
-            logger.info(f"  {ent['text']} ({ent['type']}, Relevance: {ent['relevance']})")
-        logger.info("Custom Keywords:")
-        for ck in analysis['custom_keywords']:
-            logger.info(f"  {ck['text']} (Relevance: {ck['relevance']})")
-        questions = ["What is the name on the resume?", "What is the phone number?"]
-        for q in questions:
-            answer = answer_question(text, q)
-            logger.info(f"Question: {q} | Answer: {answer}")
-    except Exception as e:
-        logger.error(f"Test execution failed: {str(e)}", exc_info=True)
\ No newline at end of file
+    # Kept for compatibility: ``python analyzer.py PATH...`` runs the batch CLI
+    import sys
+    from batch import main
+    sys.exit(main())
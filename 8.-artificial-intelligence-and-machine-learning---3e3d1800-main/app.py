@@ -1,13 +1,24 @@
-from flask import Flask, request, render_template, jsonify, send_file, session
+from flask import Flask, request, render_template, jsonify, send_file, Response, stream_with_context, url_for, g
 from werkzeug.utils import secure_filename
-from analyzer import extract_text, analyze_text, answer_question
+from analyzer import (
+    process_file, attach_summaries, answer_question_details, model_registry,
+    get_cached_analysis, cache_analysis, preload, remember_analysis
+)
+from analysis_cache import get_cache
+from model_registry import current_rss_mb
+import metrics
+from worker_pool import map_ordered
+from jobs import JobStore, JobRunner
+from result_store import ResultStore
+from exports import ExportCache, FontMissing, MIMETYPES
+from uploads import UploadRequest, UploadTooLarge, upload_source, save_upload
 import os
 import json
-import csv
 import io
 import time
 import re
-from fpdf import FPDF
+import uuid
+import hashlib
 from dotenv import load_dotenv
 import logging
 import logging.handlers
@@ -31,18 +42,203 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 
 app = Flask(__name__)
-app.secret_key = os.urandom(24)  # Required for session
+app.request_class = UploadRequest  # Stream uploads into memory with a running size limit
 app.config['UPLOAD_FOLDER'] = 'static/uploads'
 app.config['OUTPUT_FOLDER'] = 'static/outputs'
 app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB limit
 
+app.config['JOB_UPLOAD_FOLDER'] = os.path.join(app.config['UPLOAD_FOLDER'], 'jobs')
+app.config['JOB_DB_PATH'] = os.getenv('JOB_DB_PATH', 'jobs.sqlite3')
+app.config['RESULT_DB_PATH'] = os.getenv('RESULT_DB_PATH', 'results.sqlite3')
+# Browsers get a random client id cookie; near-duplicate reuse never crosses client ids
+app.config['CLIENT_COOKIE'] = 'analyzer_client'
+app.config['CLIENT_COOKIE_MAX_AGE'] = 365 * 24 * 3600
+# Only one process per job database may requeue interrupted jobs (server.py enables it in a single worker)
+app.config['JOB_RESUME'] = os.getenv('JOB_RESUME', 'true').lower() in ('1', 'true', 'yes')
+# Job event streams send a comment this often so proxies keep idle connections open, and end after JOB_EVENTS_TIMEOUT
+app.config['JOB_EVENTS_KEEPALIVE'] = float(os.getenv('JOB_EVENTS_KEEPALIVE', '15'))  # seconds
+app.config['JOB_EVENTS_TIMEOUT'] = float(os.getenv('JOB_EVENTS_TIMEOUT', '3600'))  # seconds
+app.config['JOB_EVENTS_POLL'] = 0.5  # seconds between job state reads
+
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 os.makedirs(app.config['OUTPUT_FOLDER'], exist_ok=True)
+os.makedirs(app.config['JOB_UPLOAD_FOLDER'], exist_ok=True)
+
+# Import the dependencies listed in ANALYZER_PRELOAD and load the models
+# listed in MODEL_PRELOAD before serving the first request
+preload()
+model_registry.warmup()
+# Free models unused for MODEL_IDLE_SECONDS even when no request comes in
+model_registry.start_idle_eviction()
+
+def upload_names(files):
+    """Yield (file, filename, output_filename) for each non-empty upload."""
+    for i, file in enumerate(files):
+        if file.filename == '':
+            continue
+        timestamp = str(int(time.time() * 1000))
+        yield file, secure_filename(file.filename), f'result_{i}_{timestamp}'
+
+def read_uploads(files):
+    """Return (filename, output_filename, source, file_hash, error) tuples in upload order.
+
+    ``source`` is the file's bytes, or a temp file path for uploads that
+    spilled past UPLOAD_SPOOL_MB; ``file_hash`` was computed while the
+    upload streamed in.
+    """
+    uploads = []
+    for file, filename, output_filename in upload_names(files):
+        try:
+            source, file_hash = upload_source(file)
+            uploads.append((filename, output_filename, source, file_hash, None))
+        except Exception as e:
+            logger.error(f"Error processing {filename}: {str(e)}", exc_info=True)
+            uploads.append((filename, output_filename, None, None, str(e)))
+    return uploads
+
+def save_uploads(files, folder):
+    """Save uploaded files under unique paths in ``folder``.
+
+    Returns (filename, output_filename, file_path, error) tuples in upload
+    order; ``error`` is set when a file could not be saved.
+    """
+    saved = []
+    for file, filename, output_filename in upload_names(files):
+        file_path = os.path.join(folder, f"{output_filename}_{filename}")
+        try:
+            save_upload(file, file_path)
+            saved.append((filename, output_filename, file_path, None))
+        except Exception as e:
+            logger.error(f"Error processing {filename}: {str(e)}", exc_info=True)
+            saved.append((filename, output_filename, None, str(e)))
+            remove_files([file_path])
+    return saved
+
+def parse_custom_keywords(value):
+    """Split the comma separated custom keyword field; keywords may be multi-word phrases."""
+    return [kw.strip() for kw in (value or '').split(',') if kw.strip()]
+
+def remove_files(paths):
+    """Delete temporary upload files that still exist."""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def client_owner():
+    """Return the near-duplicate owner of this request: a hash of the browser's client id cookie.
+
+    A browser without a valid cookie gets a new id, set on the response by
+    ``set_client_cookie``. The hash keeps usable cookie values out of the
+    near-duplicate index.
+    """
+    client_id = request.cookies.get(app.config['CLIENT_COOKIE'], '')
+    if not re.fullmatch(r'[0-9a-f]{32}', client_id):
+        client_id = g.setdefault('new_client_id', uuid.uuid4().hex)
+    return hashlib.sha256(client_id.encode('ascii')).hexdigest()
+
+def build_result(filename, output_filename, text, analysis, timings=None, owner=None):
+    """Store an analysis and return its result dict.
+
+    The result carries a ``doc_id`` that /ask and the download routes use
+    to find the stored document again; reports are rendered on download.
+    ``timings`` is an optional ``{stage: seconds}`` breakdown to include.
+    With an ``owner`` (see ``client_owner``) the analysis is offered for
+    reuse to that owner's later near-duplicate uploads only.
+    """
+    result = {
+        'filename': filename,
+        'text': text,
+        'keywords': analysis['keywords'],
+        'entities': analysis['entities'],
+        'sentiment': analysis['sentiment'],
+        'summary': analysis['summary'],
+        'language': analysis['language'],
+        'language_confidence': analysis.get('language_confidence'),
+        'custom_keywords': analysis['custom_keywords'],
+        'output_filename': output_filename
+    }
+    if analysis.get('language_segments'):
+        result['language_segments'] = analysis['language_segments']
+    if analysis.get('near_duplicate'):
+        result['near_duplicate'] = {key: analysis['near_duplicate'][key] for key in ('name', 'similarity', 'reused')}
+    if timings:
+        result['timings'] = timings
+    result['doc_id'] = result_store.save(filename, result)
+    remember_analysis(text, analysis, owner, filename)
+    return result
+
+# Analysis results live server-side; clients refer to them by doc_id
+result_store = ResultStore(app.config['RESULT_DB_PATH'])
+
+# Reports are rendered once per result and format, then served from memory or file
+export_cache = ExportCache(os.path.join(app.config['OUTPUT_FOLDER'], 'exports'))
+export_cache.start_cleanup()
+
+# Background analysis jobs; unfinished jobs resume after a restart
+job_store = JobStore(app.config['JOB_DB_PATH'])
+job_runner = JobRunner(job_store, build_result)
+if app.config['JOB_RESUME']:
+    job_runner.resume()
+
+# Gauges read when /metrics is scraped
+metrics.registry.register(metrics.Gauge('analyzer_models_loaded', 'Models currently loaded in the server process.', lambda: len(model_registry.loaded())))
+metrics.registry.register(metrics.Gauge('process_resident_memory_mb', 'Resident memory of the server process in MB.', lambda: round(current_rss_mb(), 1)))
+
+def wants_timings():
+    """True when results should carry a per-stage timing breakdown."""
+    return metrics.RESULT_TIMINGS or request.values.get('timings', '').lower() in ('1', 'true', 'yes')
+
+@app.before_request
+def start_request_metrics():
+    g.request_start = time.perf_counter()
+    metrics.INFLIGHT.inc()
+
+@app.after_request
+def record_request_metrics(response):
+    if 'request_start' in g:
+        metrics.HTTP_SECONDS.observe(
+            time.perf_counter() - g.request_start,
+            endpoint=request.endpoint or 'unknown', status=str(response.status_code)
+        )
+    return response
+
+@app.after_request
+def set_client_cookie(response):
+    if 'new_client_id' in g:
+        response.set_cookie(
+            app.config['CLIENT_COOKIE'], g.new_client_id,
+            max_age=app.config['CLIENT_COOKIE_MAX_AGE'], httponly=True, samesite='Lax'
+        )
+    return response
+
+@app.teardown_request
+def finish_request_metrics(exc):
+    if 'request_start' in g:
+        metrics.INFLIGHT.dec()
+
+@app.errorhandler(UploadTooLarge)
+def upload_too_large(e):
+    return jsonify({'error': e.description}), 400
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+@app.route('/models')
+def models():
+    return jsonify(model_registry.stats())
+
+@app.route('/cache')
+def cache_stats():
+    cache = get_cache()
+    if cache is None:
+        return jsonify({'enabled': False})
+    return jsonify(dict(cache.stats(), enabled=True))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @app.route('/analyze', methods=['POST'])
 def analyze():
     if 'files' not in request.files:
@@ -50,280 +246,200 @@ def analyze():
         return jsonify({'error': 'No files provided'}), 400
 
     files = request.files.getlist('files')
-    custom_keywords_input = request.form.get('custom_keywords', '')
-    custom_keywords = [kw.strip() for kw in re.split(r'[,\s]+', custom_keywords_input) if kw.strip()]
+    custom_keywords = parse_custom_keywords(request.form.get('custom_keywords', ''))
+    include_timings = wants_timings()
+    owner = client_owner()
     results = []
-    session['analysis_results'] = []  # Initialize session storage
 
-    for i, file in enumerate(files):
-        if file.filename == '':
+    uploads = []  # (position in results, filename, output_filename, source, file_hash)
+    finished = []  # (position in results, filename, output_filename, text, analysis, timings)
+    for filename, output_filename, source, file_hash, error in read_uploads(files):
+        if error:
+            results.append({"error": f"Error processing {filename}: {error}"})
             continue
-        filename = secure_filename(file.filename)
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-        timestamp = str(int(time.time() * 1000))
-        output_filename = f'result_{i}_{timestamp}'
+        cached = get_cached_analysis(file_hash, custom_keywords)
+        if cached:
+            finished.append((len(results), filename, output_filename, *cached, None))
+        else:
+            uploads.append((len(results), filename, output_filename, source, file_hash))
+        results.append(None)
+
+    # Extraction and CPU-bound analysis run on the process pool, in upload order
+    outcomes = map_ordered(
+        process_file,
+        [(source, os.path.splitext(filename)[1].lower(), custom_keywords, file_hash, owner) for _, filename, _, source, file_hash in uploads]
+    )
+
+    extracted = []  # (position in results, filename, output_filename, text, file_hash, events)
+    partial = []
+    for (position, filename, output_filename, _, file_hash), outcome in zip(uploads, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Error processing {filename}: {str(outcome)}")
+            metrics.inc(metrics.ERRORS, stage='analyze')
+            results[position] = {"error": f"Error processing {filename}: {str(outcome)}"}
+            continue
+        text, analysis, events = outcome
+        metrics.apply(events)
+        extracted.append((position, filename, output_filename, text, file_hash, events))
+        partial.append(analysis)
 
+    # Summarize all new documents together so they run as padded batches
+    with metrics.collect() as summary_events:
         try:
-            file.save(file_path)
-            if os.path.getsize(file_path) > app.config['MAX_CONTENT_LENGTH']:
-                logger.error(f"File {filename} too large")
-                return jsonify({'error': f"File {filename} too large. Maximum size is 10MB."}), 400
-
-            file_type = os.path.splitext(filename)[1].lower()
-            text = extract_text(file_path, file_type)
-            analysis = analyze_text(text, custom_keywords)
-            result = {
-                'text': text,
-                'keywords': analysis['keywords'],
-                'entities': analysis['entities'],
-                'sentiment': analysis['sentiment'],
-                'summary': analysis['summary'],
-                'language': analysis['language'],
-                'custom_keywords': analysis['custom_keywords'],
-                'output_filename': output_filename
-            }
-            results.append(result)
-            session['analysis_results'].append(result)
-
-            # Save as text file
-            output_path = os.path.join(app.config['OUTPUT_FOLDER'], f"{output_filename}.txt")
-            with open(output_path, 'w', encoding='utf-8') as f:
-                f.write(f"File: {filename}\n")
-                f.write("Extracted Text:\n")
-                f.write(text + "\n\n")
-                f.write(f"Language: {analysis['language']}\n")
-                f.write(f"Sentiment: {analysis['sentiment']['label']} (Score: {analysis['sentiment']['score']})\n")
-                f.write(f"Summary: {analysis['summary']}\n\n")
-                f.write("Keywords:\n")
-                for kw in analysis['keywords']:
-                    f.write(f"{kw['text']} (Relevance: {kw['relevance']})\n")
-                f.write("\nEntities:\n")
-                for ent in analysis['entities']:
-                    f.write(f"{ent['text']} - {ent['type']} (Relevance: {ent['relevance']})\n")
-                f.write("\nCustom Keywords:\n")
-                for kw in analysis['custom_keywords']:
-                    f.write(f"{kw['text']} (Relevance: {kw.get('relevance', 'N/A')})\n")
-
+            analyses = attach_summaries([item[3] for item in extracted], partial)
+        except Exception as e:
+            logger.error(f"Batch analysis failed: {str(e)}", exc_info=True)
+            metrics.inc(metrics.ERRORS, stage='summary')
+            for position, filename, _, _, _, _ in extracted:
+                results[position] = {"error": f"Error processing {filename}: {str(e)}"}
+            analyses = []
+    metrics.apply(summary_events)
+    for (position, filename, output_filename, text, file_hash, events), analysis in zip(extracted, analyses):
+        cache_analysis(file_hash, custom_keywords, text, analysis)
+        # The summary time is that of the whole batch the document was summarized in
+        timings = metrics.breakdown(events + summary_events) if include_timings else None
+        finished.append((position, filename, output_filename, text, analysis, timings))
+
+    for position, filename, output_filename, text, analysis, timings in sorted(finished, key=lambda item: item[0]):
+        try:
+            result = build_result(filename, output_filename, text, analysis, timings, owner)
+            results[position] = result
             logger.info(f"Processed file {filename} successfully")
         except Exception as e:
             logger.error(f"Error processing {filename}: {str(e)}", exc_info=True)
-            results.append({"error": f"Error processing {filename}: {str(e)}"})
-        finally:
-            if os.path.exists(file_path):
-                os.remove(file_path)
+            results[position] = {"error": f"Error processing {filename}: {str(e)}"}
 
     return jsonify(results)
 
+def job_status(job):
+    """Summarize a job for the API, with results of finished files in upload order."""
+    files = job['files']
+    return {
+        'job_id': job['id'],
+        'status': job['status'],
+        'total': len(files),
+        'completed': sum(1 for f in files if f['status'] in ('done', 'error')),
+        'files': [{'position': f['position'], 'filename': f['filename'], 'status': f['status'], 'error': f['error']} for f in files],
+        'results': [f['result'] if f['status'] == 'done' else {"error": f['error']} for f in files if f['status'] in ('done', 'error')]
+    }
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    if 'files' not in request.files:
+        logger.error("No files provided in request")
+        return jsonify({'error': 'No files provided'}), 400
+    custom_keywords = parse_custom_keywords(request.form.get('custom_keywords', ''))
+    saved = save_uploads(request.files.getlist('files'), app.config['JOB_UPLOAD_FOLDER'])
+    if not saved:
+        return jsonify({'error': 'No files provided'}), 400
+    saved = [
+        (filename, output_filename, file_path, f"Error processing {filename}: {error}" if error else None)
+        for filename, output_filename, file_path, error in saved
+    ]
+    job_id = job_store.create_job(saved, custom_keywords, client_owner())
+    job_runner.submit(job_id)
+    logger.info(f"Queued job {job_id} with {len(saved)} files")
+    return jsonify({
+        'job_id': job_id,
+        'status_url': url_for('get_job', job_id=job_id),
+        'events_url': url_for('job_events', job_id=job_id)
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def get_job(job_id):
+    job = job_store.get_job(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found."}), 404
+    return jsonify(job_status(job))
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream per-file results as server-sent events until the job is done.
+
+    A ``: keepalive`` comment goes out every ``JOB_EVENTS_KEEPALIVE``
+    seconds without other output. After ``JOB_EVENTS_TIMEOUT`` seconds the
+    stream ends with a ``timeout`` event; clients reconnect or poll the
+    status URL.
+    """
+    if job_store.get_job(job_id) is None:
+        return jsonify({"error": "Job not found."}), 404
+    keepalive = app.config['JOB_EVENTS_KEEPALIVE']
+    deadline = time.monotonic() + app.config['JOB_EVENTS_TIMEOUT']
+    status_url = url_for('get_job', job_id=job_id)
+
+    def generate():
+        sent = set()
+        last_output = time.monotonic()
+        while True:
+            job = job_store.get_job(job_id)
+            for f in job['files']:
+                if f['status'] in ('done', 'error') and f['position'] not in sent:
+                    sent.add(f['position'])
+                    payload = {'position': f['position'], 'filename': f['filename'], 'status': f['status']}
+                    payload['result'] = f['result'] if f['status'] == 'done' else {"error": f['error']}
+                    yield f"event: file\ndata: {json.dumps(payload)}\n\n"
+                    last_output = time.monotonic()
+            if job['status'] == 'done':
+                yield f"event: done\ndata: {json.dumps({'job_id': job_id, 'total': len(job['files'])})}\n\n"
+                return
+            now = time.monotonic()
+            if now >= deadline:
+                yield f"event: timeout\ndata: {json.dumps({'job_id': job_id, 'status_url': status_url})}\n\n"
+                return
+            if now - last_output >= keepalive:
+                yield ": keepalive\n\n"
+                last_output = now
+            time.sleep(app.config['JOB_EVENTS_POLL'])
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
 @app.route('/ask', methods=['POST'])
 def ask_question():
-    data = request.json
-    text = data.get('text')
+    data = request.json or {}
     question = data.get('question')
+    if data.get('doc_id'):
+        result = result_store.get(data['doc_id'])
+        if result is None:
+            return jsonify({"error": "Document not found."}), 404
+        text = result['text']
+    else:
+        text = data.get('text')  # clients that still send the text itself
     if not text or not question:
-        logger.error("Missing text or question in /ask request")
-        return jsonify({"error": "Text and question are required"}), 400
+        logger.error("Missing document or question in /ask request")
+        return jsonify({"error": "A doc_id and question are required"}), 400
     try:
-        answer = answer_question(text, question)  # Fixed: Use question, not text
-        logger.info(f"Answered question: {question} -> {answer}")
-        return jsonify({"answer": answer})
+        details = answer_question_details(text, question)
+        logger.info(f"Answered question: {question} -> {details['answer']}")
+        return jsonify(details)
     except Exception as e:
         logger.error(f"Error answering question: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
 
-@app.route('/download-txt')
-def download_txt():
-    index = int(request.args.get('index', '0'))
+@app.route('/download-<fmt>')
+def download(fmt):
+    doc_id = request.args.get('id', '')
+    if fmt not in MIMETYPES:
+        return jsonify({"error": "Unknown download format."}), 404
     try:
-        analysis_results = session.get('analysis_results', [])
-        if not analysis_results or index < 0 or index >= len(analysis_results):
-            logger.error(f"Invalid index {index} for download-txt")
+        export = export_cache.get(doc_id, fmt, lambda: result_store.get(doc_id))
+        if export is None:
+            logger.error(f"No stored result for document {doc_id!r} (download-{fmt})")
             return jsonify({"error": "No result available for download."}), 404
-        output_filename = analysis_results[index]['output_filename']
-        result_path = os.path.join(app.config['OUTPUT_FOLDER'], f"{output_filename}.txt")
-        if os.path.exists(result_path):
-            logger.info(f"Downloading TXT for index {index}")
-            return send_file(result_path, as_attachment=True, download_name=f'analysis_result_{index}.txt')
-        logger.error(f"TXT file not found: {result_path}")
-        return jsonify({"error": "No result available for download."}), 404
-    except Exception as e:
-        logger.error(f"Error downloading TXT: {str(e)}", exc_info=True)
-        return jsonify({"error": "Failed downloading file."}), 500
-
-@app.route('/download-json')
-def download_json():
-    index = int(request.args.get('index', '0'))
-    try:
-        analysis_results = session.get('analysis_results', [])
-        if not analysis_results or index < 0 or index >= len(analysis_results):
-            logger.error(f"Invalid index {index} for download-json")
-            return jsonify({"error": "No result available for download."}), 404
-        result = analysis_results[index]
-        json_data = {
-            "file": result['output_filename'],
-            "text": result['text'],
-            "language": result['language'],
-            "sentiment": result['sentiment'],
-            "summary": result['summary'],
-            "keywords": result['keywords'],
-            "entities": result['entities'],
-            "custom_keywords": result['custom_keywords']
-        }
-        logger.info(f"Downloading JSON for index {index}")
+        data, path = export
+        logger.info(f"Downloading {fmt.upper()} for document {doc_id}")
         return send_file(
-            io.BytesIO(json.dumps(json_data, indent=2).encode('utf-8')),
-            mimetype='application/json',
+            path or io.BytesIO(data),
+            mimetype=MIMETYPES[fmt],
             as_attachment=True,
-            download_name=f'analysis_result_{index}.json'
+            download_name=f'analysis_result_{doc_id}.{fmt}'
         )
+    except FontMissing as e:
+        logger.error(str(e))
+        return jsonify({"error": "Font file missing. Please add DejaVuSans.ttf to project root."}), 500
     except Exception as e:
-        logger.error(f"Error downloading JSON: {str(e)}", exc_info=True)
-        return jsonify({"error": "Error downloading JSON file."}), 500
-
-@app.route('/download-csv')
-def download_csv():
-    index = int(request.args.get('index', '0'))
-    try:
-        analysis_results = session.get('analysis_results', [])
-        if not analysis_results or index < 0 or index >= len(analysis_results):
-            logger.error(f"Invalid index {index} for download-csv")
-            return jsonify({"error": "No result available for download."}), 404
-        result = analysis_results[index]
-        output = io.StringIO()
-        writer = csv.writer(output, lineterminator='\n')
-        writer.writerow(["Type", "Text", "Relevance", "Entity Type"])
-        for kw in result['keywords']:
-            writer.writerow(["Keyword", kw['text'], kw['relevance'], ""])
-        for ent in result['entities']:
-            writer.writerow(["Entity", ent['text'], ent['relevance'], ent['type']])
-        for kw in result['custom_keywords']:
-            writer.writerow(["Custom Keyword", kw['text'], kw.get('relevance', 'N/A'), ""])
-        output.seek(0)
-        logger.info(f"Downloading CSV for index {index}")
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype='text/csv',
-            as_attachment=True,
-            download_name=f'analysis_result_{index}.csv'
-        )
-    except Exception as e:
-        logger.error(f"Error downloading CSV: {str(e)}", exc_info=True)
-        return jsonify({"error": "Error downloading file."}), 500
-
-@app.route('/download-pdf')
-def download_pdf():
-    index = int(request.args.get('index', '0'))
-    pdf_path = None
-    try:
-        analysis_results = session.get('analysis_results', [])
-        if not analysis_results or index < 0 or index >= len(analysis_results):
-            logger.error(f"Invalid index {index} for download-pdf")
-            return jsonify({"error": "No result available for download."}), 404
-        result = analysis_results[index]
-
-        # Sanitize text to avoid encoding issues
-        def sanitize_text(text):
-            if not isinstance(text, str):
-                text = str(text)
-            return text.encode('utf-8', errors='replace').decode('utf-8').replace('\ufffd', '')
-
-        # Verify font file
-        font_path = 'DejaVuSans.ttf'
-        if not os.path.exists(font_path):
-            logger.error(f"Font file {font_path} not found")
-            return jsonify({"error": "Font file missing. Please add DejaVuSans.ttf to project root."}), 500
-
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.add_font('DejaVu', '', font_path, uni=True)
-        pdf.set_font('DejaVu', '', 16)
-        pdf.cell(0, 10, "AI Document Analysis Report", ln=True, align='C')
-        pdf.set_font('DejaVu', '', 12)
-        pdf.ln(10)
-
-        # File
-        pdf.set_font('DejaVu', '', 14)
-        pdf.cell(0, 8, "File", ln=True)
-        pdf.set_font('DejaVu', '', 12)
-        pdf.multi_cell(0, 8, sanitize_text(result['output_filename']))
-        pdf.ln(5)
-
-        # Language
-        pdf.set_font('DejaVu', '', 14)
-        pdf.cell(0, 8, "Language", ln=True)
-        pdf.set_font('DejaVu', '', 12)
-        pdf.multi_cell(0, 8, sanitize_text(result['language']))
-        pdf.ln(5)
-
-        # Sentiment
-        pdf.set_font('DejaVu', '', 14)
-        pdf.cell(0, 8, "Sentiment", ln=True)
-        pdf.set_font('DejaVu', '', 12)
-        sentiment = result['sentiment']
-        sentiment_text = f"{sanitize_text(sentiment['label'])} (Score: {sanitize_text(sentiment['score'])})" if isinstance(sentiment, dict) else sanitize_text(sentiment)
-        pdf.multi_cell(0, 8, sentiment_text)
-        pdf.ln(5)
-
-        # Summary
-        pdf.set_font('DejaVu', '', 14)
-        pdf.cell(0, 8, "Summary", ln=True)
-        pdf.set_font('DejaVu', '', 12)
-        pdf.multi_cell(0, 8, sanitize_text(result['summary']))
-        pdf.ln(5)
-
-        # Extracted Text (limited to 1000 chars)
-        pdf.set_font('DejaVu', '', 14)
-        pdf.cell(0, 8, "Extracted Text", ln=True)
-        pdf.set_font('DejaVu', '', 12)
-        pdf.multi_cell(0, 8, sanitize_text(result['text'][:1000]))
-        pdf.ln(5)
-
-        # Keywords
-        pdf.set_font('DejaVu', '', 14)
-        pdf.cell(0, 8, "Keywords", ln=True)
-        pdf.set_font('DejaVu', '', 12)
-        for kw in result['keywords']:
-            pdf.multi_cell(0, 8, f"- {sanitize_text(kw['text'])} (Relevance: {sanitize_text(kw['relevance'])})")
-        pdf.ln(5)
-
-        # Entities
-        pdf.set_font('DejaVu', '', 14)
-        pdf.cell(0, 8, "Entities", ln=True)
-        pdf.set_font('DejaVu', '', 12)
-        for ent in result['entities']:
-            pdf.multi_cell(0, 8, f"- {sanitize_text(ent['text'])} ({sanitize_text(ent['type'])}, Relevance: {sanitize_text(ent['relevance'])})")
-        pdf.ln(5)
-
-        # Custom Keywords
-        pdf.set_font('DejaVu', '', 14)
-        pdf.cell(0, 8, "Custom Keywords", ln=True)
-        pdf.set_font('DejaVu', '', 12)
-        for kw in result['custom_keywords']:
-            pdf.multi_cell(0, 8, f"- {sanitize_text(kw['text'])} (Relevance: {sanitize_text(kw.get('relevance', 'N/A'))})")
-        pdf.ln(5)
-
-        pdf_filename = f"{result['output_filename']}.pdf"
-        pdf_path = os.path.join(app.config['OUTPUT_FOLDER'], pdf_filename)
-        pdf.output(pdf_path)
-
-        logger.info(f"Generated PDF: {pdf_path}")
-        return send_file(
-            pdf_path,
-            as_attachment=True,
-            download_name=f'analysis_result_{index}.pdf',
-            mimetype='application/pdf'
-        )
-
-    except Exception as e:
-        logger.error(f"Error generating PDF for index {index}: {str(e)}", exc_info=True)
-        return jsonify({"error": f"Error generating PDF: {str(e)}"}), 500
-    finally:
-        if pdf_path and os.path.exists(pdf_path):
-            try:
-                time.sleep(1)  # Ensure file is released
-                os.remove(pdf_path)
-                logger.info(f"Cleaned up PDF: {pdf_path}")
-            except Exception as e:
-                logger.error(f"Failed to clean up PDF {pdf_path}: {str(e)}", exc_info=True)
+        logger.error(f"Error downloading {fmt.upper()} for document {doc_id}: {str(e)}", exc_info=True)
+        return jsonify({"error": f"Error downloading {fmt.upper()} file."}), 500
 
 if __name__ == '__main__':
+    # Development server; use server.py in production
     app.run(host='localhost', port=5000, debug=True)
\ No newline at end of file
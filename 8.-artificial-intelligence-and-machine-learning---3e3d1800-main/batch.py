@@ -0,0 +1,282 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import metrics
+from analyzer import process_file, attach_summaries, remember_analysis, SUMMARY_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_TYPES = ('.png', '.jpg', '.jpeg', '.pdf', '.docx', '.txt')
+PROGRESS_INTERVAL = 10  # seconds between progress lines
+FSYNC_INTERVAL = 5  # seconds between flushes of the output to disk
+# Batch runs reuse summaries of near-duplicates among files analyzed by earlier batch runs only
+BATCH_OWNER = 'batch'
+
+def iter_input_files(inputs, file_list=None, extensions=SUPPORTED_TYPES):
+    """Yield supported files under the given directories and files, in sorted order.
+
+    ``file_list`` names a text file with one path per line (``-`` reads
+    standard input).
+    """
+    paths = list(inputs)
+    if file_list:
+        with (sys.stdin if file_list == '-' else open(file_list, 'r', encoding='utf-8')) as f:
+            paths.extend(line.strip() for line in f if line.strip())
+    seen = set()
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = (
+                os.path.join(root, name)
+                for root, dirs, names in sorted(os.walk(path))
+                for name in sorted(names)
+            )
+        else:
+            candidates = [path]
+        for candidate in candidates:
+            candidate = os.path.abspath(candidate)
+            if os.path.splitext(candidate)[1].lower() in extensions and candidate not in seen:
+                seen.add(candidate)
+                yield candidate
+
+def file_signature(path):
+    """``(size, mtime_ns)`` used to tell whether a file changed since it was processed."""
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+def load_checkpoint(output_path, retry_errors=False):
+    """Read an earlier run's JSONL output and return ``{path: (size, mtime_ns)}`` of finished files.
+
+    A line cut short by an interruption is removed so appending continues
+    on a clean line. Failed files are only counted as finished unless
+    ``retry_errors`` is set.
+    """
+    finished = {}
+    if not os.path.exists(output_path):
+        return finished
+    good_bytes = 0
+    with open(output_path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            good_bytes += len(line)
+            if record.get('status') == 'done' or not retry_errors:
+                finished[record['path']] = (record.get('size'), record.get('mtime_ns'))
+            else:
+                finished.pop(record['path'], None)
+    if good_bytes < os.path.getsize(output_path):
+        logger.warning(f"Discarding an incomplete record at the end of {output_path}")
+        with open(output_path, 'r+b') as f:
+            f.truncate(good_bytes)
+    return finished
+
+def format_duration(seconds):
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+class Progress:
+    """Throughput and ETA for the files processed by this run."""
+
+    def __init__(self, total, total_bytes, stream=None):
+        self.total, self.total_bytes = total, total_bytes
+        self.done = self.errors = self.bytes = 0
+        self.start = self.last_report = time.monotonic()
+        self.stream = stream or sys.stderr
+
+    def update(self, size, error=False):
+        self.done += 1
+        self.errors += int(error)
+        self.bytes += size
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if not force and now - self.last_report < PROGRESS_INTERVAL:
+            return
+        self.last_report = now
+        elapsed = max(now - self.start, 1e-9)
+        rate = self.done / elapsed
+        # Bytes predict the remaining time better than file counts when sizes vary
+        remaining_bytes = self.total_bytes - self.bytes
+        if self.bytes:
+            eta = format_duration(remaining_bytes / (self.bytes / elapsed))
+        elif rate:
+            eta = format_duration((self.total - self.done) / rate)
+        else:
+            eta = '?'
+        print(
+            f"{self.done}/{self.total} files ({self.errors} errors), {rate * 60:.1f} files/min, "
+            f"{self.bytes / elapsed / (1024 * 1024):.2f} MB/s, elapsed {format_duration(elapsed)}, ETA {eta}",
+            file=self.stream, flush=True
+        )
+
+def _init_worker(log_level):
+    logging.getLogger().setLevel(log_level)
+
+class BatchWriter:
+    """Append JSONL records, syncing them to disk every few seconds so a crash loses little."""
+
+    def __init__(self, path):
+        self._file = open(path, 'a', encoding='utf-8')
+        self._last_sync = time.monotonic()
+
+    def write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self._file.flush()
+        if time.monotonic() - self._last_sync >= FSYNC_INTERVAL:
+            self.sync()
+
+    def sync(self):
+        os.fsync(self._file.fileno())
+        self._last_sync = time.monotonic()
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+def run_batch(files, output_path, custom_keywords=None, workers=None, include_text=False,
+              include_timings=False, summaries=True, retry_errors=False, log_level=logging.WARNING):
+    """Analyze ``files`` on a process pool, appending one JSONL record per file as it finishes.
+
+    Files already recorded in ``output_path`` with an unchanged size and
+    modification time are skipped, so an interrupted run picks up where it
+    stopped. Summaries are generated in this process in batches of
+    ``SUMMARY_BATCH_SIZE`` documents, as for /analyze. Returns the
+    ``Progress`` of this run.
+    """
+    finished = load_checkpoint(output_path, retry_errors)
+    todo = []
+    for path in files:
+        try:
+            signature = file_signature(path)
+        except OSError as e:
+            logger.error(f"Skipping {path}: {str(e)}")
+            continue
+        if tuple(finished.get(path) or ()) != signature:
+            todo.append((path, signature))
+    skipped = len(files) - len(todo)
+    if skipped:
+        logger.warning(f"Resuming: {skipped} of {len(files)} files already processed")
+
+    progress = Progress(len(todo), sum(size for _, (size, _) in todo))
+    writer = BatchWriter(output_path)
+    workers = workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(log_level,))
+    queue = iter(todo)
+    running = {}
+    unsummarized = []  # (path, signature, text, analysis, events)
+
+    def write(path, signature, status, text=None, analysis=None, events=None, error=None):
+        record = {'path': path, 'size': signature[0], 'mtime_ns': signature[1], 'status': status}
+        if error:
+            record['error'] = error
+        if analysis is not None:
+            record.update(analysis)
+            if include_text:
+                record['text'] = text
+            if include_timings:
+                record['timings'] = metrics.breakdown(events)
+        writer.write(record)
+        if status == 'done':
+            remember_analysis(text, analysis, BATCH_OWNER, path)
+        progress.update(signature[0], error=status != 'done')
+        progress.report()
+
+    def flush_summaries():
+        if not unsummarized:
+            return
+        batch = unsummarized[:]
+        del unsummarized[:]
+        with metrics.collect() as summary_events:
+            if summaries:
+                try:
+                    attach_summaries([item[2] for item in batch], [item[3] for item in batch])
+                except Exception as e:
+                    logger.error(f"Batch summarization failed: {str(e)}", exc_info=True)
+        for path, signature, text, analysis, events in batch:
+            write(path, signature, 'done', text, analysis, events + summary_events)
+
+    try:
+        while True:
+            # Keep a bounded number of files in flight so huge corpora are not queued up front
+            while len(running) < workers * 2:
+                item = next(queue, None)
+                if item is None:
+                    break
+                path, signature = item
+                file_type = os.path.splitext(path)[1].lower()
+                running[pool.submit(process_file, path, file_type, custom_keywords or [], None, BATCH_OWNER)] = item
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                path, signature = running.pop(future)
+                try:
+                    text, analysis, events = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to process {path}: {str(e)}")
+                    write(path, signature, 'error', error=str(e))
+                    continue
+                if not text:
+                    write(path, signature, 'error', error='Text extraction failed')
+                    continue
+                unsummarized.append((path, signature, text, analysis, events))
+            if len(unsummarized) >= SUMMARY_BATCH_SIZE or not running:
+                flush_summaries()
+        flush_summaries()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+        writer.close()
+    progress.report(force=True)
+    return progress
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Analyze a corpus of documents into a JSONL file, resuming interrupted runs.')
+    parser.add_argument('inputs', nargs='*', help='files or directories to analyze (directories are walked recursively)')
+    parser.add_argument('--file-list', help="file with one input path per line ('-' for standard input)")
+    parser.add_argument('--output', '-o', default='results.jsonl', help='JSONL output, also used as the resume checkpoint')
+    parser.add_argument('--workers', '-w', type=int, help='worker processes (default: CPU count)')
+    parser.add_argument('--custom-keywords', default='', help='comma-separated keywords to count in every document')
+    parser.add_argument('--extensions', default=','.join(SUPPORTED_TYPES), help='file extensions to include')
+    parser.add_argument('--include-text', action='store_true', help='store the extracted text in each record')
+    parser.add_argument('--timings', action='store_true', help='store a per-stage timing breakdown in each record')
+    parser.add_argument('--no-summary', action='store_true', help='skip BART summaries')
+    parser.add_argument('--retry-errors', action='store_true', help='reprocess files that failed in an earlier run')
+    parser.add_argument('--restart', action='store_true', help='ignore and overwrite an existing output file')
+    parser.add_argument('--verbose', action='store_true', help='keep the per-document analysis logging')
+    args = parser.parse_args(argv)
+    if not args.inputs and not args.file_list:
+        parser.error('no inputs given')
+
+    log_level = logging.DEBUG if args.verbose else logging.WARNING
+    logging.getLogger().setLevel(log_level)
+    extensions = tuple(ext if ext.startswith('.') else f'.{ext}' for ext in (e.strip().lower() for e in args.extensions.split(',')) if ext)
+    custom_keywords = [kw.strip() for kw in args.custom_keywords.split(',') if kw.strip()]
+    if args.restart and os.path.exists(args.output):
+        os.remove(args.output)
+
+    files = list(iter_input_files(args.inputs, args.file_list, extensions))
+    print(f"Found {len(files)} files", file=sys.stderr, flush=True)
+    try:
+        progress = run_batch(
+            files, args.output, custom_keywords, args.workers, args.include_text,
+            args.timings, not args.no_summary, args.retry_errors, log_level
+        )
+    except KeyboardInterrupt:
+        print(f"Interrupted; run the same command again to resume from {args.output}", file=sys.stderr)
+        return 130
+    print(f"Wrote {progress.done} records ({progress.errors} errors) to {args.output}", file=sys.stderr)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,155 @@
+import re
+import json
+import time
+import base64
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORD = re.compile(r'\w+')
+
+class StubTokenizer:
+    """Counts whitespace-separated words as tokens, enough for chunking."""
+
+    def __call__(self, texts, add_special_tokens=False):
+        if isinstance(texts, str):
+            texts = [texts]
+        return {'input_ids': [[0] * len(text.split()) for text in texts]}
+
+class StubSummarizer:
+    """Summarization pipeline stand-in returning the leading ``max_length`` words.
+
+    ``latency`` seconds are spent per call to stand in for a forward pass.
+    """
+
+    def __init__(self, latency=0.0):
+        self.tokenizer = StubTokenizer()
+        self.latency = latency
+        self.calls = 0
+
+    def __call__(self, inputs, max_length=150, min_length=0, **kwargs):
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        single = isinstance(inputs, str)
+        texts = [inputs] if single else inputs
+        return [{'summary_text': ' '.join(text.split()[:max(max_length, 1)])} for text in texts]
+
+class StubQuestionAnswerer:
+    """QA pipeline stand-in answering with the first context word that also appears in the question."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def __call__(self, question, context, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        single = isinstance(context, str)
+        questions = [question] * (1 if single else len(context)) if isinstance(question, str) else question
+        contexts = [context] if single else context
+        answers = []
+        for q, c in zip(questions, contexts):
+            terms = {w.lower() for w in WORD.findall(q) if len(w) > 3}
+            best = None
+            for match in WORD.finditer(c):
+                if match.group().lower() in terms:
+                    best = match
+                    break
+            best = best or next(WORD.finditer(c), None)
+            if best is None:
+                answers.append({'score': 0.0, 'start': 0, 'end': 0, 'answer': ''})
+            else:
+                answers.append({'score': 0.5 if best.group().lower() in terms else 0.01, 'start': best.start(), 'end': best.end(), 'answer': best.group()})
+        return answers[0] if single else answers
+
+def stub_loader(summary_latency=0.0, qa_latency=0.0):
+    """Return a ModelRegistry loader building stub pipelines instead of downloading models."""
+    def load(task, model):
+        if task == 'summarization':
+            return StubSummarizer(summary_latency)
+        if task == 'question-answering':
+            return StubQuestionAnswerer(qa_latency)
+        raise ValueError(f"No stub for task {task}")
+    return load
+
+def _b64(data):
+    return base64.urlsafe_b64encode(json.dumps(data).encode('utf-8')).rstrip(b'=').decode('ascii')
+
+def fake_jwt(lifetime=3600):
+    """Return an unsigned JWT with ``iat``/``exp`` claims, as the IAM token manager expects."""
+    now = int(time.time())
+    return f"{_b64({'alg': 'HS256', 'typ': 'JWT'})}.{_b64({'iat': now, 'exp': now + lifetime})}.c2ln"
+
+class StubWatsonHandler(BaseHTTPRequestHandler):
+    """Answers IAM token requests and NLU ``/v1/analyze`` calls."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        server = self.server
+        if self.path.startswith('/identity/token'):
+            server.token_requests += 1
+            token = fake_jwt()
+            self._reply(200, {
+                'access_token': token, 'refresh_token': 'stub', 'token_type': 'Bearer',
+                'expires_in': 3600, 'expiration': int(time.time()) + 3600
+            })
+        elif self.path.startswith('/v1/analyze'):
+            server.analyze_requests += 1
+            if server.latency:
+                time.sleep(server.latency)
+            if server.failing:
+                self._reply(503, {'error': 'Service unavailable', 'code': 503})
+                return
+            text = json.loads(body or b'{}').get('text', '')
+            words = Counter(w.lower() for w in WORD.findall(text) if len(w) > 3)
+            top = words.most_common(10)
+            total = sum(count for _, count in top) or 1
+            self._reply(200, {
+                'language': 'en',
+                'keywords': [{'text': word, 'relevance': round(count / total, 4)} for word, count in top],
+                'entities': [],
+                'sentiment': {'document': {'label': 'neutral', 'score': 0.0}}
+            })
+        else:
+            self._reply(404, {'error': 'Not found', 'code': 404})
+
+    def _reply(self, status, payload):
+        data = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class StubWatsonServer(ThreadingHTTPServer):
+    """Local Watson NLU and IAM endpoint on 127.0.0.1 for offline runs.
+
+    Point ``WATSON_SERVICE_URL`` and ``WATSON_IAM_URL`` at ``url``. Set
+    ``failing`` to answer every analyze call with 503.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, latency=0.0):
+        super().__init__(('127.0.0.1', 0), StubWatsonHandler)
+        self.latency = latency
+        self.failing = False
+        self.token_requests = 0
+        self.analyze_requests = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name='stub-watson', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
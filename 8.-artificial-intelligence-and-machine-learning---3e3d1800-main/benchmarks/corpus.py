@@ -0,0 +1,137 @@
+import os
+import random
+import logging
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('txt', 'docx', 'pdf', 'png')
+# Rendering text into images gets very large quickly; bigger PNG sizes are skipped
+PNG_MAX_BYTES = 64 * 1024
+
+FIRST_NAMES = ['Mohammed', 'Priya', 'John', 'Aisha', 'Carlos', 'Mei', 'Olga', 'David', 'Fatima', 'Kenji']
+LAST_NAMES = ['Musaib', 'Sharma', 'Smith', 'Khan', 'Garcia', 'Wang', 'Petrova', 'Brown', 'Ali', 'Tanaka']
+PLACES = ['Bagepalli, Karnataka', 'Austin, Texas', 'Lyon, France', 'Osaka, Japan', 'Nairobi, Kenya']
+WORDS = (
+    'project deadline budget report analysis customer quarterly revenue growth risk schedule team '
+    'delivery milestone contract review design testing deployment research market product service '
+    'quality support strategy data model performance security network system process operation '
+    'excellent poor delayed successful improved declined stable critical urgent pleasant'
+).split()
+TABLE_ROW_EVERY = 40  # sentences between rows of numbers, which stress the entity patterns
+
+def parse_size(value):
+    """Parse sizes like ``1KB``, ``10MB`` or ``512`` (bytes)."""
+    value = value.strip().upper()
+    for suffix, factor in (('KB', 1024), ('MB', 1024 * 1024), ('GB', 1024 ** 3), ('B', 1)):
+        if value.endswith(suffix):
+            return int(float(value[:-len(suffix)]) * factor)
+    return int(value)
+
+def format_size(size):
+    for suffix, factor in (('MB', 1024 * 1024), ('KB', 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{suffix}"
+    return f"{size}B"
+
+def _sentence(rng):
+    words = rng.choices(WORDS, k=rng.randint(6, 18))
+    roll = rng.random()
+    if roll < 0.08:
+        words.insert(rng.randrange(len(words)), f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}")
+    elif roll < 0.11:
+        words.append(f"call +{rng.randint(1, 99)}-{rng.randint(6000000000, 9999999999)}")
+    elif roll < 0.13:
+        words.append(f"mail {rng.choice(FIRST_NAMES).lower()}.{rng.choice(LAST_NAMES).lower()}@example.com")
+    elif roll < 0.15:
+        words.append(f"in {rng.choice(PLACES)}")
+    sentence = ' '.join(words)
+    return sentence[0].upper() + sentence[1:] + rng.choice('...!?')
+
+def generate_text(size, seed=0):
+    """Return about ``size`` bytes of deterministic English-like text.
+
+    Sentences mention names, phone numbers, emails and places, and every
+    few paragraphs contain a row of numbers like a table.
+    """
+    rng = random.Random(seed)
+    pool = [_sentence(rng) for _ in range(2000)]
+    parts = []
+    total = 0
+    count = 0
+    while total < size:
+        if count and count % TABLE_ROW_EVERY == 0:
+            part = ' '.join(str(rng.randint(0, 99999)) for _ in range(12)) + '\n\n'
+        else:
+            part = rng.choice(pool) + (' ' if count % 6 else '\n\n')
+        parts.append(part)
+        total += len(part)
+        count += 1
+    return ''.join(parts)[:size]
+
+def write_txt(text, path):
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(text)
+
+def write_docx(text, path):
+    import docx
+    document = docx.Document()
+    for paragraph in text.split('\n\n'):
+        if paragraph.strip():
+            document.add_paragraph(paragraph)
+    document.save(path)
+
+def write_pdf(text, path, chars_per_page=3000):
+    import fitz  # PyMuPDF
+    document = fitz.open()
+    for start in range(0, len(text), chars_per_page):
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 545, 792), text[start:start + chars_per_page], fontsize=9)
+    document.save(path)
+    document.close()
+
+def write_png(text, path, width=2480, line_height=40, chars_per_line=110):
+    from PIL import Image, ImageDraw, ImageFont
+    words, lines, line = text.split(), [], ''
+    for word in words:
+        if len(line) + len(word) + 1 > chars_per_line:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    lines.append(line)
+    image = Image.new('L', (width, line_height * (len(lines) + 4)), 255)
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.truetype('DejaVuSans.ttf', 32)
+    except OSError:
+        font = ImageFont.load_default()
+    for i, line in enumerate(lines):
+        draw.text((80, line_height * (i + 2)), line, fill=0, font=font)
+    image.save(path, dpi=(300, 300))
+
+WRITERS = {'txt': write_txt, 'docx': write_docx, 'pdf': write_pdf, 'png': write_png}
+
+def build_corpus(directory, sizes, formats=FORMATS, seed=0):
+    """Create (or reuse) one document per format and size in ``directory``.
+
+    Returns ``[(format, size, path)]``. Files already present are reused so
+    large documents are only generated once.
+    """
+    os.makedirs(directory, exist_ok=True)
+    corpus = []
+    for size in sizes:
+        text = None
+        for fmt in formats:
+            if fmt == 'png' and size > PNG_MAX_BYTES:
+                logger.info(f"Skipping {format_size(size)} PNG (larger than {format_size(PNG_MAX_BYTES)})")
+                continue
+            path = os.path.join(directory, f"doc_{format_size(size)}.{fmt}")
+            if not os.path.exists(path):
+                if text is None:
+                    text = generate_text(size, seed)
+                logger.info(f"Generating {path}")
+                tmp_path = f"{path}.tmp.{fmt}"
+                WRITERS[fmt](text, tmp_path)
+                os.replace(tmp_path, path)
+            corpus.append((fmt, size, path))
+    return corpus
@@ -0,0 +1,104 @@
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that should only be imported when a document needs them
+HEAVY_PACKAGES = (
+    'transformers', 'torch', 'cv2', 'numpy', 'PIL', 'fitz', 'pdfplumber', 'docx',
+    'pytesseract', 'tesserocr', 'langdetect', 'vaderSentiment', 'ibm_watson', 'requests'
+)
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s+)(\S+)\s*$')
+
+def measure_import(module, workdir):
+    """Import ``module`` in a fresh interpreter; return ``(seconds, [(name, self_us, cumulative_us, depth)])``."""
+    env = dict(
+        os.environ,
+        MODEL_PRELOAD='', ANALYZER_PRELOAD='',
+        JOB_DB_PATH=os.path.join(workdir, 'jobs.sqlite3'),
+        RESULT_DB_PATH=os.path.join(workdir, 'results.sqlite3'),
+        CACHE_PATH=os.path.join(workdir, 'analysis_cache.sqlite3'),
+    )
+    code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    entries = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return float(proc.stdout.strip().splitlines()[-1]), entries
+
+def heavy_imports(entries):
+    """Return the heavy packages imported, with their cumulative import time in seconds."""
+    found = {}
+    for name, _, cumulative_us, _ in entries:
+        package = name.split('.')[0]
+        if package in HEAVY_PACKAGES and name == package:
+            found[package] = max(found.get(package, 0.0), cumulative_us / 1e6)
+    return found
+
+def report(module, repeat, workdir):
+    """Import ``module`` ``repeat`` times and keep the fastest run (the least disturbed by the OS)."""
+    runs = [measure_import(module, workdir) for _ in range(max(repeat, 1))]
+    seconds, entries = min(runs, key=lambda run: run[0])
+    slowest = sorted(entries, key=lambda entry: entry[2], reverse=True)
+    return {
+        'module': module,
+        'seconds': round(seconds, 4),
+        'modules_imported': len(entries),
+        'heavy': {name: round(value, 4) for name, value in heavy_imports(entries).items()},
+        'slowest': [
+            {'module': name, 'self_ms': round(self_us / 1000, 2), 'cumulative_ms': round(cumulative_us / 1000, 2), 'depth': depth}
+            for name, self_us, cumulative_us, depth in slowest
+        ],
+    }
+
+def print_report(result, top):
+    print(f"import {result['module']}: {result['seconds'] * 1000:.1f} ms ({result['modules_imported']} modules)")
+    if result['heavy']:
+        print("  heavy packages imported: " + ", ".join(f"{name} ({seconds * 1000:.0f} ms)" for name, seconds in result['heavy'].items()))
+    print(f"  {'cumulative ms':>14}{'self ms':>10}  module")
+    for entry in result['slowest'][:top]:
+        print(f"  {entry['cumulative_ms']:>14.1f}{entry['self_ms']:>10.1f}  {'  ' * entry['depth']}{entry['module']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Report how long importing the application modules takes in a fresh interpreter.')
+    parser.add_argument('modules', nargs='*', default=['analyzer', 'app'], help='modules to import (default: analyzer app)')
+    parser.add_argument('--repeat', type=int, default=3, help='imports per module; the fastest is reported')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--budget', type=float, help='fail when any module takes longer than this many seconds to import')
+    parser.add_argument('--no-heavy', action='store_true', help='fail when a heavy optional package is imported eagerly')
+    parser.add_argument('--output', help='also write the report as JSON to this file')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='analyzer-import-')
+    results = [report(module, args.repeat, workdir) for module in args.modules]
+    for result in results:
+        print_report(result, args.top)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    for result in results:
+        if args.budget is not None and result['seconds'] > args.budget:
+            failures.append(f"import {result['module']} took {result['seconds']:.3f}s (budget {args.budget:g}s)")
+        if args.no_heavy and result['heavy']:
+            failures.append(f"import {result['module']} eagerly imports {', '.join(result['heavy'])}")
+    for failure in failures:
+        print(failure)
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
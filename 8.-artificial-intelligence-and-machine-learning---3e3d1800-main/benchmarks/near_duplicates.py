@@ -0,0 +1,98 @@
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.corpus import generate_text
+
+VERSION = 'benchmark'
+OWNER = 'benchmark'
+INSERT_BATCH = 10000
+
+def fill(index, count, seed=0):
+    """Add ``count`` random signatures (unrelated documents) to ``index`` in bulk."""
+    import numpy as np
+    import near_duplicates as nd
+    rng = np.random.default_rng(seed)
+    for start in range(index.count(), count, INSERT_BATCH):
+        signatures = rng.integers(0, 1 << 32, size=(min(INSERT_BATCH, count - start), nd.NUM_PERM), dtype=np.uint64).astype('<u4')
+        for signature in signatures:
+            index.add(signature, VERSION, OWNER, f'synthetic-{start}', payload={})
+        print(f"{min(start + INSERT_BATCH, count)}/{count} signatures", file=sys.stderr, end='\r', flush=True)
+    print(file=sys.stderr)
+
+def edit(text, fraction, seed):
+    """Return ``text`` with roughly ``fraction`` of its sentences dropped, as a lightly re-exported copy would differ."""
+    import random
+    rng = random.Random(seed)
+    sentences = text.split('. ')
+    return '. '.join(s for s in sentences if rng.random() >= fraction)
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time near-duplicate index queries against a large index.')
+    parser.add_argument('--documents', type=int, default=1000000, help='signatures in the index')
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--size', type=int, default=20000, help='characters per query document')
+    parser.add_argument('--edit', type=float, default=0.05, help='fraction of sentences dropped from near-duplicate queries')
+    parser.add_argument('--path', help='index file, reused between runs (default: a temporary file)')
+    parser.add_argument('--output', help='also write the report as JSON')
+    args = parser.parse_args(argv)
+
+    import near_duplicates as nd
+    path = args.path or os.path.join(tempfile.mkdtemp(prefix='near-dup-'), 'index.sqlite3')
+    index = nd.NearDuplicateIndex(path)
+    start = time.perf_counter()
+    fill(index, args.documents)
+    build_seconds = time.perf_counter() - start
+
+    # Half the queries are edited copies of indexed documents, half are new documents
+    originals = [generate_text(args.size, seed) for seed in range(max(args.queries // 2, 1))]
+    for seed, text in enumerate(originals):
+        index.add(nd.minhash(text), VERSION, OWNER, f'original-{seed}', payload={})
+    queries = [(nd.minhash(edit(text, args.edit, seed)), True) for seed, text in enumerate(originals)]
+    queries += [(nd.minhash(generate_text(args.size, 100000 + seed)), False) for seed in range(len(originals))]
+
+    latencies, found, false_matches = [], 0, 0
+    for signature, duplicate in queries:
+        start = time.perf_counter()
+        match = index.query(signature, VERSION, OWNER)
+        latencies.append(time.perf_counter() - start)
+        if duplicate:
+            found += match is not None
+        else:
+            false_matches += match is not None
+    half = len(originals)
+    report = {
+        'documents': index.count(),
+        'build_seconds': round(build_seconds, 1),
+        'index_mb': round(os.path.getsize(path) / (1024 * 1024), 1),
+        'queries': len(queries),
+        'median_ms': round(statistics.median(latencies) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'recall': round(found / half, 4),
+        'false_match_rate': round(false_matches / half, 4),
+        'threshold': nd.NEAR_DUP_THRESHOLD,
+    }
+    print(
+        f"{report['documents']} documents ({report['index_mb']} MB): query median {report['median_ms']} ms, "
+        f"p99 {report['p99_ms']} ms; found {report['recall']:.1%} of near-duplicates, "
+        f"{report['false_match_rate']:.1%} false matches (threshold {report['threshold']})"
+    )
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
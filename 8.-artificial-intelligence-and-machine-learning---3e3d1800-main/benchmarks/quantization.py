@@ -0,0 +1,208 @@
+import os
+import re
+import sys
+import json
+import time
+import argparse
+import statistics
+import multiprocessing
+from collections import Counter
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.corpus import generate_text, parse_size
+
+DEFAULT_QUESTIONS = [
+    'When is the project deadline?',
+    'What happened to the quarterly revenue?',
+    'Who is responsible for the delivery?',
+    'What is the phone number?',
+]
+WORD = re.compile(r'\w+')
+
+def tokens(text):
+    return WORD.findall(text.lower())
+
+def rouge_1(reference, candidate):
+    """Unigram-overlap F1 between two texts."""
+    ref, cand = Counter(tokens(reference)), Counter(tokens(candidate))
+    overlap = sum((ref & cand).values())
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / sum(cand.values()), overlap / sum(ref.values())
+    return 2 * precision * recall / (precision + recall)
+
+def rouge_l(reference, candidate):
+    """Longest-common-subsequence F1 between two texts."""
+    ref, cand = tokens(reference), tokens(candidate)
+    if not ref or not cand:
+        return float(ref == cand)
+    previous = [0] * (len(cand) + 1)
+    for r in ref:
+        current = [0]
+        for j, c in enumerate(cand):
+            current.append(previous[j] + 1 if r == c else max(previous[j + 1], current[j]))
+        previous = current
+    lcs = previous[-1]
+    if not lcs:
+        return 0.0
+    precision, recall = lcs / len(cand), lcs / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+def answer_f1(reference, candidate):
+    """SQuAD-style token F1 between two answers."""
+    if not tokens(reference) and not tokens(candidate):
+        return 1.0
+    return rouge_1(reference, candidate)
+
+def summarize(summarizer, text):
+    """Summarize ``text`` the way ``analyzer.summarize_texts`` does."""
+    from summarization import (
+        SUMMARY_LONG_DOCUMENTS, SUMMARY_LONG_THRESHOLD, summary_lengths, generate_summaries, summarize_long_text
+    )
+    if len(text.split()) < 10:
+        return ''
+    if SUMMARY_LONG_DOCUMENTS and len(text) > SUMMARY_LONG_THRESHOLD:
+        return summarize_long_text(text, summarizer, 1) or ''
+    return generate_summaries(summarizer, [(text[:1000], *summary_lengths(text))], 1)[0] or ''
+
+def answer(qa_pipeline, index, question, top_k):
+    """Answer from the best retrieved passages, as ``analyzer.answer_question_details`` does."""
+    hits = index.search(question, k=top_k)
+    contexts = [index.passage(passage) for passage, _ in hits]
+    if not contexts:
+        return ''
+    answers = qa_pipeline(question=[question] * len(contexts), context=contexts)
+    if isinstance(answers, dict):
+        answers = [answers]
+    return max(answers, key=lambda a: a['score'])['answer'].strip()
+
+def timed_load(task, model, backend):
+    from model_registry import current_rss_mb, estimate_model_mb
+    from inference import load_pipeline
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    pipe = load_pipeline(task, model, backend)
+    load_seconds = time.perf_counter() - start
+    rss_delta = max(current_rss_mb() - rss_before, 0.0)
+    return pipe, {
+        'load_seconds': round(load_seconds, 2),
+        'model_mb': round(estimate_model_mb(pipe) or rss_delta, 1),
+        'rss_delta_mb': round(rss_delta, 1),
+    }
+
+def run_backend(backend, texts, questions, repeat, top_k):
+    """Load both models on ``backend`` and return their outputs, timings and memory use.
+
+    Runs in a fresh process per backend so memory figures are not skewed
+    by models loaded earlier.
+    """
+    from model_registry import MODEL_SPECS, current_rss_mb
+    from passage_index import PassageIndex
+    report = {'backend': backend}
+
+    summarizer, report['summarization'] = timed_load(*MODEL_SPECS['summarization'], backend)
+    summaries, times = [], []
+    for text in texts:
+        runs = []
+        for _ in range(max(repeat, 1)):
+            start = time.perf_counter()
+            summary = summarize(summarizer, text)
+            runs.append(time.perf_counter() - start)
+        summaries.append(summary)
+        times.append(statistics.median(runs))
+    report['summarization']['seconds_per_document'] = round(statistics.mean(times), 4)
+    report['summaries'] = summaries
+
+    qa_pipeline, report['question-answering'] = timed_load(*MODEL_SPECS['question-answering'], backend)
+    answers, times = [], []
+    for text in texts:
+        index = PassageIndex(text)
+        for question in questions:
+            runs = []
+            for _ in range(max(repeat, 1)):
+                start = time.perf_counter()
+                result = answer(qa_pipeline, index, question, top_k)
+                runs.append(time.perf_counter() - start)
+            answers.append(result)
+            times.append(statistics.median(runs))
+    report['question-answering']['seconds_per_question'] = round(statistics.mean(times), 4)
+    report['answers'] = answers
+    report['rss_mb'] = round(current_rss_mb(), 1)
+    return report
+
+def compare_to_reference(reference, report):
+    """Add ROUGE and QA agreement with the reference backend's outputs to ``report``."""
+    pairs = list(zip(reference['summaries'], report['summaries']))
+    report['summarization']['rouge_1'] = round(statistics.mean(rouge_1(r, c) for r, c in pairs), 4) if pairs else None
+    report['summarization']['rouge_l'] = round(statistics.mean(rouge_l(r, c) for r, c in pairs), 4) if pairs else None
+    pairs = list(zip(reference['answers'], report['answers']))
+    report['question-answering']['exact_match'] = round(statistics.mean(float(r.lower() == c.lower()) for r, c in pairs), 4) if pairs else None
+    report['question-answering']['f1'] = round(statistics.mean(answer_f1(r, c) for r, c in pairs), 4) if pairs else None
+    for task, key in (('summarization', 'seconds_per_document'), ('question-answering', 'seconds_per_question')):
+        base = reference[task][key]
+        report[task]['speedup'] = round(base / report[task][key], 2) if base and report[task][key] else None
+    return report
+
+def _format(value, spec):
+    return '-' if value is None else format(value, spec)
+
+def print_reports(reports):
+    print(f"{'backend':<11}{'task':<20}{'load s':>8}{'model MB':>10}{'ms/call':>10}{'speedup':>9}  agreement")
+    for report in reports:
+        for task, key in (('summarization', 'seconds_per_document'), ('question-answering', 'seconds_per_question')):
+            stats = report[task]
+            if task == 'summarization':
+                agreement = f"ROUGE-1 {_format(stats['rouge_1'], '.3f')}  ROUGE-L {_format(stats['rouge_l'], '.3f')}"
+            else:
+                agreement = f"EM {_format(stats['exact_match'], '.3f')}  F1 {_format(stats['f1'], '.3f')}"
+            print(
+                f"{report['backend']:<11}{task:<20}{stats['load_seconds']:>8.1f}{stats['model_mb']:>10.0f}"
+                f"{stats[key] * 1000:>10.1f}{_format(stats['speedup'], '.2f'):>9}  {agreement}"
+            )
+
+def load_texts(args):
+    if not args.documents:
+        return [generate_text(parse_size(size), seed) for seed, size in enumerate(args.sizes.split(',')) if size.strip()]
+    from batch import iter_input_files
+    from analyzer import extract_text
+    paths = list(iter_input_files(args.documents))[:args.limit]
+    return [text for text in (extract_text(path, os.path.splitext(path)[1].lower()) for path in paths) if text]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare speed, memory and output agreement of the inference backends.')
+    parser.add_argument('--backends', default='torch,int8,onnx,onnx-int8', help='backends to compare; the first is the reference')
+    parser.add_argument('--documents', nargs='*', help='documents or directories to use instead of synthetic text')
+    parser.add_argument('--limit', type=int, default=20, help='maximum number of documents read from --documents')
+    parser.add_argument('--sizes', default='2KB,2KB,8KB,32KB', help='synthetic document sizes when no --documents are given')
+    parser.add_argument('--questions', nargs='*', default=DEFAULT_QUESTIONS)
+    parser.add_argument('--repeat', type=int, default=1, help='timed runs per call; the median is used')
+    parser.add_argument('--top-k', type=int, default=3, help='passages read per question')
+    parser.add_argument('--output', help='also write the full report (including outputs) as JSON')
+    args = parser.parse_args(argv)
+
+    os.chdir(PROJECT_DIR)  # ONNX exports are kept relative to the project
+    texts = load_texts(args)
+    backends = [b.strip() for b in args.backends.split(',') if b.strip()]
+    reports = []
+    context = multiprocessing.get_context('spawn')
+    for backend in backends:
+        print(f"Running {backend}...", file=sys.stderr, flush=True)
+        with context.Pool(1) as pool:
+            try:
+                reports.append(pool.apply(run_backend, (backend, texts, args.questions, args.repeat, args.top_k)))
+            except Exception as e:
+                print(f"Skipping {backend}: {str(e)}", file=sys.stderr)
+    if not reports:
+        return 1
+    reports = [compare_to_reference(reports[0], report) for report in reports]
+    print_reports(reports)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'texts': len(texts), 'questions': args.questions, 'reports': reports}, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
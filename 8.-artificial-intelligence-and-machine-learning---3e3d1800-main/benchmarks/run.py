@@ -0,0 +1,238 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import tracemalloc
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.corpus import FORMATS, build_corpus, parse_size, format_size, generate_text
+from benchmarks.backends import StubWatsonServer, stub_loader
+
+logger = logging.getLogger('benchmarks')
+
+DEFAULT_SIZES = '1KB,10KB,100KB,1MB,10MB,50MB'
+CUSTOM_KEYWORDS = ['project', 'deadline', 'quarterly revenue']
+QUESTION = 'When is the project deadline?'
+MB = 1024 * 1024
+
+def measure(fn, repeat, memory):
+    """Run ``fn`` ``repeat`` times and return ``(last value, stats)``.
+
+    Peak Python memory is taken from one extra traced run, so tracing does
+    not distort the timings.
+    """
+    times = []
+    value = None
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        value = fn()
+        times.append(time.perf_counter() - start)
+    stats = {'seconds': statistics.median(times), 'min_seconds': min(times), 'runs': len(times)}
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            stats['peak_mb'] = round(tracemalloc.get_traced_memory()[1] / MB, 2)
+        finally:
+            tracemalloc.stop()
+    return value, stats
+
+def record(records, stage, fmt, size, stats, file_bytes=None):
+    entry = {'stage': stage, 'format': fmt, 'size': size, 'size_label': format_size(size)}
+    if file_bytes is not None:
+        entry['file_bytes'] = file_bytes
+    entry.update(stats)
+    entry['seconds'] = round(entry['seconds'], 6)
+    entry['min_seconds'] = round(entry['min_seconds'], 6)
+    entry['throughput_mb_s'] = round(size / MB / entry['seconds'], 3) if entry['seconds'] else None
+    records.append(entry)
+    logger.info(f"{stage:<24} {fmt:<5} {format_size(size):>6}  {entry['seconds'] * 1000:10.2f} ms")
+
+def configure_environment(args, workdir):
+    """Point state files at a scratch directory and select the backends (before importing the app)."""
+    os.environ.setdefault('CACHE_ENABLED', 'false')  # repeated runs must not be cache hits
+    os.environ.setdefault('NEAR_DUP_ENABLED', 'false')  # nor reuse summaries of earlier runs' documents
+    os.environ.setdefault('ANALYZE_WORKERS', '0')
+    os.environ.setdefault('MODEL_PRELOAD', '')
+    os.environ['JOB_DB_PATH'] = os.path.join(workdir, 'jobs.sqlite3')
+    os.environ['RESULT_DB_PATH'] = os.path.join(workdir, 'results.sqlite3')
+    os.environ['CACHE_PATH'] = os.path.join(workdir, 'analysis_cache.sqlite3')
+    os.environ['NEAR_DUP_PATH'] = os.path.join(workdir, 'near_duplicates.sqlite3')
+    os.environ['WATSON_BREAKER_PATH'] = os.path.join(workdir, 'watson_breaker.sqlite3')
+    server = None
+    if args.watson == 'stub':
+        server = StubWatsonServer(latency=args.watson_latency).start()
+        os.environ['WATSON_API_KEY'] = 'benchmark'
+        os.environ['WATSON_SERVICE_URL'] = server.url
+        os.environ['WATSON_IAM_URL'] = server.url
+    elif args.watson == 'none':
+        os.environ['WATSON_API_KEY'] = ''  # load_dotenv does not override it
+    return server
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_DIR, capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def run_benchmarks(args):
+    workdir = tempfile.mkdtemp(prefix='analyzer-bench-')
+    server = configure_environment(args, workdir)
+    os.chdir(PROJECT_DIR)  # the app resolves templates, static and log folders from here
+
+    import analyzer
+    import app as webapp
+    from document import Document
+    from model_registry import registry
+    logging.getLogger().setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    logger.setLevel(logging.INFO)
+    if not args.real_models:
+        registry._loader = stub_loader(args.model_latency, args.model_latency)
+
+    sizes = [parse_size(s) for s in args.sizes.split(',') if s.strip()]
+    formats = [f.strip() for f in args.formats.split(',') if f.strip()]
+    corpus = build_corpus(args.corpus_dir, sizes, formats, seed=args.seed)
+    webapp.app.config['MAX_CONTENT_LENGTH'] = max(
+        webapp.app.config['MAX_CONTENT_LENGTH'], max((os.path.getsize(path) for _, _, path in corpus), default=0) + MB
+    )
+    client = webapp.app.test_client()
+    records = []
+    repeat, memory = args.repeat, not args.no_memory
+
+    # Text stages depend only on the text, so they run once per size
+    for size in sizes:
+        text = generate_text(size, args.seed)
+        doc, stats = measure(lambda: Document(text), repeat, memory)
+        record(records, 'document', 'text', size, stats)
+        for stage, fn in [
+            ('language', lambda: analyzer.detect_language(text)),
+            ('keywords', lambda: analyzer.local_keyword_extraction(doc)),
+            ('entities', lambda: analyzer.local_entity_extraction(doc)),
+            ('custom_keywords', lambda: analyzer.extract_custom_keywords(doc, CUSTOM_KEYWORDS)),
+            ('sentiment', lambda: analyzer.local_sentiment_analysis(text)),
+            ('summary', lambda: analyzer.summarize_text(text)),
+            ('qa', lambda: analyzer.answer_question_details(text, QUESTION)),
+        ]:
+            _, stats = measure(fn, repeat, memory)
+            record(records, stage, 'text', size, stats)
+        (_, timings), stats = measure(lambda: analyzer.analyze_text_timed(text, CUSTOM_KEYWORDS), repeat, memory)
+        record(records, 'analyze_text', 'text', size, stats)
+        for stage, seconds in timings.items():
+            record(records, f'analyze_text.{stage}', 'text', size, {'seconds': seconds, 'min_seconds': seconds, 'runs': 1})
+
+    for fmt, size, path in corpus:
+        file_bytes = os.path.getsize(path)
+        _, stats = measure(lambda: analyzer.extract_text(path, f'.{fmt}'), repeat, memory)
+        record(records, 'extract', fmt, size, stats, file_bytes)
+
+        def post():
+            with open(path, 'rb') as f:
+                response = client.post(
+                    '/analyze',
+                    data={'files': (f, os.path.basename(path)), 'custom_keywords': ','.join(CUSTOM_KEYWORDS)},
+                    content_type='multipart/form-data'
+                )
+            if response.status_code != 200 or 'error' in response.get_json()[0]:
+                raise RuntimeError(f"/analyze failed for {path}: {response.status_code} {response.get_data(as_text=True)[:200]}")
+            return response
+        _, stats = measure(post, repeat, memory)
+        record(records, 'end_to_end', fmt, size, stats, file_bytes)
+
+    if server is not None:
+        server.stop()
+    return {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'repeat': repeat,
+            'watson': args.watson,
+            'models': 'real' if args.real_models else 'stub',
+            'model_latency': args.model_latency,
+            'watson_latency': args.watson_latency,
+        },
+        'results': records,
+    }
+
+def compare(report, baseline, tolerance, min_delta):
+    """Return ``(rows, regressions)`` comparing median timings with a baseline report.
+
+    A stage regresses when it is more than ``tolerance`` (a fraction)
+    slower and at least ``min_delta`` seconds slower than the baseline.
+    """
+    base = {(r['stage'], r['format'], r['size']): r for r in baseline.get('results', [])}
+    rows, regressions = [], []
+    for r in report['results']:
+        old = base.get((r['stage'], r['format'], r['size']))
+        if old is None or not old['seconds']:
+            continue
+        ratio = r['seconds'] / old['seconds']
+        delta = r['seconds'] - old['seconds']
+        status = 'ok'
+        if ratio > 1 + tolerance and delta > min_delta:
+            status = 'REGRESSION'
+            regressions.append(r)
+        elif ratio < 1 - tolerance and -delta > min_delta:
+            status = 'improved'
+        rows.append((r['stage'], r['format'], r['size_label'], old['seconds'], r['seconds'], ratio, status))
+    return rows, regressions
+
+def print_comparison(rows):
+    print(f"{'stage':<26}{'format':<7}{'size':>7}{'baseline ms':>14}{'current ms':>14}{'ratio':>8}  status")
+    for stage, fmt, size, old, new, ratio, status in rows:
+        print(f"{stage:<26}{fmt:<7}{size:>7}{old * 1000:>14.2f}{new * 1000:>14.2f}{ratio:>8.2f}  {status}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark extraction, analysis stages and /analyze on a synthetic corpus.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'comma-separated document sizes (default {DEFAULT_SIZES})')
+    parser.add_argument('--formats', default=','.join(FORMATS), help='comma-separated formats: txt, docx, pdf, png')
+    parser.add_argument('--corpus-dir', default=os.path.join(PROJECT_DIR, 'benchmarks', 'corpus'), help='where generated documents are kept and reused')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per measurement; the median is reported')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the traced run that measures peak memory')
+    parser.add_argument('--watson', choices=['stub', 'none', 'env'], default='stub',
+                        help='stub: local fake Watson server; none: local analysis only; env: use WATSON_* from the environment')
+    parser.add_argument('--watson-latency', type=float, default=0.02, help='seconds the stub Watson server takes per request')
+    parser.add_argument('--real-models', action='store_true', help='load the real transformers models instead of stubs')
+    parser.add_argument('--model-latency', type=float, default=0.0, help='seconds each stub model call takes')
+    parser.add_argument('--output', default='benchmark_results.json', help='where to write the JSON report')
+    parser.add_argument('--compare', metavar='BASELINE', help='baseline JSON report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown before a stage is flagged (fraction)')
+    parser.add_argument('--min-delta', type=float, default=0.005, help='ignore slowdowns smaller than this many seconds')
+    parser.add_argument('--verbose', action='store_true', help='keep the application debug logging')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    # Resolve output paths before run_benchmarks changes directory
+    args.output = os.path.abspath(args.output)
+    baseline_path = os.path.abspath(args.compare) if args.compare else None
+    args.corpus_dir = os.path.abspath(args.corpus_dir)
+
+    report = run_benchmarks(args)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    logger.info(f"Wrote {len(report['results'])} measurements to {args.output}")
+
+    if baseline_path:
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        rows, regressions = compare(report, baseline, args.tolerance, args.min_delta)
+        print_comparison(rows)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%} against {baseline_path}")
+            return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
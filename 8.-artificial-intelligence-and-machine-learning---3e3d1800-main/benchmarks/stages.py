@@ -0,0 +1,103 @@
+import os
+import sys
+import json
+import time
+import pickle
+import logging
+import argparse
+import tempfile
+import statistics
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from benchmarks.corpus import generate_text, parse_size, format_size
+from benchmarks.backends import StubWatsonServer, stub_loader
+
+# Stage inputs a process executor would have to send to another process, and
+# the output it would send back (see analyzer.analyze_text_timed)
+CPU_STAGE_INPUTS = {
+    'language': ['text'],
+    'document': ['text'],
+    'custom_keywords': ['document'],
+    'near_duplicate': ['text'],
+    'nlu': ['document', 'watson'],
+    'summary': ['text', 'near_duplicate', 'language'],
+}
+
+def transfer_seconds(value):
+    """Time to pickle ``value`` and unpickle it again, the least a process executor pays per hand-off."""
+    start = time.perf_counter()
+    pickle.loads(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    return time.perf_counter() - start
+
+def run_mode(analyzer, stages, text, io_workers, cpu_workers, repeat):
+    """Median wall time and summed stage time of ``analyze_text_timed`` with the given stage pools."""
+    stages.STAGE_IO_WORKERS, stages.STAGE_CPU_WORKERS = io_workers, cpu_workers
+    for executor in stages._executors.values():
+        executor.shutdown()
+    stages._executors.clear()
+    walls, busy = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        _, timings = analyzer.analyze_text_timed(text)
+        walls.append(time.perf_counter() - start)
+        busy.append(sum(timings.values()))
+    return statistics.median(walls), statistics.median(busy)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare running analysis stages inline and on the stage thread pools, and estimate what a process pool would add.')
+    parser.add_argument('--sizes', default='10KB,100KB,1MB', help='comma separated text sizes')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--model-latency', type=float, default=0.2, help='seconds each stub summarizer call takes (released GIL, like inference)')
+    parser.add_argument('--watson-latency', type=float, default=0.05, help='seconds the stub Watson server takes per request')
+    parser.add_argument('--output', help='also write the report as JSON')
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='analyzer-stages-')
+    os.environ.update({'CACHE_ENABLED': 'false', 'NEAR_DUP_ENABLED': 'false', 'MODEL_PRELOAD': ''})
+    os.environ['WATSON_BREAKER_PATH'] = os.path.join(workdir, 'watson_breaker.sqlite3')
+    server = StubWatsonServer(latency=args.watson_latency).start()
+    os.environ.update({'WATSON_API_KEY': 'benchmark', 'WATSON_SERVICE_URL': server.url, 'WATSON_IAM_URL': server.url})
+
+    import analyzer
+    import stages
+    from document import Document
+    from model_registry import registry
+    registry._loader = stub_loader(args.model_latency)
+    logging.getLogger().setLevel(logging.WARNING)
+    defaults = stages.STAGE_IO_WORKERS, stages.STAGE_CPU_WORKERS
+
+    report = []
+    try:
+        for size in [parse_size(s) for s in args.sizes.split(',') if s.strip()]:
+            text = analyzer.sanitize_text(generate_text(size, seed=size))
+            analyzer.analyze_text_timed(text)  # warm up lazy imports and the model
+            inline, busy = run_mode(analyzer, stages, text, 0, 0, args.repeat)
+            threaded, _ = run_mode(analyzer, stages, text, *defaults, args.repeat)
+            values = {'text': text, 'document': Document(text), 'watson': None, 'near_duplicate': None, 'language': {'language': 'en'}}
+            transfer = sum(transfer_seconds(values[name]) for inputs in CPU_STAGE_INPUTS.values() for name in inputs)
+            entry = {
+                'size': size,
+                'inline_seconds': round(inline, 4),
+                'threads_seconds': round(threaded, 4),
+                'speedup': round(inline / threaded, 2) if threaded else None,
+                'stage_seconds': round(busy, 4),
+                'process_transfer_seconds': round(transfer, 4),
+            }
+            report.append(entry)
+            print(
+                f"{format_size(size):>6}: inline {inline * 1000:8.1f} ms, threads {threaded * 1000:8.1f} ms "
+                f"({entry['speedup']}x), stages sum {busy * 1000:8.1f} ms; pickling stage inputs for a process pool "
+                f"would add {transfer * 1000:6.1f} ms"
+            )
+    finally:
+        server.stop()
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'stage_workers': {'io': defaults[0], 'cpu': defaults[1]}, 'sizes': report}, f, indent=2)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
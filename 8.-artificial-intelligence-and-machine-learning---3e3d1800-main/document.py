@@ -0,0 +1,102 @@
+import re
+from array import array
+
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n{2,}')
+# array typecode for token ids, counts and offsets: 32-bit on every supported platform
+# (enough for texts under 2 GB); 'l' is 64-bit on Linux and would double the size
+INDEX_TYPECODE = 'i'
+
+class Document:
+    """Tokens, term frequencies and sentence boundaries of a text, built once.
+
+    Tokens are the lowercased ``\\w+`` words of the text. Each distinct word
+    is stored once in ``terms``; the token stream is kept as arrays of term
+    ids and character offsets into ``text``, so a multi-megabyte document
+    costs a few bytes per token rather than a string object per word.
+    """
+
+    __slots__ = ('text', 'terms', 'term_ids', 'counts', 'starts', 'ends', '_index', '_sentence_starts')
+
+    def __init__(self, text):
+        self.text = text
+        self.terms = []
+        self.term_ids = array(INDEX_TYPECODE)
+        self.counts = array(INDEX_TYPECODE)
+        self.starts = array(INDEX_TYPECODE)
+        self.ends = array(INDEX_TYPECODE)
+        self._index = {}
+        self._sentence_starts = None
+
+        lowered = text.lower()
+        # Lowercasing a few characters changes the string length; then tokenize
+        # the original so offsets still point into ``text``
+        same_length = len(lowered) == len(text)
+        index, terms, counts = self._index, self.terms, self.counts
+        term_ids, starts, ends = self.term_ids, self.starts, self.ends
+        for match in TOKEN_PATTERN.finditer(lowered if same_length else text):
+            word = match.group() if same_length else match.group().lower()
+            term_id = index.get(word)
+            if term_id is None:
+                term_id = index[word] = len(terms)
+                terms.append(word)
+                counts.append(0)
+            counts[term_id] += 1
+            term_ids.append(term_id)
+            starts.append(match.start())
+            ends.append(match.end())
+
+    def __len__(self):
+        return len(self.term_ids)
+
+    def token(self, i):
+        """Return the lowercased text of token ``i``."""
+        return self.terms[self.term_ids[i]]
+
+    def span(self, i):
+        """Return the ``(start, end)`` character offsets of token ``i``."""
+        return self.starts[i], self.ends[i]
+
+    def count(self, term):
+        """Return how often ``term`` (lowercase) occurs as a token."""
+        term_id = self._index.get(term)
+        return self.counts[term_id] if term_id is not None else 0
+
+    def term_id(self, term):
+        """Return the id of ``term`` (lowercase) in ``terms``, or None."""
+        return self._index.get(term)
+
+    def term_frequencies(self):
+        """Yield ``(term, count)`` pairs in order of first occurrence."""
+        return zip(self.terms, self.counts)
+
+    @property
+    def sentence_starts(self):
+        """Character offsets where each sentence begins, computed on first use."""
+        if self._sentence_starts is None:
+            starts = array(INDEX_TYPECODE, [0])
+            starts.extend(match.end() for match in SENTENCE_BOUNDARY.finditer(self.text))
+            self._sentence_starts = starts
+        return self._sentence_starts
+
+    def sentence_spans(self):
+        """Yield ``(start, end)`` offsets of the non-empty, whitespace-trimmed sentences."""
+        text = self.text
+        starts = self.sentence_starts
+        for i, start in enumerate(starts):
+            end = starts[i + 1] if i + 1 < len(starts) else len(text)
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+            if start < end:
+                yield start, end
+
+    def sentences(self):
+        """Yield the sentence strings."""
+        for start, end in self.sentence_spans():
+            yield self.text[start:end]
+
+def as_document(text):
+    """Return ``text`` if it is already a Document, else build one."""
+    return text if isinstance(text, Document) else Document(text)
@@ -0,0 +1,265 @@
+import os
+import io
+import csv
+import json
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CACHE_MB = float(os.getenv('EXPORT_CACHE_MB', '64'))
+EXPORT_TTL_SECONDS = float(os.getenv('EXPORT_TTL_SECONDS', '3600'))
+# Rendered exports larger than this are kept as files instead of in memory
+EXPORT_FILE_MB = float(os.getenv('EXPORT_FILE_MB', '4'))
+EXPORT_CLEANUP_INTERVAL = 60  # seconds between background sweeps
+FONT_PATH = 'DejaVuSans.ttf'
+
+MIMETYPES = {
+    'txt': 'text/plain',
+    'json': 'application/json',
+    'csv': 'text/csv',
+    'pdf': 'application/pdf',
+}
+
+class FontMissing(Exception):
+    """Raised when the Unicode font needed for PDF reports is not installed."""
+
+def render_txt(result):
+    out = io.StringIO()
+    out.write(f"File: {result.get('filename', result['output_filename'])}\n")
+    out.write("Extracted Text:\n")
+    out.write(result['text'] + "\n\n")
+    out.write(f"Language: {result['language']}\n")
+    out.write(f"Sentiment: {result['sentiment']['label']} (Score: {result['sentiment']['score']})\n")
+    out.write(f"Summary: {result['summary']}\n\n")
+    out.write("Keywords:\n")
+    for kw in result['keywords']:
+        out.write(f"{kw['text']} (Relevance: {kw['relevance']})\n")
+    out.write("\nEntities:\n")
+    for ent in result['entities']:
+        out.write(f"{ent['text']} - {ent['type']} (Relevance: {ent['relevance']})\n")
+    out.write("\nCustom Keywords:\n")
+    for kw in result['custom_keywords']:
+        out.write(f"{kw['text']} (Relevance: {kw.get('relevance', 'N/A')})\n")
+    return out.getvalue().encode('utf-8')
+
+def render_json(result):
+    json_data = {
+        "file": result['output_filename'],
+        "text": result['text'],
+        "language": result['language'],
+        "sentiment": result['sentiment'],
+        "summary": result['summary'],
+        "keywords": result['keywords'],
+        "entities": result['entities'],
+        "custom_keywords": result['custom_keywords']
+    }
+    return json.dumps(json_data, indent=2).encode('utf-8')
+
+def render_csv(result):
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator='\n')
+    writer.writerow(["Type", "Text", "Relevance", "Entity Type"])
+    for kw in result['keywords']:
+        writer.writerow(["Keyword", kw['text'], kw['relevance'], ""])
+    for ent in result['entities']:
+        writer.writerow(["Entity", ent['text'], ent['relevance'], ent['type']])
+    for kw in result['custom_keywords']:
+        writer.writerow(["Custom Keyword", kw['text'], kw.get('relevance', 'N/A'), ""])
+    return output.getvalue().encode('utf-8')
+
+def render_pdf(result):
+    from fpdf import FPDF
+
+    # Sanitize text to avoid encoding issues
+    def sanitize_text(text):
+        if not isinstance(text, str):
+            text = str(text)
+        return text.encode('utf-8', errors='replace').decode('utf-8').replace('\ufffd', '')
+
+    if not os.path.exists(FONT_PATH):
+        raise FontMissing(f"Font file {FONT_PATH} not found")
+
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.add_font('DejaVu', '', FONT_PATH, uni=True)
+    pdf.set_font('DejaVu', '', 16)
+    pdf.cell(0, 10, "AI Document Analysis Report", ln=True, align='C')
+    pdf.set_font('DejaVu', '', 12)
+    pdf.ln(10)
+
+    def section(title, body):
+        pdf.set_font('DejaVu', '', 14)
+        pdf.cell(0, 8, title, ln=True)
+        pdf.set_font('DejaVu', '', 12)
+        for line in body:
+            pdf.multi_cell(0, 8, line)
+        pdf.ln(5)
+
+    sentiment = result['sentiment']
+    sentiment_text = f"{sanitize_text(sentiment['label'])} (Score: {sanitize_text(sentiment['score'])})" if isinstance(sentiment, dict) else sanitize_text(sentiment)
+    section("File", [sanitize_text(result['output_filename'])])
+    section("Language", [sanitize_text(result['language'])])
+    section("Sentiment", [sentiment_text])
+    section("Summary", [sanitize_text(result['summary'])])
+    section("Extracted Text", [sanitize_text(result['text'][:1000])])  # limited to 1000 chars
+    section("Keywords", [f"- {sanitize_text(kw['text'])} (Relevance: {sanitize_text(kw['relevance'])})" for kw in result['keywords']])
+    section("Entities", [
+        f"- {sanitize_text(ent['text'])} ({sanitize_text(ent['type'])}, Relevance: {sanitize_text(ent['relevance'])})"
+        for ent in result['entities']
+    ])
+    section("Custom Keywords", [
+        f"- {sanitize_text(kw['text'])} (Relevance: {sanitize_text(kw.get('relevance', 'N/A'))})"
+        for kw in result['custom_keywords']
+    ])
+
+    data = pdf.output(dest='S')
+    # PyFPDF returns a latin-1 str, fpdf2 a bytearray
+    return data.encode('latin-1') if isinstance(data, str) else bytes(data)
+
+RENDERERS = {
+    'txt': render_txt,
+    'json': render_json,
+    'csv': render_csv,
+    'pdf': render_pdf,
+}
+
+class ExportCache:
+    """Rendered report exports, built once per result and format.
+
+    Small exports are kept in an in-memory LRU bounded by ``max_bytes``;
+    exports larger than ``file_bytes`` are written to ``directory`` and
+    served from there, so every process sharing the directory reuses them.
+    Entries expire ``ttl`` seconds after rendering and a background thread
+    removes expired files.
+    """
+
+    def __init__(self, directory, max_bytes=None, file_bytes=None, ttl=None):
+        self.directory = directory
+        self.max_bytes = max_bytes if max_bytes is not None else int(EXPORT_CACHE_MB * 1024 * 1024)
+        self.file_bytes = file_bytes if file_bytes is not None else int(EXPORT_FILE_MB * 1024 * 1024)
+        self.ttl = ttl if ttl is not None else EXPORT_TTL_SECONDS
+        self._entries = OrderedDict()  # (doc_id, fmt) -> (created_at, bytes)
+        self._size = 0
+        self._lock = threading.Lock()
+        self._render_locks = {}
+        self._stop = threading.Event()
+        self._cleaner = None
+        os.makedirs(directory, exist_ok=True)
+
+    def get(self, doc_id, fmt, result_loader):
+        """Return ``(bytes, None)`` or ``(None, path)`` for an export, rendering it on first use.
+
+        Returns None for an unknown document or format.
+        ``result_loader`` is called only when the export has to be rendered
+        and must return the stored result dict, or None if it is gone.
+        """
+        if not doc_id or not doc_id.isalnum() or fmt not in RENDERERS:
+            return None  # ids name files in the export directory
+        key = (doc_id, fmt)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            render_lock = self._render_locks.setdefault(key, threading.Lock())
+        try:
+            with render_lock:
+                # Another request may have rendered it while we waited
+                cached = self._lookup(key)
+                if cached is not None:
+                    return cached
+                result = result_loader()
+                if result is None:
+                    return None
+                start = time.perf_counter()
+                data = RENDERERS[fmt](result)
+                logger.info(f"Rendered {fmt.upper()} export for {doc_id} ({len(data)} bytes) in {time.perf_counter() - start:.3f}s")
+                return self._store(key, data)
+        finally:
+            # Also on early returns and errors; requests still waiting on the lock hold their own reference
+            with self._lock:
+                if self._render_locks.get(key) is render_lock:
+                    del self._render_locks[key]
+
+    def _path(self, key):
+        doc_id, fmt = key
+        return os.path.join(self.directory, f"{doc_id}.{fmt}")
+
+    def _lookup(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] <= self.ttl:
+                    self._entries.move_to_end(key)
+                    return entry[1], None
+                self._drop(key)
+        path = self._path(key)
+        try:
+            if now - os.path.getmtime(path) <= self.ttl:
+                return None, path
+        except OSError:
+            pass
+        return None
+
+    def _store(self, key, data):
+        if len(data) > self.file_bytes or len(data) > self.max_bytes:
+            path = self._path(key)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            return None, path
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time(), data)
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+        return data, None
+
+    def _drop(self, key):
+        _, data = self._entries.pop(key)
+        self._size -= len(data)
+
+    def cleanup(self):
+        """Remove expired exports from memory and disk; returns the number removed."""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for key in [key for key, (created_at, _) in self._entries.items() if now - created_at > self.ttl]:
+                self._drop(key)
+                removed += 1
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if now - os.path.getmtime(path) > self.ttl:
+                    os.remove(path)
+                    removed += 1
+            except OSError as e:
+                logger.warning(f"Could not remove expired export {path}: {str(e)}")
+        if removed:
+            logger.info(f"Removed {removed} expired exports")
+        return removed
+
+    def start_cleanup(self, interval=None):
+        """Run ``cleanup`` every ``interval`` seconds on a daemon thread."""
+        if self._cleaner is not None:
+            return
+        interval = interval or EXPORT_CLEANUP_INTERVAL
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    self.cleanup()
+                except Exception as e:
+                    logger.error(f"Export cleanup failed: {str(e)}", exc_info=True)
+
+        self._cleaner = threading.Thread(target=run, name='export-cleanup', daemon=True)
+        self._cleaner.start()
+
+    def stop_cleanup(self):
+        self._stop.set()
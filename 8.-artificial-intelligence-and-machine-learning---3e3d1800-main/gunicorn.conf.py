@@ -0,0 +1,31 @@
+# gunicorn settings for the analyzer: `python server.py` or `gunicorn -c gunicorn.conf.py`
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import server
+from server import on_starting, when_ready, post_fork, worker_exit, child_exit, on_exit  # noqa: F401 (gunicorn hooks)
+
+# Load everything in the master so workers share it, and analyze in the
+# request thread: workers already run in parallel
+os.environ.setdefault('MODEL_PRELOAD', 'all')
+os.environ.setdefault('ANALYZER_PRELOAD', 'all')
+os.environ.setdefault('ANALYZE_WORKERS', '0')
+# Workers share their metrics through this directory, so /metrics covers all of them
+if not os.environ.get('METRICS_DIR'):
+    os.environ['METRICS_DIR'] = tempfile.mkdtemp(prefix='analyzer-metrics-')
+# The master imports the app; post_fork lets only the first worker requeue unfinished jobs
+os.environ['JOB_RESUME'] = 'false'
+
+wsgi_app = 'app:app'
+preload_app = True
+bind = [f"[{server.SERVER_HOST}]:{server.SERVER_PORT}" if ':' in server.SERVER_HOST else f"{server.SERVER_HOST}:{server.SERVER_PORT}"]
+workers = server.SERVER_WORKERS or os.cpu_count() or 1
+worker_class = 'gthread'
+threads = server.SERVER_THREADS
+max_requests = server.SERVER_MAX_REQUESTS
+max_requests_jitter = server.SERVER_MAX_REQUESTS // 10
+graceful_timeout = int(server.SERVER_GRACEFUL_TIMEOUT)
+backlog = server.SERVER_BACKLOG
+pidfile = server.SERVER_PID_FILE
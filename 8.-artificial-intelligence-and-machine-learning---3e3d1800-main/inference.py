@@ -0,0 +1,168 @@
+import os
+import shutil
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# torch: full precision (default); int8: PyTorch dynamic int8 quantization of
+# the Linear layers; onnx: ONNX Runtime; onnx-int8: ONNX Runtime with
+# dynamically quantized weights. Either one backend for every model, or
+# comma-separated name=backend pairs (e.g. "int8,question-answering=onnx").
+MODEL_BACKEND = os.getenv('MODEL_BACKEND', 'torch')
+BACKENDS = ('torch', 'int8', 'onnx', 'onnx-int8')
+# Threads per operator (intra-op) and across independent operators (inter-op); 0 = library default
+INFERENCE_THREADS = int(os.getenv('INFERENCE_THREADS', '0'))
+INFERENCE_INTEROP_THREADS = int(os.getenv('INFERENCE_INTEROP_THREADS', '0'))
+# Exported ONNX models are written here once and reused
+ONNX_EXPORT_DIR = os.getenv('ONNX_EXPORT_DIR', os.path.join('models', 'onnx'))
+EXPORT_MARKER = '.complete'  # written last into an export directory; without it the export is redone
+
+_threads_configured = False
+_threads_lock = threading.Lock()
+
+def parse_backends(setting=None):
+    """Return ``(default backend, {model name: backend})`` from a ``MODEL_BACKEND`` value."""
+    default, overrides = 'torch', {}
+    for part in (MODEL_BACKEND if setting is None else setting).split(','):
+        part = part.strip().lower()
+        if not part:
+            continue
+        name, _, backend = part.rpartition('=')
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown model backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+        if name:
+            overrides[name.strip()] = backend
+        else:
+            default = backend
+    return default, overrides
+
+def backend_for(name, setting=None):
+    """Return the configured backend for the registry model ``name``."""
+    default, overrides = parse_backends(setting)
+    return overrides.get(name, default)
+
+def configure_threads():
+    """Apply ``INFERENCE_THREADS``/``INFERENCE_INTEROP_THREADS`` to PyTorch once per process."""
+    global _threads_configured
+    with _threads_lock:
+        if _threads_configured:
+            return
+        _threads_configured = True
+        try:
+            import torch
+        except ImportError:
+            return
+        if INFERENCE_THREADS > 0:
+            torch.set_num_threads(INFERENCE_THREADS)
+        if INFERENCE_INTEROP_THREADS > 0:
+            try:
+                torch.set_num_interop_threads(INFERENCE_INTEROP_THREADS)
+            except RuntimeError as e:
+                # Only allowed before PyTorch has started any parallel work
+                logger.warning(f"Could not set inter-op threads: {str(e)}")
+
+def quantize_int8(model):
+    """Return ``model`` with its Linear layers dynamically quantized to int8 (CPU only)."""
+    import torch
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+def ort_session_options():
+    import onnxruntime
+    options = onnxruntime.SessionOptions()
+    if INFERENCE_THREADS > 0:
+        options.intra_op_num_threads = INFERENCE_THREADS
+    if INFERENCE_INTEROP_THREADS > 0:
+        options.inter_op_num_threads = INFERENCE_INTEROP_THREADS
+        options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+    return options
+
+ORT_MODEL_CLASSES = {
+    'summarization': 'ORTModelForSeq2SeqLM',
+    'question-answering': 'ORTModelForQuestionAnswering',
+}
+
+def _export_once(target, build):
+    """Return ``target``, first running ``build(directory)`` to create it unless a complete export is there.
+
+    ``build`` writes into a temporary directory next to ``target``, which
+    gets ``EXPORT_MARKER`` and is then renamed into place, so an interrupted
+    export is never mistaken for a finished one. When several processes
+    export at once, the first rename wins and the others discard their copy.
+    """
+    marker = os.path.join(target, EXPORT_MARKER)
+    if os.path.exists(marker):
+        return target
+    parent = os.path.dirname(target)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent or None, prefix=f"{os.path.basename(target)}.", suffix='.tmp')
+    try:
+        build(tmp_dir)
+        open(os.path.join(tmp_dir, EXPORT_MARKER), 'w').close()
+        if os.path.exists(target) and not os.path.exists(marker):
+            logger.warning(f"Removing incomplete export {target}")
+            shutil.rmtree(target, ignore_errors=True)
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            if not os.path.exists(marker):
+                raise
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    return target
+
+def export_onnx(task, model, quantize=False):
+    """Export ``model`` to ONNX (and optionally quantize it) under ``ONNX_EXPORT_DIR``; return the directory.
+
+    Exports are reused across processes and restarts, since exporting a
+    large model takes minutes.
+    """
+    import optimum.onnxruntime as ort
+    model_class = getattr(ort, ORT_MODEL_CLASSES[task])
+    base_dir = os.path.join(ONNX_EXPORT_DIR, model.replace('/', '--'))
+
+    def export(directory):
+        logger.info(f"Exporting {model} to ONNX in {base_dir}")
+        model_class.from_pretrained(model, export=True).save_pretrained(directory)
+
+    _export_once(base_dir, export)
+    if not quantize:
+        return base_dir
+
+    def quantize_export(directory):
+        from optimum.onnxruntime.configuration import AutoQuantizationConfig
+        logger.info(f"Quantizing ONNX export of {model} to int8 in {base_dir}-int8")
+        config = AutoQuantizationConfig.avx2(is_static=False, per_channel=False)
+        for file_name in sorted(f for f in os.listdir(base_dir) if f.endswith('.onnx')):
+            quantizer = ort.ORTQuantizer.from_pretrained(base_dir, file_name=file_name)
+            quantizer.quantize(save_dir=directory, quantization_config=config)
+        # Quantized files are saved as <name>_quantized.onnx
+        suffix = '_quantized.onnx'
+        for file_name in os.listdir(directory):
+            if file_name.endswith(suffix):
+                os.replace(os.path.join(directory, file_name), os.path.join(directory, file_name[:-len(suffix)] + '.onnx'))
+        for file_name in os.listdir(base_dir):
+            if file_name != EXPORT_MARKER and not file_name.endswith('.onnx') and not os.path.exists(os.path.join(directory, file_name)):
+                shutil.copy2(os.path.join(base_dir, file_name), directory)
+
+    return _export_once(f"{base_dir}-int8", quantize_export)
+
+def load_pipeline(task, model, backend='torch'):
+    """Load a Hugging Face pipeline for ``task`` running on ``backend`` (see ``MODEL_BACKEND``)."""
+    from transformers import pipeline, AutoTokenizer
+    configure_threads()
+    if backend == 'torch':
+        return pipeline(task, model=model)
+    if backend == 'int8':
+        pipe = pipeline(task, model=model)
+        pipe.model = quantize_int8(pipe.model)
+        return pipe
+    if backend in ('onnx', 'onnx-int8'):
+        import optimum.onnxruntime as ort
+        model_dir = export_onnx(task, model, quantize=backend == 'onnx-int8')
+        model_class = getattr(ort, ORT_MODEL_CLASSES[task])
+        ort_model = model_class.from_pretrained(model_dir, session_options=ort_session_options())
+        return pipeline(task, model=ort_model, tokenizer=AutoTokenizer.from_pretrained(model))
+    raise ValueError(f"Unknown model backend {backend!r}")
@@ -0,0 +1,258 @@
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from analyzer import process_file, attach_summaries, get_cached_analysis, cache_analysis
+from analysis_cache import file_sha256
+from worker_pool import submit
+import metrics
+
+logger = logging.getLogger(__name__)
+
+JOB_DB_PATH = os.getenv('JOB_DB_PATH', 'jobs.sqlite3')
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    custom_keywords TEXT NOT NULL,
+    owner TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    filename TEXT NOT NULL,
+    file_path TEXT,
+    output_filename TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (job_id, position)
+);
+"""
+
+class JobStore:
+    """SQLite-backed state for analysis jobs and their files.
+
+    Job status moves from ``queued`` to ``running`` to ``done``; each file
+    moves from ``queued`` to ``running`` to ``done`` or ``error``.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or JOB_DB_PATH
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+            if 'owner' not in [row['name'] for row in conn.execute('PRAGMA table_info(jobs)')]:
+                conn.execute('ALTER TABLE jobs ADD COLUMN owner TEXT')
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create_job(self, files, custom_keywords, owner=None):
+        """Record a job for ``files``, a list of (filename, output_filename, file_path, error) tuples.
+
+        Files saved with an error are stored as already failed. ``owner``
+        scopes near-duplicate reuse for the job's files.
+        """
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO jobs (id, status, custom_keywords, owner, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (job_id, 'queued', json.dumps(custom_keywords), owner, now, now)
+            )
+            conn.executemany(
+                'INSERT INTO job_files (job_id, position, filename, file_path, output_filename, status, error, updated_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (job_id, position, filename, file_path, output_filename, 'error' if error else 'queued', error, now)
+                    for position, (filename, output_filename, file_path, error) in enumerate(files)
+                ]
+            )
+            self._refresh_status(conn, job_id, now)
+        return job_id
+
+    def get_job(self, job_id):
+        """Return a job with its files in upload order, or None."""
+        with self._connect() as conn:
+            job = conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
+            if job is None:
+                return None
+            rows = conn.execute('SELECT * FROM job_files WHERE job_id = ? ORDER BY position', (job_id,)).fetchall()
+        files = [
+            {
+                'position': row['position'],
+                'filename': row['filename'],
+                'file_path': row['file_path'],
+                'output_filename': row['output_filename'],
+                'status': row['status'],
+                'result': json.loads(row['result']) if row['result'] else None,
+                'error': row['error'],
+            }
+            for row in rows
+        ]
+        return {
+            'id': job['id'],
+            'status': job['status'],
+            'custom_keywords': json.loads(job['custom_keywords']),
+            'owner': job['owner'],
+            'created_at': job['created_at'],
+            'updated_at': job['updated_at'],
+            'files': files,
+        }
+
+    def claim_file(self, job_id, position):
+        """Mark a queued file as running; returns False if it was not queued."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE job_files SET status = 'running', updated_at = ? WHERE job_id = ? AND position = ? AND status = 'queued'",
+                (time.time(), job_id, position)
+            )
+            if cursor.rowcount:
+                conn.execute("UPDATE jobs SET status = 'running', updated_at = ? WHERE id = ?", (time.time(), job_id))
+            return cursor.rowcount == 1
+
+    def finish_file(self, job_id, position, result=None, error=None):
+        """Store a file's result or error and close the job once every file is finished."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'UPDATE job_files SET status = ?, result = ?, error = ?, file_path = NULL, updated_at = ? WHERE job_id = ? AND position = ?',
+                ('error' if error else 'done', json.dumps(result) if result is not None else None, error, now, job_id, position)
+            )
+            self._refresh_status(conn, job_id, now)
+
+    def requeue_interrupted(self):
+        """Return files left running by a previous process to the queue."""
+        with self._connect() as conn:
+            cursor = conn.execute("UPDATE job_files SET status = 'queued', updated_at = ? WHERE status = 'running'", (time.time(),))
+            return cursor.rowcount
+
+    def unfinished_jobs(self):
+        """Return ids of jobs that still have files to process, oldest first."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT id FROM jobs WHERE status != 'done' ORDER BY created_at").fetchall()
+        return [row['id'] for row in rows]
+
+    def _refresh_status(self, conn, job_id, now):
+        remaining = conn.execute(
+            "SELECT COUNT(*) FROM job_files WHERE job_id = ? AND status IN ('queued', 'running')", (job_id,)
+        ).fetchone()[0]
+        if not remaining:
+            conn.execute("UPDATE jobs SET status = 'done', updated_at = ? WHERE id = ?", (now, job_id))
+
+class JobRunner:
+    """Process jobs in background threads, fanning files out to the analysis process pool.
+
+    ``build_result(filename, output_filename, text, analysis, timings=None, owner=None)``
+    turns a finished analysis into the stored result dict; ``timings`` is
+    passed when ``RESULT_TIMINGS`` is enabled and ``owner`` is the job's. One runner should own a
+    given job database: on ``resume`` it requeues files left running.
+    """
+
+    def __init__(self, store, build_result, workers=None):
+        self.store = store
+        self.build_result = build_result
+        self._executor = ThreadPoolExecutor(max_workers=workers or JOB_WORKERS, thread_name_prefix='job')
+
+    def submit(self, job_id):
+        """Queue a job for background processing."""
+        self._executor.submit(self._run, job_id)
+
+    def resume(self):
+        """Requeue jobs interrupted by a restart."""
+        requeued = self.store.requeue_interrupted()
+        job_ids = self.store.unfinished_jobs()
+        for job_id in job_ids:
+            self.submit(job_id)
+        if job_ids:
+            logger.info(f"Resumed {len(job_ids)} unfinished jobs ({requeued} interrupted files)")
+
+    def shutdown(self, wait=True):
+        """Stop accepting jobs; with ``wait`` block until the jobs already submitted finish."""
+        self._executor.shutdown(wait=wait)
+
+    def _run(self, job_id):
+        running = {}  # position -> claimed file without a stored outcome yet
+        try:
+            job = self.store.get_job(job_id)
+            if job is None:
+                return
+            pending = {}
+            for file in job['files']:
+                if file['status'] != 'queued' or not self.store.claim_file(job_id, file['position']):
+                    continue
+                running[file['position']] = file
+                try:
+                    try:
+                        file['hash'] = file_sha256(file['file_path'])
+                        cached = get_cached_analysis(file['hash'], job['custom_keywords'])
+                    except Exception as e:
+                        logger.error(f"Cache lookup failed for {file['filename']}: {str(e)}", exc_info=True)
+                        file['hash'], cached = None, None
+                    if cached:
+                        text, analysis = cached
+                        result = self.build_result(file['filename'], file['output_filename'], text, analysis, owner=job['owner'])
+                        self._finish(job_id, file, result=result)
+                        del running[file['position']]
+                        continue
+                    file_type = os.path.splitext(file['filename'])[1].lower()
+                    future = submit(process_file, file['file_path'], file_type, job['custom_keywords'], file['hash'], job['owner'])
+                    pending[future] = file
+                except Exception as e:
+                    self._fail(job_id, file, e)
+                    del running[file['position']]
+
+            # Each file is timed from when a worker picks it up; one that runs too long fails on its own
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file = pending.pop(future)
+                    try:
+                        text, analysis, events = future.result()
+                        with metrics.collect() as summary_events:
+                            analysis = attach_summaries([text], [analysis])[0]
+                        events += summary_events
+                        metrics.apply(events)
+                        cache_analysis(file['hash'], job['custom_keywords'], text, analysis)
+                        timings = metrics.breakdown(events) if metrics.RESULT_TIMINGS else None
+                        result = self.build_result(file['filename'], file['output_filename'], text, analysis, timings, job['owner'])
+                        self._finish(job_id, file, result=result)
+                    except Exception as e:
+                        self._fail(job_id, file, e)
+                    del running[file['position']]
+            logger.info(f"Job {job_id} finished")
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {str(e)}", exc_info=True)
+            # Files left running would never finish, and neither would the job
+            for file in running.values():
+                try:
+                    self._finish(job_id, file, error=f"Error processing {file['filename']}: {str(e)}")
+                except Exception:
+                    logger.error(f"Could not record the failure of {file['filename']} in job {job_id}", exc_info=True)
+
+    def _fail(self, job_id, file, error):
+        logger.error(f"Job {job_id} failed processing {file['filename']}: {str(error)}", exc_info=error)
+        metrics.inc(metrics.ERRORS, stage='analyze')
+        self._finish(job_id, file, error=f"Error processing {file['filename']}: {str(error)}")
+
+    def _finish(self, job_id, file, result=None, error=None):
+        self.store.finish_file(job_id, file['position'], result=result, error=error)
+        if file['file_path'] and os.path.exists(file['file_path']):
+            os.remove(file['file_path'])
@@ -0,0 +1,124 @@
+import os
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Language identification reads at most LANGUAGE_WINDOWS windows of about
+# LANGUAGE_WINDOW_CHARS characters, spread evenly over the document
+# (many short windows: a window straddling two languages is identified as one of them)
+LANGUAGE_WINDOWS = int(os.getenv('LANGUAGE_WINDOWS', '10'))
+LANGUAGE_WINDOW_CHARS = int(os.getenv('LANGUAGE_WINDOW_CHARS', '300'))
+# Windows identified with less confidence do not make a document mixed-language
+LANGUAGE_SEGMENT_CONFIDENCE = float(os.getenv('LANGUAGE_SEGMENT_CONFIDENCE', '0.8'))
+# Share of the (length weighted) windows a language other than DEFAULT_LANGUAGE needs
+# before a document that is partly in DEFAULT_LANGUAGE is reported in that language
+LANGUAGE_MAJORITY = float(os.getenv('LANGUAGE_MAJORITY', '0.55'))
+LANGUAGE_SEED = 0  # langdetect samples randomly; a fixed seed makes results repeatable (and cacheable)
+DEFAULT_LANGUAGE = 'en'
+BOUNDARY_SEARCH = 64  # characters searched for whitespace when aligning a window to word boundaries
+
+_seeded = False
+
+def _detect_langs(sample):
+    global _seeded
+    from langdetect import DetectorFactory, detect_langs
+    if not _seeded:
+        # Set once, when langdetect is first imported: every Detector copies the
+        # factory seed into its own random.Random, so concurrent detections need no lock
+        DetectorFactory.seed = LANGUAGE_SEED
+        _seeded = True
+    return detect_langs(sample)
+
+def _word_boundary(text, position):
+    """Return the first position at or after ``position`` that follows whitespace (or ``position`` itself)."""
+    for i in range(position, min(position + BOUNDARY_SEARCH, len(text))):
+        if text[i].isspace():
+            return i + 1
+    return position
+
+def sample_windows(text, windows=None, window_chars=None):
+    """Return up to ``windows`` ``(start, end)`` spans of about ``window_chars`` characters spread evenly over ``text``.
+
+    The first window starts at the beginning and the last ends at the end
+    of the text; text shorter than one window is a single span.
+    """
+    windows = LANGUAGE_WINDOWS if windows is None else windows
+    window_chars = LANGUAGE_WINDOW_CHARS if window_chars is None else window_chars
+    length = len(text)
+    if length <= window_chars:
+        return [(0, length)]
+    count = max(min(windows, math.ceil(length / window_chars)), 1)
+    spans = []
+    for i in range(count):
+        start = round(i * (length - window_chars) / (count - 1)) if count > 1 else 0
+        start = _word_boundary(text, start) if start else 0
+        end = min(start + window_chars, length)
+        if end < length:
+            end = _word_boundary(text, end)
+        spans.append((start, end))
+    return spans
+
+def _segments(text_length, windows):
+    """Extend identified windows to cover the whole text and merge neighbours in the same language."""
+    segments = []
+    for i, window in enumerate(windows):
+        start = 0 if i == 0 else (windows[i - 1]['end'] + window['start']) // 2
+        end = text_length if i == len(windows) - 1 else (window['end'] + windows[i + 1]['start']) // 2
+        if segments and segments[-1]['language'] == window['language']:
+            previous = segments[-1]
+            previous['confidence'] = round(min(previous['confidence'], window['confidence']), 4)
+            previous['end'] = end
+        else:
+            segments.append({'start': start, 'end': end, 'language': window['language'], 'confidence': window['confidence']})
+    return segments
+
+def identify_language(text, windows=None, window_chars=None, majority=None):
+    """Identify the language of ``text`` from a bounded sample of windows.
+
+    Each window is identified separately with a seeded ``langdetect``, so
+    the cost does not grow with the document and the same text always gets
+    the same answer. Returns ``{'language', 'confidence', 'segments'}``:
+    the language with the highest probability over the windows, each window
+    weighted by its number of letters; its weighted mean probability; and
+    the text split into ``{'start', 'end', 'language', 'confidence'}`` runs
+    of windows in the same language. A language other than
+    ``DEFAULT_LANGUAGE`` wins over a document partly in ``DEFAULT_LANGUAGE``
+    only with more than ``majority`` (``LANGUAGE_MAJORITY``) of the weight,
+    so a few paragraphs in another language do not relabel an English
+    document. Windows without letters (tables, numbers) are skipped.
+    """
+    from langdetect import LangDetectException
+    majority = LANGUAGE_MAJORITY if majority is None else majority
+    identified = []
+    totals = {}
+    total_weight = 0
+    for start, end in sample_windows(text, windows, window_chars):
+        sample = text[start:end]
+        try:
+            candidates = _detect_langs(sample)
+        except LangDetectException:
+            continue
+        if not candidates:
+            continue
+        weight = sum(1 for c in sample if c.isalpha())
+        total_weight += weight
+        for candidate in candidates:
+            totals[candidate.lang] = totals.get(candidate.lang, 0.0) + candidate.prob * weight
+        identified.append({'start': start, 'end': end, 'language': candidates[0].lang, 'confidence': round(candidates[0].prob, 4)})
+    if not identified or not total_weight:
+        return {'language': DEFAULT_LANGUAGE, 'confidence': 0.0, 'segments': []}
+    language = max(totals, key=totals.get)
+    if language != DEFAULT_LANGUAGE and DEFAULT_LANGUAGE in totals and totals[language] / total_weight <= majority:
+        language = DEFAULT_LANGUAGE
+    return {
+        'language': language,
+        'confidence': round(totals[language] / total_weight, 4),
+        'segments': _segments(len(text), identified),
+    }
+
+def is_mixed(identification, min_confidence=None):
+    """True when confidently identified segments disagree on the language."""
+    min_confidence = LANGUAGE_SEGMENT_CONFIDENCE if min_confidence is None else min_confidence
+    languages = {s['language'] for s in identification['segments'] if s['confidence'] >= min_confidence}
+    return len(languages) > 1
@@ -0,0 +1,130 @@
+import re
+from collections import deque
+from functools import lru_cache
+from document import TOKEN_PATTERN
+
+# One pass over the text finds every entity type. Each branch can only start
+# at the beginning of a run of its characters (the lookbehinds) and is either
+# deterministic or capped in length, so the scan stays linear in the text
+# length even on long digit-heavy input such as tables of numbers.
+ENTITY_PATTERN = re.compile(r'''
+    (?P<email>(?<![A-Za-z0-9._%+-])[A-Za-z0-9._%+-]{1,64}@(?:[A-Za-z0-9-]{1,63}\.){1,8}[A-Za-z]{2,24}\b)
+  | (?P<phone>(?<![\w+(])\+?\(?\d+\)?(?:[-.\ ]\(?\d+\)?){0,5})
+  | (?P<pair>\b[A-Z][a-z]+(?P<sep>\ |,\ )[A-Z][a-z]+\b)
+''', re.VERBOSE)
+PHONE_MIN_DIGITS, PHONE_MAX_DIGITS = 7, 15
+ENTITY_TYPES = ('Person', 'Phone', 'Email', 'Location')  # output order
+ENTITY_RELEVANCE = {'Person': 0.95, 'Phone': 0.95, 'Email': 0.95, 'Location': 0.90}
+
+def is_phone(candidate):
+    """Return True if a phone-shaped match has a plausible number of digits."""
+    digits = sum(c.isdigit() for c in candidate)
+    return PHONE_MIN_DIGITS <= digits <= PHONE_MAX_DIGITS and candidate.count('(') == candidate.count(')')
+
+def iter_entities(text):
+    """Yield ``(type, text)`` for each entity in the text, left to right."""
+    for match in ENTITY_PATTERN.finditer(text):
+        value = match.group()
+        if match.lastgroup == 'email':
+            yield 'Email', value
+        elif match.lastgroup == 'phone':
+            if value.endswith(')') and value.count(')') > value.count('('):
+                value = value[:-1]  # closing bracket of surrounding text
+            if is_phone(value):
+                yield 'Phone', value
+        else:
+            yield ('Location' if match.group('sep') == ', ' else 'Person'), value
+
+def scan_entities(text, limit=10):
+    """Return up to ``limit`` entities, grouped by type in ``ENTITY_TYPES`` order."""
+    found = {kind: [] for kind in ENTITY_TYPES}
+    for kind, value in iter_entities(text):
+        found[kind].append({'text': value, 'type': kind, 'relevance': ENTITY_RELEVANCE[kind]})
+        if len(found[ENTITY_TYPES[0]]) >= limit:
+            break  # the first type alone fills the result
+    entities = [entity for kind in ENTITY_TYPES for entity in found[kind]]
+    return entities[:limit]
+
+def first_entity(text, kind):
+    """Return the first entity of ``kind`` in the text, or None."""
+    return next((value for found, value in iter_entities(text) if found == kind), None)
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over word sequences.
+
+    Counts every occurrence of many phrases in a single pass over a token
+    stream, so the cost grows with the text rather than with the number of
+    phrases. Phrases are tuples of tokens; overlapping occurrences all count.
+    """
+
+    def __init__(self, phrases):
+        self.phrases = list(phrases)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]
+        for index, tokens in enumerate(self.phrases):
+            if not tokens:
+                continue
+            node = 0
+            for token in tokens:
+                nxt = self._goto[node].get(token)
+                if nxt is None:
+                    nxt = self._goto[node][token] = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(index)
+        # Breadth-first so each node's failure target is final before its children
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for token, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and token not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[child] = self._goto[fail].get(token, 0)
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+    def count(self, tokens):
+        """Return the number of occurrences of each phrase in ``tokens``."""
+        counts = [0] * len(self.phrases)
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for token in tokens:
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            for index in out[node]:
+                counts[index] += 1
+        return counts
+
+@lru_cache(maxsize=32)
+def phrase_matcher(phrases):
+    """Return a cached PhraseMatcher for a tuple of token tuples."""
+    return PhraseMatcher(phrases)
+
+def phrase_counts(doc, phrases):
+    """Count whole-word occurrences of each phrase (lowercase strings) in a Document.
+
+    Single words are read from the document's term frequencies; phrases of
+    several words are counted together in one Aho-Corasick pass over the
+    token stream.
+    """
+    counts = {}
+    multi = {}
+    for phrase in phrases:
+        tokens = tuple(TOKEN_PATTERN.findall(phrase))
+        if len(tokens) == 1:
+            counts[phrase] = doc.count(tokens[0])
+        elif tokens and all(doc.count(token) for token in tokens):
+            multi[phrase] = tokens
+        else:
+            counts[phrase] = 0
+    if multi:
+        matcher = phrase_matcher(tuple(multi.values()))
+        terms = doc.terms
+        for phrase, count in zip(multi, matcher.count(terms[i] for i in doc.term_ids)):
+            counts[phrase] = count
+    return counts
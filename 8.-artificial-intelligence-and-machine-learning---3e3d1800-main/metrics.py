@@ -0,0 +1,388 @@
+import os
+import json
+import math
+import time
+import glob
+import bisect
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Attach a per-stage timing breakdown to every result (also per request with ?timings=1)
+RESULT_TIMINGS = os.getenv('RESULT_TIMINGS', 'false').lower() in ('1', 'true', 'yes')
+
+# Directory shared by the server's worker processes: each writes its metrics there and
+# /metrics merges them all (empty = report only the process that answers the scrape)
+METRICS_DIR = os.getenv('METRICS_DIR', '')
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))  # seconds between writes to METRICS_DIR
+ARCHIVE_FILE = 'archive.json'  # counters and histograms of exited processes
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _load_key(key):
+    # JSON turns the label tuples into lists
+    return tuple(tuple(pair) for pair in key)
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+def _format_value(value):
+    # Full precision: '%g' keeps 6 significant digits, so large counters and sums stopped moving
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NaN'
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, help):
+        self.name, self.help = name, help
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def state(self):
+        with self._lock:
+            return [[key, value] for key, value in self._values.items()]
+
+    def merged(self, states):
+        """Return a copy summing the ``(pid, live, state)`` of several processes."""
+        total = Counter(self.name, self.help)
+        for _, _, state in states:
+            for key, value in state:
+                key = _load_key(key)
+                total._values[key] = total._values.get(key, 0) + value
+        return total
+
+class Gauge:
+    """Gauge set directly, or read from ``fn`` (returning a value or ``{labels tuple: value}``) at scrape time."""
+
+    type = 'gauge'
+
+    def __init__(self, name, help, fn=None):
+        self.name, self.help = name, help
+        self._fn = fn
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def samples(self):
+        if self._fn is not None:
+            value = self._fn()
+            values = value if isinstance(value, dict) else {(): value}
+            return [(self.name, key, v) for key, v in values.items()]
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def state(self):
+        return [[key, value] for _, key, value in self.samples()]
+
+    def merged(self, states):
+        """Return a copy over the live processes: gauges read from ``fn`` get a ``pid`` label, set gauges are summed."""
+        total = Gauge(self.name, self.help)
+        for pid, live, state in states:
+            if not live:
+                continue
+            for key, value in state:
+                key = _load_key(key)
+                if self._fn is not None:
+                    total._values[key + (('pid', str(pid)),)] = value
+                else:
+                    total._values[key] = total._values.get(key, 0) + value
+        return total
+
+class Histogram:
+    type = 'histogram'
+
+    def __init__(self, name, help, buckets=DEFAULT_BUCKETS):
+        self.name, self.help = name, help
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        samples = []
+        for key, values in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                samples.append((f'{self.name}_bucket', key + (('le', f'{bound:g}'),), cumulative))
+            samples.append((f'{self.name}_bucket', key + (('le', '+Inf'),), values[-1]))
+            samples.append((f'{self.name}_sum', key, values[-2]))
+            samples.append((f'{self.name}_count', key, values[-1]))
+        return samples
+
+    def state(self):
+        with self._lock:
+            return [[key, list(values)] for key, values in self._series.items()]
+
+    def merged(self, states):
+        """Return a copy summing the ``(pid, live, state)`` of several processes."""
+        total = Histogram(self.name, self.help, self.buckets)
+        for _, _, state in states:
+            for key, values in state:
+                key = _load_key(key)
+                series = total._series.setdefault(key, [0] * (len(self.buckets) + 2))
+                for i, value in enumerate(values):
+                    series[i] += value
+        return total
+
+class MetricsRegistry:
+    """Named metrics of this process, rendered in the Prometheus text format.
+
+    With ``METRICS_DIR`` set, ``render`` reports the metrics of every process
+    sharing that directory (see ``flush`` and ``start_flusher``).
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.setdefault(metric.name, metric)
+            return self._metrics[metric.name]
+
+    def get(self, name):
+        return self._metrics[name]
+
+    def snapshot(self):
+        return {name: metric.state() for name, metric in list(self._metrics.items())}
+
+    def render(self):
+        metrics = list(self._metrics.values())
+        if METRICS_DIR:
+            flush()
+            snapshots = _read_snapshots()
+            metrics = [metric.merged([(pid, live, snapshot.get(metric.name, [])) for pid, live, snapshot in snapshots]) for metric in metrics]
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.type}')
+            for name, key, value in metric.samples():
+                lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram('analyzer_stage_seconds', 'Time spent in each analysis stage.'))
+EXTRACT_SECONDS = registry.register(Histogram('analyzer_extract_seconds', 'Text extraction time by file type.'))
+WATSON_ATTEMPT_SECONDS = registry.register(Histogram('analyzer_watson_attempt_seconds', 'Watson NLU request time by outcome.'))
+SUMMARY_BATCH_SECONDS = registry.register(Histogram('analyzer_summary_batch_seconds', 'Time to summarize a batch of documents.'))
+HTTP_SECONDS = registry.register(Histogram('http_request_duration_seconds', 'HTTP request latency by endpoint and status.'))
+WATSON_RETRIES = registry.register(Counter('analyzer_watson_retries_total', 'Watson NLU attempts retried after a transient error.'))
+WATSON_REJECTED = registry.register(Counter('analyzer_watson_circuit_rejections_total', 'Documents sent to local analysis because the Watson circuit was open.'))
+FALLBACKS = registry.register(Counter('analyzer_local_fallback_total', 'Analyses that used the local fallback, by reason.'))
+CACHE_LOOKUPS = registry.register(Counter('analyzer_cache_lookups_total', 'Analysis cache lookups by namespace and result.'))
+ERRORS = registry.register(Counter('analyzer_errors_total', 'Errors by stage.'))
+INFLIGHT = registry.register(Gauge('http_requests_in_flight', 'Requests currently being handled.'))
+
+def _write_json(path, data):
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+@contextmanager
+def _directory_lock(exclusive):
+    import fcntl
+    with open(os.path.join(METRICS_DIR, '.lock'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def flush():
+    """Write this process's metrics to ``METRICS_DIR`` (a no-op without it)."""
+    if not METRICS_DIR:
+        return
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    _write_json(os.path.join(METRICS_DIR, f'{os.getpid()}.json'), registry.snapshot())
+
+def _read_snapshots():
+    """Return ``(pid, live, snapshot)`` for every process that wrote to ``METRICS_DIR``."""
+    snapshots = []
+    with _directory_lock(exclusive=False):
+        for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+            name = os.path.basename(path)[:-len('.json')]
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            pid = int(name) if name.isdigit() else 0
+            snapshots.append((pid, pid == os.getpid() or (pid > 0 and _alive(pid)), snapshot))
+    return snapshots
+
+def mark_process_dead(pid):
+    """Fold an exited process's counters and histograms into the archive and remove its file.
+
+    Its gauges are dropped. Called by the server master when a worker exits,
+    so recycled workers do not leave a file each behind.
+    """
+    if not METRICS_DIR:
+        return
+    path = os.path.join(METRICS_DIR, f'{pid}.json')
+    archive_path = os.path.join(METRICS_DIR, ARCHIVE_FILE)
+    with _directory_lock(exclusive=True):
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return
+        try:
+            with open(archive_path) as f:
+                archive = json.load(f)
+        except (OSError, ValueError):
+            archive = {}
+        for name, metric in list(registry._metrics.items()):
+            if metric.type == 'gauge':
+                continue
+            merged = metric.merged([(0, False, archive.get(name, [])), (pid, False, snapshot.get(name, []))])
+            archive[name] = merged.state()
+        _write_json(archive_path, archive)
+        os.remove(path)
+
+def clear_directory():
+    """Remove the files of a previous server run from ``METRICS_DIR``."""
+    if not METRICS_DIR:
+        return
+    for path in glob.glob(os.path.join(METRICS_DIR, '*.json')):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def start_flusher(interval=None):
+    """Call ``flush`` every ``interval`` seconds on a daemon thread, so scrapes answered by other processes see this one."""
+    if not METRICS_DIR:
+        return
+    interval = interval or METRICS_FLUSH_INTERVAL
+
+    def run():
+        while True:
+            try:
+                flush()
+            except Exception as e:
+                logger.error(f"Writing metrics to {METRICS_DIR} failed: {str(e)}", exc_info=True)
+            time.sleep(interval)
+
+    threading.Thread(target=run, name='metrics-flush', daemon=True).start()
+
+_events = contextvars.ContextVar('metrics_events', default=None)
+
+def _record(metric, method, value, labels):
+    events = _events.get()
+    if events is not None:
+        events.append((metric.name, method, value, labels))
+    else:
+        getattr(metric, method)(value, **labels)
+
+def observe(metric, value, **labels):
+    """Record a histogram observation, or buffer it while ``collect`` is active."""
+    _record(metric, 'observe', value, labels)
+
+def inc(metric, amount=1, **labels):
+    """Increment a counter, or buffer it while ``collect`` is active."""
+    _record(metric, 'inc', amount, labels)
+
+@contextmanager
+def timer(metric, **labels):
+    """Observe the time spent in the ``with`` block."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(metric, time.perf_counter() - start, **labels)
+
+@contextmanager
+def collect():
+    """Buffer metric events instead of recording them; yields the event list.
+
+    Work run on the analysis process pool is wrapped in ``collect`` so its
+    events can be returned to the server process and passed to ``apply``.
+    Threads started through ``contextvars.copy_context`` share the buffer.
+    """
+    events = []
+    token = _events.set(events)
+    try:
+        yield events
+    finally:
+        _events.reset(token)
+
+def apply(events):
+    """Record events buffered by ``collect`` (possibly in another process)."""
+    for name, method, value, labels in events or ():
+        _record(registry.get(name), method, value, labels)
+
+def breakdown(events):
+    """Sum buffered stage, extraction and summary timings into ``{stage: seconds}``."""
+    timings = {}
+    for name, method, value, labels in events or ():
+        if name == STAGE_SECONDS.name:
+            stage = labels.get('stage')
+        elif name == EXTRACT_SECONDS.name:
+            stage = 'extract'
+        elif name == SUMMARY_BATCH_SECONDS.name:
+            stage = 'summary'
+        else:
+            continue
+        timings[stage] = round(timings.get(stage, 0.0) + value, 6)
+    return timings
@@ -0,0 +1,244 @@
+import os
+import logging
+import threading
+import time
+from collections import OrderedDict
+from inference import backend_for
+
+logger = logging.getLogger(__name__)
+
+# Registry name -> (transformers task, model id)
+MODEL_SPECS = {
+    'summarization': ('summarization', 'facebook/bart-large-cnn'),
+    'question-answering': ('question-answering', 'deepset/roberta-base-squad2'),
+}
+
+def current_rss_mb():
+    """Return the resident set size of this process in MB (0.0 if unknown)."""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / (1024 * 1024)
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return 0.0
+
+def load_pipeline(task, model):
+    """Load a Hugging Face pipeline on the inference backend configured for ``task`` (``MODEL_BACKEND``)."""
+    from inference import load_pipeline as load_backend_pipeline
+    return load_backend_pipeline(task, model, backend_for(task))
+
+def _tensor_bytes(value, seen):
+    if isinstance(value, (tuple, list)):
+        return sum(_tensor_bytes(v, seen) for v in value)
+    if not hasattr(value, 'element_size'):
+        return 0
+    pointer = value.data_ptr()
+    if pointer in seen:  # tied weights appear under several names
+        return 0
+    seen.add(pointer)
+    return value.numel() * value.element_size()
+
+def estimate_model_mb(pipe):
+    """Estimate the weight size of a pipeline's model in MB.
+
+    The state dict is used rather than ``parameters()`` so int8-quantized
+    layers, whose packed weights are not parameters, are counted. ONNX
+    Runtime models report 0 and fall back to the RSS growth.
+    """
+    model = getattr(pipe, 'model', None)
+    if model is None or not hasattr(model, 'state_dict'):
+        return 0.0
+    try:
+        seen = set()
+        total = sum(_tensor_bytes(value, seen) for value in model.state_dict().values())
+        return total / (1024 * 1024)
+    except Exception:
+        return 0.0
+
+class ModelRegistry:
+    """Load each pipeline once per process and keep it within a memory budget.
+
+    Models are loaded on first use (or by ``warmup``) and kept in LRU order.
+    When the summed model size exceeds ``MODEL_MEMORY_BUDGET_MB`` the least
+    recently used models are evicted; models unused for longer than
+    ``MODEL_IDLE_SECONDS`` are evicted on the next lookup, or by the timer
+    of ``start_idle_eviction`` when no lookups come in. A value of 0
+    disables either limit.
+    """
+
+    def __init__(self, specs=None, memory_budget_mb=None, idle_seconds=None, loader=None):
+        self._specs = dict(specs or MODEL_SPECS)
+        if memory_budget_mb is None:
+            memory_budget_mb = float(os.getenv('MODEL_MEMORY_BUDGET_MB', '0'))
+        if idle_seconds is None:
+            idle_seconds = float(os.getenv('MODEL_IDLE_SECONDS', '0'))
+        self.memory_budget_mb = memory_budget_mb
+        self.idle_seconds = idle_seconds
+        self._loader = loader or load_pipeline
+        self._models = OrderedDict()
+        self._lock = threading.RLock()
+        self._load_locks = {}
+        self._sweeper = None
+        self._stop_sweeper = threading.Event()
+
+    def get(self, name):
+        """Return the pipeline registered under ``name``, loading it if needed."""
+        if name not in self._specs:
+            raise KeyError(f"Unknown model: {name}")
+        self._evict_idle()
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None:
+                self._touch(name, entry)
+                return entry['pipeline']
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Load outside the registry lock so other models stay usable meanwhile
+        with load_lock:
+            with self._lock:
+                entry = self._models.get(name)
+                if entry is not None:
+                    self._touch(name, entry)
+                    return entry['pipeline']
+            entry = self._load(name)
+            with self._lock:
+                self._models[name] = entry
+                self._touch(name, entry)
+                self._enforce_budget(keep=name)
+            return entry['pipeline']
+
+    def warmup(self, names=None):
+        """Load models ahead of the first request.
+
+        With no arguments the comma-separated ``MODEL_PRELOAD`` setting is used
+        (``all`` loads every registered model).
+        """
+        if names is None:
+            setting = os.getenv('MODEL_PRELOAD', '').strip()
+            if setting.lower() == 'all':
+                names = list(self._specs)
+            else:
+                names = [n.strip() for n in setting.split(',') if n.strip()]
+        for name in names:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error(f"Model warmup failed for {name}: {str(e)}", exc_info=True)
+
+    def evict(self, name):
+        """Drop a loaded model; it is reloaded on next use."""
+        with self._lock:
+            entry = self._models.pop(name, None)
+        if entry is not None:
+            logger.info(f"Evicted model {name} ({entry['memory_mb']:.0f} MB)")
+        return entry is not None
+
+    def start_idle_eviction(self, interval=None):
+        """Evict idle models every ``interval`` seconds on a daemon thread.
+
+        The default interval is a tenth of ``idle_seconds`` (at least one
+        second). Does nothing when idle eviction is disabled or the thread is
+        already running in this process; a forked child starts its own.
+        """
+        if self.idle_seconds <= 0 or (self._sweeper is not None and self._sweeper.is_alive()):
+            return
+        interval = interval or max(self.idle_seconds / 10, 1.0)
+        stop = self._stop_sweeper = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self._evict_idle()
+                except Exception as e:
+                    logger.error(f"Idle model eviction failed: {str(e)}", exc_info=True)
+
+        self._sweeper = threading.Thread(target=run, name='model-idle-eviction', daemon=True)
+        self._sweeper.start()
+
+    def stop_idle_eviction(self):
+        self._stop_sweeper.set()
+        self._sweeper = None
+
+    def loaded(self):
+        """Return the names of currently loaded models."""
+        with self._lock:
+            return list(self._models)
+
+    def stats(self):
+        """Return load time, memory and usage for each loaded model."""
+        with self._lock:
+            models = {
+                name: {
+                    'model': entry['model'],
+                    'backend': entry['backend'],
+                    'load_seconds': round(entry['load_seconds'], 3),
+                    'memory_mb': round(entry['memory_mb'], 1),
+                    'rss_delta_mb': round(entry['rss_delta_mb'], 1),
+                    'uses': entry['uses'],
+                    'idle_seconds': round(time.monotonic() - entry['last_used'], 1),
+                }
+                for name, entry in self._models.items()
+            }
+        return {
+            'models': models,
+            'total_memory_mb': round(sum(m['memory_mb'] for m in models.values()), 1),
+            'memory_budget_mb': self.memory_budget_mb,
+            'rss_mb': round(current_rss_mb(), 1),
+        }
+
+    def _load(self, name):
+        task, model = self._specs[name]
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        pipe = self._loader(task, model)
+        load_seconds = time.perf_counter() - start
+        rss_delta = max(current_rss_mb() - rss_before, 0.0)
+        memory_mb = estimate_model_mb(pipe) or rss_delta
+        backend = backend_for(name)
+        logger.info(f"Loaded model {name} ({model}, {backend}) in {load_seconds:.2f}s, ~{memory_mb:.0f} MB")
+        return {
+            'pipeline': pipe,
+            'model': model,
+            'backend': backend,
+            'load_seconds': load_seconds,
+            'memory_mb': memory_mb,
+            'rss_delta_mb': rss_delta,
+            'uses': 0,
+            'last_used': time.monotonic(),
+        }
+
+    def _touch(self, name, entry):
+        entry['uses'] += 1
+        entry['last_used'] = time.monotonic()
+        self._models.move_to_end(name)
+
+    def _enforce_budget(self, keep):
+        if self.memory_budget_mb <= 0:
+            return
+        total = sum(entry['memory_mb'] for entry in self._models.values())
+        for name in list(self._models):
+            if total <= self.memory_budget_mb:
+                break
+            if name == keep:
+                continue
+            total -= self._models[name]['memory_mb']
+            self.evict(name)
+        if total > self.memory_budget_mb:
+            logger.warning(f"Model {keep} alone exceeds the memory budget ({total:.0f} MB > {self.memory_budget_mb:.0f} MB)")
+
+    def _evict_idle(self):
+        if self.idle_seconds <= 0:
+            return
+        now = time.monotonic()
+        with self._lock:
+            idle = [name for name, entry in self._models.items() if now - entry['last_used'] > self.idle_seconds]
+        for name in idle:
+            self.evict(name)
+
+# Shared by every caller in this process
+registry = ModelRegistry()
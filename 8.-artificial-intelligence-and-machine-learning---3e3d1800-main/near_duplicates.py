@@ -0,0 +1,223 @@
+import os
+import re
+import json
+import time
+import zlib
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+NEAR_DUP_ENABLED = os.getenv('NEAR_DUP_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+NEAR_DUP_PATH = os.getenv('NEAR_DUP_PATH', os.path.join('cache', 'near_duplicates.sqlite3'))
+# Estimated Jaccard similarity of word shingles above which an earlier analysis is reused
+NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', '0.85'))
+# Shorter texts share too few shingles for the estimate to mean much
+NEAR_DUP_MIN_WORDS = int(os.getenv('NEAR_DUP_MIN_WORDS', '50'))
+
+# Changing any of these invalidates the stored signatures
+SHINGLE_WORDS = 3
+NUM_PERM = 128
+BANDS = 16  # 16 bands of 8 rows: documents with similarity 0.85 become candidates 99% of the time
+ROWS = NUM_PERM // BANDS
+MINHASH_SEED = 20240611
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_CANDIDATES = 50  # signatures compared per query
+CHUNK = 2048  # shingles hashed per vectorized step
+SIGNATURE_CACHE = 32  # recent signatures kept per process, keyed by text hash
+
+WORD = re.compile(r'\w+')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signatures (
+    id INTEGER PRIMARY KEY,
+    version TEXT NOT NULL,
+    owner TEXT NOT NULL,
+    name TEXT NOT NULL,
+    signature BLOB NOT NULL,
+    payload BLOB NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    key INTEGER NOT NULL,
+    signature_id INTEGER NOT NULL,
+    PRIMARY KEY (key, signature_id)
+) WITHOUT ROWID;
+"""
+
+def _permutations():
+    # Python's Random is stable across versions, so stored signatures stay comparable.
+    # Multipliers stay below 2**31 so (a * x + b) fits in 64 bits for 32-bit x.
+    rng = random.Random(MINHASH_SEED)
+    return [rng.randrange(1, 1 << 31) for _ in range(NUM_PERM)], [rng.randrange(0, 1 << 32) for _ in range(NUM_PERM)]
+
+_params = None
+_signatures = OrderedDict()
+_signatures_lock = threading.Lock()
+
+def shingle_hashes(text):
+    """Return 32-bit hashes of the overlapping ``SHINGLE_WORDS``-word shingles of ``text`` (lowercased)."""
+    import numpy as np
+    words = WORD.findall(text.lower())
+    if len(words) < SHINGLE_WORDS:
+        return np.zeros(0, dtype=np.uint64)
+    tokens = np.fromiter((zlib.crc32(word.encode('utf-8')) for word in words), dtype=np.uint64, count=len(words))
+    hashes = np.zeros(len(words) - SHINGLE_WORDS + 1, dtype=np.uint64)
+    for offset in range(SHINGLE_WORDS):
+        # Rolling combination of the word hashes; uint64 arithmetic wraps, the mask keeps 32 bits
+        hashes = (hashes * np.uint64(1000003) + tokens[offset:len(tokens) - SHINGLE_WORDS + 1 + offset]) & np.uint64(0xFFFFFFFF)
+    return np.unique(hashes)
+
+def minhash(text):
+    """Return the MinHash signature of ``text`` as ``NUM_PERM`` uint32 values, or None for short texts.
+
+    The fraction of equal positions in two signatures estimates the Jaccard
+    similarity of the texts' word shingle sets.
+    """
+    global _params
+    import numpy as np
+    if len(WORD.findall(text)) < max(NEAR_DUP_MIN_WORDS, SHINGLE_WORDS):
+        return None
+    if _params is None:
+        a, b = _permutations()
+        _params = np.array(a, dtype=np.uint64)[:, None], np.array(b, dtype=np.uint64)[:, None]
+    a, b = _params
+    hashes = shingle_hashes(text)
+    signature = np.full(NUM_PERM, 0xFFFFFFFF, dtype=np.uint64)
+    for start in range(0, len(hashes), CHUNK):
+        chunk = hashes[start:start + CHUNK][None, :]
+        values = ((a * chunk + b) % np.uint64(MERSENNE_PRIME)) & np.uint64(0xFFFFFFFF)
+        np.minimum(signature, values.min(axis=1), out=signature)
+    return signature.astype('<u4')
+
+def signature_for(text):
+    """``minhash(text)``, reusing the signature of recently seen identical text."""
+    key = hashlib.sha256(text.encode('utf-8', errors='replace')).digest()
+    with _signatures_lock:
+        if key in _signatures:
+            _signatures.move_to_end(key)
+            return _signatures[key]
+    signature = minhash(text)
+    with _signatures_lock:
+        _signatures[key] = signature
+        while len(_signatures) > SIGNATURE_CACHE:
+            _signatures.popitem(last=False)
+    return signature
+
+def band_keys(signature, owner=''):
+    """Return one 64-bit LSH key per band of ``signature``.
+
+    The keys include ``owner``, so documents of other owners are never
+    candidates (nor crowd out the owner's own within ``MAX_CANDIDATES``).
+    """
+    data = signature.tobytes()
+    width = ROWS * 4
+    prefix = owner.encode('utf-8') + b'\0'
+    return [
+        int.from_bytes(hashlib.blake2b(prefix + bytes([band]) + data[band * width:(band + 1) * width], digest_size=8).digest(), 'big', signed=True)
+        for band in range(BANDS)
+    ]
+
+def similarity(a, b):
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    import numpy as np
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+class NearDuplicateIndex:
+    """MinHash signatures of analyzed documents with an LSH band index in SQLite.
+
+    Each signature is split into ``BANDS`` bands; documents sharing any band
+    are candidates and their full signatures are compared. A query is one
+    indexed lookup of the band keys plus a few signature comparisons, so it
+    stays well under a millisecond with a million documents. Entries carry a
+    JSON payload (the reusable parts of the analysis) and are tagged with
+    the analyzer version so results of older analyzers are not reused, and
+    with an owner: a document only ever matches documents of the same owner.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or NEAR_DUP_PATH
+        self._local = threading.local()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connection()
+        with conn:
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(signatures)')]
+            if columns and 'owner' not in columns:
+                # Written before entries were scoped by owner; the index is only a cache, so start over
+                logger.info(f"Rebuilding near-duplicate index {self.path}")
+                conn.execute('DROP TABLE signatures')
+                conn.execute('DROP TABLE IF EXISTS bands')
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        # Connections are kept per thread (and per process, in case of a fork):
+        # opening one per query would cost more than the query itself
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def add(self, signature, version, owner, name, payload=None):
+        """Store a signature with the document's ``owner``, ``name`` and reusable ``payload``."""
+        blob = zlib.compress(json.dumps(payload or {}).encode('utf-8'))
+        conn = self._connection()
+        with conn:
+            cursor = conn.execute(
+                'INSERT INTO signatures (version, owner, name, signature, payload, created_at) VALUES (?, ?, ?, ?, ?, ?)',
+                (version, owner, name, signature.tobytes(), blob, time.time())
+            )
+            conn.executemany(
+                'INSERT OR IGNORE INTO bands (key, signature_id) VALUES (?, ?)',
+                [(key, cursor.lastrowid) for key in band_keys(signature, owner)]
+            )
+
+    def query(self, signature, version, owner, threshold=None):
+        """Return ``owner``'s most similar stored document at or above ``threshold``, or None.
+
+        The match is a dict with ``name``, ``similarity`` and ``payload``.
+        """
+        import numpy as np
+        threshold = NEAR_DUP_THRESHOLD if threshold is None else threshold
+        keys = band_keys(signature, owner)
+        conn = self._connection()
+        # Filter on version and owner before the limit, so stale entries cannot crowd out current ones
+        rows = conn.execute(
+            f"SELECT DISTINCT s.id, s.name, s.signature FROM bands b JOIN signatures s ON s.id = b.signature_id "
+            f"WHERE b.key IN ({','.join('?' * len(keys))}) AND s.version = ? AND s.owner = ? LIMIT {MAX_CANDIDATES}",
+            keys + [version, owner]
+        ).fetchall()
+        best = None
+        for signature_id, name, stored in rows:
+            score = similarity(signature, np.frombuffer(stored, dtype='<u4'))
+            if score >= threshold and (best is None or score > best[0]):
+                best = (score, signature_id, name)
+        if best is None:
+            return None
+        score, signature_id, name = best
+        payload = conn.execute('SELECT payload FROM signatures WHERE id = ?', (signature_id,)).fetchone()[0]
+        return {'name': name, 'similarity': round(score, 4), 'payload': json.loads(zlib.decompress(payload))}
+
+    def count(self):
+        return self._connection().execute('SELECT COUNT(*) FROM signatures').fetchone()[0]
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    """Return this process's near-duplicate index, or None when detection is disabled."""
+    global _index
+    if not NEAR_DUP_ENABLED:
+        return None
+    with _index_lock:
+        if _index is None:
+            _index = NearDuplicateIndex()
+        return _index
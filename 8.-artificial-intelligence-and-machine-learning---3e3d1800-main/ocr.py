@@ -0,0 +1,171 @@
+import os
+import io
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+OCR_ENGINE = os.getenv('OCR_ENGINE', 'auto').lower()  # auto, tesserocr or tesseract
+OCR_LANG = os.getenv('OCR_LANG', 'eng')
+OCR_WORKERS = int(os.getenv('OCR_WORKERS', str(min(os.cpu_count() or 1, 4))))
+OCR_TARGET_DPI = int(os.getenv('OCR_TARGET_DPI', '300'))
+OCR_TILE_HEIGHT = int(os.getenv('OCR_TILE_HEIGHT', '2400'))  # pixels, after scaling
+TESSERACT_CMD = os.getenv('TESSERACT_CMD', r"C:\Program Files\Tesseract-OCR\tesseract.exe")
+# Without DPI metadata an image is assumed to span the width of a letter-size page
+ASSUMED_PAGE_WIDTH_INCHES = 8.5
+MIN_SCALE, MAX_SCALE = 0.25, 4.0
+
+class TesseractCliEngine:
+    """Run the tesseract executable through pytesseract, one process per image."""
+
+    name = 'tesseract'
+
+    def __init__(self, lang=None):
+        import pytesseract
+        pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+        self.lang = lang or OCR_LANG
+
+    def recognize(self, img):
+        import pytesseract
+        return pytesseract.image_to_string(img, lang=self.lang, config='--psm 6').strip()
+
+    def close(self):
+        pass
+
+class TesserocrEngine:
+    """Keep up to ``workers`` Tesseract API instances alive and reuse them.
+
+    Each instance loads the language data once, so recognizing an image
+    costs neither a process spawn nor temp files. tesserocr releases the GIL
+    while recognizing, so instances run in parallel from threads.
+    """
+
+    name = 'tesserocr'
+
+    def __init__(self, workers=None, lang=None):
+        import tesserocr
+        self._tesserocr = tesserocr
+        self.lang = lang or OCR_LANG
+        self.workers = max(workers or OCR_WORKERS, 1)
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def recognize(self, img):
+        api = self._acquire()
+        try:
+            api.SetImage(img)
+            return api.GetUTF8Text().strip()
+        finally:
+            self._idle.put(api)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().End()
+            except queue.Empty:
+                break
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.workers:
+                self._created += 1
+                # psm 6 = assume a single uniform block of text, as with the CLI engine
+                return self._tesserocr.PyTessBaseAPI(lang=self.lang, psm=self._tesserocr.PSM.SINGLE_BLOCK)
+        return self._idle.get()
+
+_engine = None
+_executor = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Return this process's OCR engine, preferring persistent tesserocr workers."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            if OCR_ENGINE in ('auto', 'tesserocr'):
+                try:
+                    _engine = TesserocrEngine()
+                except ImportError:
+                    if OCR_ENGINE == 'tesserocr':
+                        raise
+                    logger.info("tesserocr not installed, using the tesseract executable for OCR")
+            if _engine is None:
+                _engine = TesseractCliEngine()
+            logger.info(f"Using OCR engine {_engine.name}")
+        return _engine
+
+def _get_executor():
+    global _executor
+    with _engine_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max(OCR_WORKERS, 1), thread_name_prefix='ocr')
+        return _executor
+
+def image_dpi(source):
+    """Return the horizontal DPI recorded in an image path or bytes, or None."""
+    from PIL import Image
+    try:
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            source = io.BytesIO(source)
+        with Image.open(source) as img:
+            dpi = img.info.get('dpi')
+        return float(dpi[0]) if dpi and dpi[0] > 1 else None
+    except Exception:
+        return None
+
+def scale_to_target_dpi(img, dpi=None, target_dpi=None):
+    """Resize a grayscale array so text is rendered at about ``target_dpi``.
+
+    Small images are upscaled (cubic) and large photos downscaled (area
+    averaging) instead of always doubling the size.
+    """
+    import cv2
+    target_dpi = target_dpi or OCR_TARGET_DPI
+    height, width = img.shape[:2]
+    source_dpi = dpi or width / ASSUMED_PAGE_WIDTH_INCHES
+    scale = min(max(target_dpi / source_dpi, MIN_SCALE), MAX_SCALE)
+    if 0.9 <= scale <= 1.1:
+        return img
+    interpolation = cv2.INTER_CUBIC if scale > 1 else cv2.INTER_AREA
+    return cv2.resize(img, None, fx=scale, fy=scale, interpolation=interpolation)
+
+def split_rows(img, tile_height=None):
+    """Split a binarized page into horizontal bands at blank rows.
+
+    Cuts are placed on the row with the least ink near each multiple of
+    ``tile_height`` so text lines are not cut in half. Returns the bands
+    top to bottom, i.e. in reading order.
+    """
+    import numpy as np
+    tile_height = tile_height or OCR_TILE_HEIGHT
+    height = img.shape[0]
+    if height <= tile_height * 1.25:
+        return [img]
+    ink = (img < 128).sum(axis=1)
+    window = max(tile_height // 10, 1)
+    cuts = [0]
+    while height - cuts[-1] > tile_height * 1.25:
+        target = cuts[-1] + tile_height
+        lo, hi = target - window, min(target + window, height)
+        cuts.append(lo + int(np.argmin(ink[lo:hi])))
+    cuts.append(height)
+    return [img[top:bottom] for top, bottom in zip(cuts, cuts[1:])]
+
+def recognize_image(img, tile_height=None):
+    """OCR a PIL image or grayscale array, splitting tall pages into parallel tiles."""
+    import numpy as np
+    from PIL import Image
+    engine = get_engine()
+    array = np.asarray(img.convert('L')) if isinstance(img, Image.Image) else img
+    tiles = split_rows(array, tile_height)
+    if len(tiles) == 1:
+        return engine.recognize(img if isinstance(img, Image.Image) else Image.fromarray(array))
+    texts = _get_executor().map(lambda tile: engine.recognize(Image.fromarray(tile)), tiles)
+    return '\n'.join(text for text in texts if text)
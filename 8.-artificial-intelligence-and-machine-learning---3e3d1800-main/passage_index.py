@@ -0,0 +1,116 @@
+import os
+import math
+import bisect
+import hashlib
+import logging
+import threading
+from array import array
+from collections import Counter, OrderedDict
+from document import Document, TOKEN_PATTERN, INDEX_TYPECODE
+
+logger = logging.getLogger(__name__)
+
+PASSAGE_CHARS = int(os.getenv('PASSAGE_CHARS', '800'))  # target passage length
+PASSAGE_INDEX_CACHE = int(os.getenv('PASSAGE_INDEX_CACHE', '32'))  # documents kept indexed
+BM25_K1, BM25_B = 1.5, 0.75
+
+class PassageIndex:
+    """BM25 index over overlapping sentence windows of one document.
+
+    Passages are runs of whole sentences of about ``PASSAGE_CHARS``
+    characters; consecutive passages share a sentence so an answer spanning
+    a window boundary is still found whole. A sentence longer than a
+    passage is cut on token boundaries.
+    """
+
+    def __init__(self, text, max_chars=None):
+        self.doc = text if isinstance(text, Document) else Document(text)
+        self.max_chars = max_chars or PASSAGE_CHARS
+        self.starts = array(INDEX_TYPECODE)
+        self.ends = array(INDEX_TYPECODE)
+        self._build_passages()
+
+        doc = self.doc
+        self._postings = {}  # term id -> (passage ids, term frequencies)
+        self._lengths = array(INDEX_TYPECODE)
+        for passage, (start, end) in enumerate(zip(self.starts, self.ends)):
+            first = bisect.bisect_left(doc.starts, start)
+            last = bisect.bisect_left(doc.starts, end)
+            self._lengths.append(last - first)
+            for term_id, tf in Counter(doc.term_ids[first:last]).items():
+                ids, tfs = self._postings.setdefault(term_id, (array(INDEX_TYPECODE), array(INDEX_TYPECODE)))
+                ids.append(passage)
+                tfs.append(tf)
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _build_passages(self):
+        text, limit = self.doc.text, self.max_chars
+        sentences = []
+        for start, end in self.doc.sentence_spans():
+            while end - start > limit:
+                cut = text.rfind(' ', start, start + limit)
+                cut = cut if cut > start else start + limit
+                sentences.append((start, cut))
+                start = cut
+                while start < end and text[start].isspace():
+                    start += 1
+            if start < end:
+                sentences.append((start, end))
+
+        i = 0
+        while i < len(sentences):
+            j = i + 1
+            while j < len(sentences) and sentences[j][1] - sentences[i][0] <= limit:
+                j += 1
+            self.starts.append(sentences[i][0])
+            self.ends.append(sentences[j - 1][1])
+            if j >= len(sentences):
+                break
+            i = j - 1 if j - 1 > i else j  # overlap by one sentence
+
+    def passage(self, i):
+        """Return the text of passage ``i``."""
+        return self.doc.text[self.starts[i]:self.ends[i]]
+
+    def search(self, query, k=3):
+        """Return ``[(passage, score)]`` for the ``k`` best BM25 matches of ``query``.
+
+        With no query term in the document the first ``k`` passages are
+        returned with score 0, so questions still see the document opening.
+        """
+        total = len(self.starts)
+        scores = {}
+        for term in set(TOKEN_PATTERN.findall(query.lower())):
+            postings = self._postings.get(self.doc.term_id(term))
+            if postings is None:
+                continue
+            ids, tfs = postings
+            idf = math.log(1 + (total - len(ids) + 0.5) / (len(ids) + 0.5))
+            for passage, tf in zip(ids, tfs):
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[passage] / self._avg_length)
+                scores[passage] = scores.get(passage, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+        if not scores:
+            return [(passage, 0.0) for passage in range(min(k, total))]
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+def get_passage_index(text):
+    """Return the passage index for ``text``, reusing one built for identical text."""
+    key = hashlib.sha256(text.encode('utf-8', errors='replace')).hexdigest()
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            return index
+    index = PassageIndex(text)
+    logger.info(f"Indexed {len(index)} passages for document {key[:12]}")
+    with _indexes_lock:
+        _indexes[key] = index
+        while len(_indexes) > max(PASSAGE_INDEX_CACHE, 1):
+            _indexes.popitem(last=False)
+    return index
@@ -0,0 +1,122 @@
+import os
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# pdfplumber keeps reading order and spacing closer to the page layout but is
+# several times slower than PyMuPDF's text extraction
+PDF_LAYOUT = os.getenv('PDF_LAYOUT', 'false').lower() in ('1', 'true', 'yes')
+PDF_WORKERS = int(os.getenv('PDF_WORKERS', '1'))
+PDF_PARALLEL_MIN_PAGES = int(os.getenv('PDF_PARALLEL_MIN_PAGES', '16'))
+PDF_OCR_DPI = int(os.getenv('PDF_OCR_DPI', '300'))
+
+def open_pdf(source):
+    """Open a PDF with PyMuPDF from a path or in-memory bytes."""
+    import fitz  # PyMuPDF
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype='pdf')
+    return fitz.open(source)
+
+def source_label(source):
+    """Describe a path or in-memory document for log messages."""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return f"<{len(source)} bytes>"
+    return str(source)
+
+def page_count(source):
+    """Return the number of pages in a PDF."""
+    with open_pdf(source) as doc:
+        return doc.page_count
+
+def ocr_page(page, ocr):
+    """Render a PyMuPDF page to a grayscale image and run ``ocr`` on it."""
+    import fitz  # PyMuPDF
+    from PIL import Image
+    pix = page.get_pixmap(dpi=PDF_OCR_DPI, colorspace=fitz.csGRAY)
+    img = Image.frombytes('L', (pix.width, pix.height), pix.samples)
+    return ocr(img)
+
+def iter_page_range(source, start, stop, layout=False, ocr=None):
+    """Yield ``(page_number, text)`` for pages ``start`` to ``stop - 1`` of a PDF path or bytes.
+
+    With ``layout`` pages are read with pdfplumber, falling back to PyMuPDF
+    for a page pdfplumber cannot parse. Pages without a text layer that
+    contain images are rendered and passed to ``ocr`` when it is given.
+    """
+    label = source_label(source)
+    plumber = None
+    if layout:
+        import pdfplumber
+        try:
+            plumber = pdfplumber.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray, memoryview)) else source)
+        except Exception as e:
+            logger.warning(f"pdfplumber could not open {label}, using PyMuPDF: {str(e)}")
+    try:
+        with open_pdf(source) as doc:
+            for number in range(start, min(stop, doc.page_count)):
+                page = doc[number]
+                text = None
+                if plumber is not None:
+                    try:
+                        text = plumber.pages[number].extract_text() or ''
+                    except Exception as e:
+                        logger.warning(f"pdfplumber failed on page {number + 1} of {label}, using PyMuPDF: {str(e)}")
+                if text is None:
+                    text = page.get_text()
+                if not text.strip() and ocr is not None and page.get_images():
+                    logger.info(f"Page {number + 1} of {label} has no text layer, running OCR")
+                    text = ocr_page(page, ocr)
+                yield number, text.strip()
+    finally:
+        if plumber is not None:
+            plumber.close()
+
+def extract_page_range(source, start, stop, layout=False, ocr=None):
+    """Return the page texts for pages ``start`` to ``stop - 1`` (pool worker entry point)."""
+    return [text for _, text in iter_page_range(source, start, stop, layout, ocr)]
+
+def iter_pdf_pages(source, layout=None, max_pages=None, max_chars=None, ocr=None, workers=None):
+    """Yield ``(page_number, text)`` for a PDF path or bytes, page by page and in order.
+
+    Reading stops after ``max_pages`` pages or once ``max_chars`` characters
+    have been yielded. Documents with at least ``PDF_PARALLEL_MIN_PAGES``
+    pages are split into page ranges read by ``workers`` processes; pages are
+    still yielded in order as their range completes. ``ocr`` must be a
+    picklable callable taking a PIL image when workers are used.
+    """
+    if layout is None:
+        layout = PDF_LAYOUT
+    workers = workers or PDF_WORKERS
+    total = page_count(source)
+    if max_pages:
+        total = min(total, max_pages)
+
+    if workers > 1 and total >= PDF_PARALLEL_MIN_PAGES:
+        step = -(-total // (workers * 2))  # two ranges per worker evens out slow pages
+        ranges = [(start, min(start + step, total)) for start in range(0, total, step)]
+        pages = _iter_parallel(source, ranges, layout, ocr, workers)
+    else:
+        pages = iter_page_range(source, 0, total, layout, ocr)
+
+    chars = 0
+    try:
+        for number, text in pages:
+            yield number, text
+            chars += len(text)
+            if max_chars and chars >= max_chars:
+                logger.info(f"Stopped reading {source_label(source)} after page {number + 1} ({chars} characters)")
+                return
+    finally:
+        pages.close()
+
+def _iter_parallel(source, ranges, layout, ocr, workers):
+    pool = ProcessPoolExecutor(max_workers=min(workers, len(ranges)))
+    try:
+        futures = [pool.submit(extract_page_range, source, start, stop, layout, ocr) for start, stop in ranges]
+        for (start, _), future in zip(ranges, futures):
+            for offset, text in enumerate(future.result()):
+                yield start + offset, text
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import uuid
+import zlib
+import sqlite3
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+RESULT_DB_PATH = os.getenv('RESULT_DB_PATH', 'results.sqlite3')
+RESULT_TTL_HOURS = float(os.getenv('RESULT_TTL_HOURS', '168'))  # 0 = keep forever
+PRUNE_INTERVAL = 600  # seconds between expiry sweeps
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    result BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS documents_last_access ON documents (last_access);
+"""
+
+class ResultStore:
+    """Server-side store of analysis results, keyed by a document id.
+
+    Each result, including the full extracted text, is kept as one
+    zlib-compressed JSON blob in SQLite so clients only need to send the id
+    back to ask questions or download reports. Results not read for
+    ``RESULT_TTL_HOURS`` are deleted.
+    """
+
+    def __init__(self, db_path=None, ttl_hours=None):
+        self.db_path = db_path or RESULT_DB_PATH
+        self.ttl = (ttl_hours if ttl_hours is not None else RESULT_TTL_HOURS) * 3600
+        self._last_prune = 0.0
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def save(self, filename, result):
+        """Store a result dict and return its new document id."""
+        doc_id = uuid.uuid4().hex
+        blob = zlib.compress(json.dumps(result).encode('utf-8'))
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                'INSERT INTO documents (id, filename, result, size, created_at, last_access) VALUES (?, ?, ?, ?, ?, ?)',
+                (doc_id, filename, blob, len(blob), now, now)
+            )
+        if now - self._last_prune > PRUNE_INTERVAL:
+            self.prune()
+        return doc_id
+
+    def get(self, doc_id):
+        """Return the stored result dict, or None for an unknown or expired id."""
+        if not doc_id:
+            return None
+        with self._connect() as conn:
+            row = conn.execute('SELECT result, last_access FROM documents WHERE id = ?', (doc_id,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if self.ttl and now - row[1] > self.ttl:
+                conn.execute('DELETE FROM documents WHERE id = ?', (doc_id,))
+                return None
+            conn.execute('UPDATE documents SET last_access = ? WHERE id = ?', (now, doc_id))
+        return json.loads(zlib.decompress(row[0]).decode('utf-8'))
+
+    def delete(self, doc_id):
+        with self._connect() as conn:
+            conn.execute('DELETE FROM documents WHERE id = ?', (doc_id,))
+
+    def prune(self):
+        """Delete results not read within the TTL; returns how many were removed."""
+        self._last_prune = time.time()
+        if not self.ttl:
+            return 0
+        with self._connect() as conn:
+            removed = conn.execute('DELETE FROM documents WHERE last_access < ?', (time.time() - self.ttl,)).rowcount
+        if removed:
+            logger.info(f"Pruned {removed} expired results")
+        return removed
@@ -0,0 +1,172 @@
+import os
+import math
+import atexit
+import bisect
+import random
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from document import as_document
+
+logger = logging.getLogger(__name__)
+
+# sentence: score sentences and average them weighted by length; document: one VADER call on the whole text
+SENTIMENT_MODE = os.getenv('SENTIMENT_MODE', 'sentence').lower()
+# none, sentences or sections: per-part scores added to the sentiment result
+SENTIMENT_DETAIL = os.getenv('SENTIMENT_DETAIL', 'none').lower()
+SENTIMENT_SECTION_SENTENCES = int(os.getenv('SENTIMENT_SECTION_SENTENCES', '20'))
+# Longer documents are scored from a fixed-seed random sample of this many sentences (0 = all)
+SENTIMENT_MAX_SENTENCES = int(os.getenv('SENTIMENT_MAX_SENTENCES', '5000'))
+SENTIMENT_WORKERS = int(os.getenv('SENTIMENT_WORKERS', '1'))
+SENTIMENT_PARALLEL_MIN_SENTENCES = int(os.getenv('SENTIMENT_PARALLEL_MIN_SENTENCES', '2000'))
+SENTIMENT_SAMPLE_SEED = 0
+CONFIDENCE_Z = 1.96  # 95% confidence for the reported sampling margin
+
+_vader = None
+_vader_lock = threading.Lock()
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_vader():
+    """Return the VADER analyzer, loading its lexicon on first use."""
+    global _vader
+    with _vader_lock:
+        if _vader is None:
+            from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+            _vader = SentimentIntensityAnalyzer()
+        return _vader
+
+def sentiment_label(score):
+    if score > 0.05:
+        return 'Positive'
+    if score < -0.05:
+        return 'Negative'
+    return 'Neutral'
+
+def score_sentences(sentences):
+    """Return the VADER compound score of each sentence."""
+    vader = get_vader()
+    return [vader.polarity_scores(sentence)['compound'] for sentence in sentences]
+
+def get_pool(workers):
+    """Return the process pool for sentence scoring, started with ``workers`` processes on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            get_vader()  # forked workers inherit the loaded lexicon
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            logger.info(f"Started sentiment process pool with {workers} workers")
+        return _pool
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+atexit.register(shutdown_pool)
+
+def _forget_pool():
+    global _pool
+    _pool = None
+
+# A forked child (a preforked server worker) cannot use its parent's pool; it starts its own
+os.register_at_fork(after_in_child=_forget_pool)
+
+def _score_parallel(sentences, workers):
+    if multiprocessing.parent_process() is not None:
+        # Already a worker of the analysis process pool: its siblings keep the other cores busy
+        return score_sentences(sentences)
+    chunk = -(-len(sentences) // (workers * 4))  # several chunks per worker evens out long sentences
+    chunks = [sentences[start:start + chunk] for start in range(0, len(sentences), chunk)]
+    return [score for scores in get_pool(workers).map(score_sentences, chunks) for score in scores]
+
+def weighted_mean(scores, weights):
+    total = sum(weights)
+    return sum(s * w for s, w in zip(scores, weights)) / total if total else 0.0
+
+def sampling_margin(scores, weights, population):
+    """Half-width of the ~95% confidence interval of a length-weighted mean estimated from a sample.
+
+    Uses the standard error of the ratio estimator with the finite
+    population correction, so it shrinks to 0 as the sample approaches the
+    whole document.
+    """
+    n = len(scores)
+    if n < 2 or not sum(weights):
+        return 0.0
+    mean_weight = sum(weights) / n
+    ratio = weighted_mean(scores, weights)
+    variance = sum((w * (s - ratio)) ** 2 for s, w in zip(scores, weights)) / (n - 1)
+    correction = max(1 - n / population, 0.0)
+    return CONFIDENCE_Z * math.sqrt(correction * variance / n) / mean_weight
+
+def sentence_sentiment(text, detail=None, max_sentences=None, workers=None):
+    """Score each sentence with VADER and aggregate by sentence length.
+
+    ``text`` may be a Document. Sentences are weighted by their token count
+    so a long paragraph outweighs a one-word heading. Returns the usual
+    ``{'label', 'score'}`` plus, with ``detail='sentences'`` or
+    ``'sections'``, a list of ``{'start', 'end', 'score', 'label'}`` parts
+    (sections are runs of ``SENTIMENT_SECTION_SENTENCES`` sentences).
+
+    Documents with more than ``max_sentences`` sentences are scored from a
+    seeded random sample of that many sentences; the result then carries
+    ``sampled`` counts and ``margin``, the ~95% confidence half-width of
+    the score. Detail is only reported for unsampled documents.
+    """
+    detail = SENTIMENT_DETAIL if detail is None else detail
+    max_sentences = SENTIMENT_MAX_SENTENCES if max_sentences is None else max_sentences
+    workers = SENTIMENT_WORKERS if workers is None else workers
+    doc = as_document(text)
+    starts = doc.starts
+    spans = []
+    weights = []
+    for start, end in doc.sentence_spans():
+        tokens = bisect.bisect_left(starts, end) - bisect.bisect_left(starts, start)
+        if tokens:
+            spans.append((start, end))
+            weights.append(tokens)
+    if not spans:
+        return {'label': 'Neutral', 'score': 0.0}
+
+    total = len(spans)
+    sampled = bool(max_sentences) and total > max_sentences
+    if sampled:
+        picks = sorted(random.Random(SENTIMENT_SAMPLE_SEED).sample(range(total), max_sentences))
+        spans = [spans[i] for i in picks]
+        weights = [weights[i] for i in picks]
+    sentences = [doc.text[start:end] for start, end in spans]
+    if workers > 1 and len(sentences) >= SENTIMENT_PARALLEL_MIN_SENTENCES:
+        scores = _score_parallel(sentences, workers)
+    else:
+        scores = score_sentences(sentences)
+
+    score = round(weighted_mean(scores, weights), 4)
+    result = {'label': sentiment_label(score), 'score': score}
+    if sampled:
+        result['sampled'] = {'sentences': len(scores), 'total_sentences': total}
+        result['margin'] = round(sampling_margin(scores, weights, total), 4)
+        logger.info(f"Sentiment from {len(scores)} of {total} sentences: {score} (±{result['margin']})")
+    elif detail == 'sentences':
+        result['sentences'] = [
+            {'start': start, 'end': end, 'score': s, 'label': sentiment_label(s)}
+            for (start, end), s in zip(spans, scores)
+        ]
+    elif detail == 'sections':
+        size = max(SENTIMENT_SECTION_SENTENCES, 1)
+        result['sections'] = []
+        for i in range(0, len(spans), size):
+            s = round(weighted_mean(scores[i:i + size], weights[i:i + size]), 4)
+            result['sections'].append({
+                'start': spans[i][0], 'end': spans[min(i + size, len(spans)) - 1][1],
+                'score': s, 'label': sentiment_label(s)
+            })
+    return result
+
+def document_sentiment(text):
+    """Score the whole text with one VADER call."""
+    score = get_vader().polarity_scores(text)['compound']
+    return {'label': sentiment_label(score), 'score': score}
@@ -0,0 +1,257 @@
+import os
+import sys
+import gc
+import json
+import time
+import random
+import signal
+import logging
+import argparse
+import threading
+
+logger = logging.getLogger(__name__)
+
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('SERVER_PORT', '5000'))
+# Worker processes forked from the master (0 = CPU count)
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '0'))
+# Request threads per worker
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', '32'))
+# Recycle a worker after this many requests, plus up to 10% jitter so workers do not restart together (0 = never)
+SERVER_MAX_REQUESTS = int(os.getenv('SERVER_MAX_REQUESTS', '1000'))
+# Recycle a worker once its private (unshared) memory exceeds this many MB (0 = never)
+SERVER_MAX_WORKER_MB = float(os.getenv('SERVER_MAX_WORKER_MB', '0'))
+# Seconds a stopping worker gets to finish in-flight requests and jobs before it is killed
+SERVER_GRACEFUL_TIMEOUT = float(os.getenv('SERVER_GRACEFUL_TIMEOUT', '60'))
+# PyTorch threads per worker (0 = INFERENCE_THREADS, or the CPU count divided among the workers)
+SERVER_WORKER_THREADS = int(os.getenv('SERVER_WORKER_THREADS', '0'))
+# Seconds between memory reports in the log (0 = never; server.py --memory prints one on demand)
+SERVER_MEMORY_REPORT_INTERVAL = float(os.getenv('SERVER_MEMORY_REPORT_INTERVAL', '0'))
+SERVER_PID_FILE = os.getenv('SERVER_PID_FILE', 'server.pid')
+SERVER_BACKLOG = 2048
+MEMORY_CHECK_INTERVAL = 5  # seconds between checks of SERVER_MAX_WORKER_MB
+# Read before gunicorn.conf.py turns JOB_RESUME off for the app the master imports
+RESUME_JOBS = os.getenv('JOB_RESUME', 'true').lower() in ('1', 'true', 'yes')
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+
+SMAPS_FIELDS = {
+    'Rss': 'rss_mb', 'Pss': 'pss_mb', 'Shared_Clean': 'shared_mb', 'Shared_Dirty': 'shared_mb',
+    'Private_Clean': 'private_mb', 'Private_Dirty': 'private_mb', 'Swap': 'swap_mb',
+}
+
+def process_memory(pid='self'):
+    """Return the memory of a process in MB, split into shared and private pages.
+
+    Read from ``/proc/<pid>/smaps_rollup`` (Linux 4.14+). ``pss_mb`` counts
+    each shared page divided by the processes sharing it, so summing it over
+    the master and workers gives their real footprint. Without smaps_rollup
+    only ``rss_mb`` is filled in. Returns None when the process is gone.
+    """
+    memory = dict.fromkeys(('rss_mb', 'pss_mb', 'shared_mb', 'private_mb', 'swap_mb'))
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'r') as f:
+            totals = {}
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in SMAPS_FIELDS:
+                    key = SMAPS_FIELDS[name]
+                    totals[key] = totals.get(key, 0.0) + int(value.split()[0]) / 1024
+        memory.update(totals)
+        return memory
+    except FileNotFoundError:
+        if not os.path.exists(f'/proc/{pid}'):
+            return None
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        with open(f'/proc/{pid}/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    memory['rss_mb'] = int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        return None
+    return memory
+
+def child_pids(pid):
+    """Return the pids of the direct children of ``pid``."""
+    children = []
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat', 'r') as f:
+                # The command name in parentheses may contain spaces; the parent pid follows it
+                fields = f.read().rpartition(')')[2].split()
+        except OSError:
+            continue
+        if len(fields) > 1 and fields[1] == str(pid):
+            children.append(int(name))
+    return sorted(children)
+
+def memory_report(master_pid, workers=None):
+    """Return one row per process (the master first) with its memory use.
+
+    ``workers`` maps worker pids to extra fields such as their index; by
+    default the master's children are listed.
+    """
+    if workers is None:
+        workers = {pid: {} for pid in child_pids(master_pid)}
+    rows = []
+    for pid, role, extra in [(master_pid, 'master', {})] + [(pid, 'worker', info) for pid, info in workers.items()]:
+        memory = process_memory(pid)
+        if memory is not None:
+            rows.append({'pid': pid, 'role': role, **extra, **{k: v if v is None else round(v, 1) for k, v in memory.items()}})
+    return rows
+
+def format_memory_report(rows):
+    def cell(value):
+        return '-' if value is None else f"{value:.0f}"
+
+    lines = [f"{'pid':>8} {'role':<8}{'rss MB':>9}{'pss MB':>9}{'shared MB':>11}{'private MB':>12}"]
+    for row in rows:
+        lines.append(
+            f"{row['pid']:>8} {row['role']:<8}{cell(row['rss_mb']):>9}{cell(row['pss_mb']):>9}"
+            f"{cell(row['shared_mb']):>11}{cell(row['private_mb']):>12}"
+        )
+    rss = sum(row['rss_mb'] or 0 for row in rows)
+    if all(row['pss_mb'] is not None for row in rows):
+        pss = sum(row['pss_mb'] for row in rows)
+        lines.append(f"total: {pss:.0f} MB in use (PSS) for {len(rows)} processes; {rss - pss:.0f} MB of the summed RSS is shared")
+    else:
+        lines.append(f"total: {rss:.0f} MB summed RSS (shared pages counted once per process)")
+    return '\n'.join(lines)
+
+def worker_threads(workers):
+    """PyTorch threads per worker: ``SERVER_WORKER_THREADS``, else ``INFERENCE_THREADS``, else the CPUs divided among the workers."""
+    if SERVER_WORKER_THREADS:
+        return SERVER_WORKER_THREADS
+    from inference import INFERENCE_THREADS
+    return INFERENCE_THREADS or max((os.cpu_count() or 1) // workers, 1)
+
+def preload_shared():
+    """Load the models and VADER lexicon the workers will share, then freeze the heap.
+
+    gunicorn has already imported ``app`` (``preload_app``), which imports the
+    dependencies and loads the ``MODEL_PRELOAD`` models.
+    """
+    from model_registry import current_rss_mb
+    from analyzer import preload, model_registry
+    from sentiment import get_vader
+    start = time.perf_counter()
+    preload()
+    model_registry.warmup()
+    # The master never runs a model, so it must not evict the ones its workers will share
+    model_registry.stop_idle_eviction()
+    get_vader()
+    # Objects created so far are never collected, so the collector does not
+    # write to (and un-share) their pages in every worker
+    gc.collect()
+    gc.freeze()
+    logger.info(
+        f"Preloaded {', '.join(model_registry.loaded()) or 'no models'} in {time.perf_counter() - start:.1f}s; "
+        f"master uses {current_rss_mb():.0f} MB"
+    )
+
+def watch_memory(worker):
+    """Stop ``worker`` gracefully once its private memory passes ``SERVER_MAX_WORKER_MB``; runs in the worker."""
+    while worker.alive:
+        time.sleep(MEMORY_CHECK_INTERVAL)
+        memory = process_memory()
+        if memory is None:
+            continue
+        private_mb = memory['private_mb'] if memory['private_mb'] is not None else memory['rss_mb']
+        if private_mb and private_mb > SERVER_MAX_WORKER_MB:
+            logger.info(f"Worker {os.getpid()} uses {private_mb:.0f} MB private memory (limit {SERVER_MAX_WORKER_MB:.0f} MB); recycling")
+            # The worker finishes its in-flight requests and exits; the master forks a replacement
+            worker.alive = False
+            return
+
+def report_memory(master_pid):
+    while True:
+        time.sleep(SERVER_MEMORY_REPORT_INTERVAL)
+        logger.info("Memory report\n" + format_memory_report(memory_report(master_pid)))
+
+# gunicorn server hooks, installed by gunicorn.conf.py
+
+def on_starting(arbiter):
+    import metrics
+    metrics.clear_directory()
+    preload_shared()
+
+def when_ready(arbiter):
+    if SERVER_MEMORY_REPORT_INTERVAL > 0:
+        threading.Thread(target=report_memory, args=(os.getpid(),), name='memory-report', daemon=True).start()
+
+def post_fork(arbiter, worker):
+    import metrics
+    random.seed()  # forked workers would otherwise share the master's random state
+    metrics.start_flusher()
+    from model_registry import registry
+    registry.start_idle_eviction()
+    torch = sys.modules.get('torch')
+    if torch is not None:
+        torch.set_num_threads(worker_threads(arbiter.num_workers))
+    if SERVER_MAX_WORKER_MB > 0:
+        threading.Thread(target=watch_memory, args=(worker,), name='memory-limit', daemon=True).start()
+    # Only the first worker requeues unfinished jobs; the master imported the app with JOB_RESUME off
+    if worker.age == 1 and RESUME_JOBS:
+        import app as webapp
+        webapp.job_runner.resume()
+
+def worker_exit(arbiter, worker):
+    import metrics
+    # Let background jobs finish their current files before the worker exits
+    import app as webapp
+    webapp.job_runner.shutdown(wait=True)
+    metrics.flush()
+
+def child_exit(arbiter, worker):
+    import metrics
+    metrics.mark_process_dead(worker.pid)
+
+def on_exit(arbiter):
+    import metrics
+    metrics.clear_directory()
+
+def read_pid_file():
+    try:
+        with open(SERVER_PID_FILE, 'r') as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the analyzer with gunicorn from preforked workers that share the models loaded by the master.')
+    parser.add_argument('--host', default=SERVER_HOST)
+    parser.add_argument('--port', type=int, default=SERVER_PORT)
+    parser.add_argument('--workers', '-w', type=int, default=SERVER_WORKERS, help='worker processes (default: CPU count)')
+    parser.add_argument('--memory', action='store_true', help='print the memory report of the running server and exit')
+    parser.add_argument('--json', action='store_true', help='with --memory, print the report as JSON')
+    parser.add_argument('--reload', action='store_true', help='replace the workers of the running server and exit')
+    args = parser.parse_args(argv)
+
+    if args.memory or args.reload:
+        master_pid = read_pid_file()
+        if master_pid is None or not os.path.exists(f'/proc/{master_pid}'):
+            print(f"No running server found (pid file {SERVER_PID_FILE})", file=sys.stderr)
+            return 1
+        if args.reload:
+            os.kill(master_pid, signal.SIGHUP)
+            return 0
+        rows = memory_report(master_pid)
+        print(json.dumps(rows, indent=2) if args.json else format_memory_report(rows))
+        return 0
+
+    if not hasattr(os, 'fork'):
+        print("server.py needs os.fork (Linux or macOS); run app.py on this platform", file=sys.stderr)
+        return 1
+    from gunicorn.app.wsgiapp import WSGIApplication
+    host = f'[{args.host}]' if ':' in args.host else args.host
+    sys.argv = [sys.argv[0], '--config', CONFIG_FILE, '--bind', f'{host}:{args.port}']
+    if args.workers:
+        sys.argv += ['--workers', str(args.workers)]
+    WSGIApplication(prog='server.py').run()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
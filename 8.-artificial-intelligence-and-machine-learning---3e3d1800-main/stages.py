@@ -0,0 +1,81 @@
+import os
+import time
+import logging
+import threading
+import contextvars
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+logger = logging.getLogger(__name__)
+
+# 0 runs every stage sequentially in the calling thread
+STAGE_IO_WORKERS = int(os.getenv('STAGE_IO_WORKERS', '4'))
+STAGE_CPU_WORKERS = int(os.getenv('STAGE_CPU_WORKERS', '2'))
+
+# kind is 'io' for network-bound stages and 'cpu' for compute-bound ones
+Stage = namedtuple('Stage', ['name', 'fn', 'deps', 'kind'])
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def get_executor(kind):
+    """Return this process's thread pool for ``kind`` stages, or None to run inline.
+
+    CPU stages get their own small pool so a long summary never starves the
+    I/O stages. Threads are used rather than a process pool: the summary
+    dominates every document and model inference releases the GIL, the
+    other CPU stages are short and overlap with it, and a process pool would
+    need its own copy of the models plus pickling of the text and Document
+    for every stage. Documents already run in parallel on the analysis
+    process pool (``worker_pool``). ``python -m benchmarks.stages`` measures
+    the overlap.
+    """
+    workers = STAGE_IO_WORKERS if kind == 'io' else STAGE_CPU_WORKERS
+    if workers <= 0:
+        return None
+    with _executors_lock:
+        if kind not in _executors:
+            _executors[kind] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'stage-{kind}')
+        return _executors[kind]
+
+def _timed(stage, inputs):
+    start = time.perf_counter()
+    value = stage.fn(*(inputs[dep] for dep in stage.deps))
+    return value, time.perf_counter() - start
+
+def run_stages(stages):
+    """Run a stage graph and return ``(outputs, timings)`` keyed by stage name.
+
+    Each stage's function is called with the outputs of its ``deps`` as
+    positional arguments, as soon as they are available; stages without a
+    dependency between them run concurrently. Timings are the seconds each
+    stage spent running. An exception in a stage propagates to the caller.
+    """
+    pending = list(stages)
+    names = {stage.name for stage in pending}
+    for stage in pending:
+        missing = [dep for dep in stage.deps if dep not in names]
+        if missing:
+            raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}")
+
+    outputs, timings, running = {}, {}, {}
+    while pending or running:
+        ready = [stage for stage in pending if all(dep in outputs for dep in stage.deps)]
+        for stage in ready:
+            pending.remove(stage)
+            executor = get_executor(stage.kind)
+            if executor is None:
+                outputs[stage.name], timings[stage.name] = _timed(stage, outputs)
+            else:
+                # Run in a copy of the caller's context so metrics.collect() sees the stage's events
+                context = contextvars.copy_context()
+                running[executor.submit(context.run, _timed, stage, dict(outputs))] = stage.name
+        if ready and not running:
+            continue
+        if not running:
+            raise ValueError(f"Stage graph has a dependency cycle: {[stage.name for stage in pending]}")
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            name = running.pop(future)
+            outputs[name], timings[name] = future.result()
+    return outputs, timings
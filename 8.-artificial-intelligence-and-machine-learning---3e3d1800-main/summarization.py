@@ -0,0 +1,171 @@
+import os
+import re
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Long-document mode settings
+SUMMARY_LONG_DOCUMENTS = os.getenv('SUMMARY_LONG_DOCUMENTS', 'true').lower() in ('1', 'true', 'yes')
+SUMMARY_LONG_THRESHOLD = int(os.getenv('SUMMARY_LONG_THRESHOLD', '1000'))  # characters
+SUMMARY_CHUNK_TOKENS = int(os.getenv('SUMMARY_CHUNK_TOKENS', '900'))
+SUMMARY_LATENCY_BUDGET = float(os.getenv('SUMMARY_LATENCY_BUDGET', '0'))  # seconds, 0 = unlimited
+SUMMARY_WORKERS = int(os.getenv('SUMMARY_WORKERS', '1'))
+SUMMARY_MAX_LEVELS = 4
+# Languages (ISO 639-1) the summarization model handles; other documents are not summarized
+SUMMARY_LANGUAGES = [lang.strip().lower() for lang in os.getenv('SUMMARY_LANGUAGES', 'en').split(',') if lang.strip()]
+
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+|\n{2,}')
+
+def summary_lengths(text):
+    """Return the (max_length, min_length) generation bounds for a text."""
+    max_length = min(len(text.split()) // 2, 150)
+    min_length = min(max_length // 2, 50)
+    return max_length, min_length
+
+def generate_summaries(summarizer, jobs, batch_size, deadline=None, workers=1, skipped=None):
+    """Run ``(input_text, max_length, min_length)`` jobs through the summarizer.
+
+    Jobs with the same bounds are sorted by input length and run as padded
+    batches. A job that fails, or that was not started before ``deadline``
+    (a ``time.monotonic()`` value), comes back as None; the indices of the
+    jobs not started are also added to the ``skipped`` set if one is given.
+    """
+    batch_size = max(batch_size, 1)
+    summaries = [None] * len(jobs)
+    groups = {}
+    for i, (_, max_length, min_length) in enumerate(jobs):
+        groups.setdefault((max_length, min_length), []).append(i)
+    batches = []
+    for bounds, indices in groups.items():
+        indices.sort(key=lambda i: len(jobs[i][0]))
+        for start in range(0, len(indices), batch_size):
+            batches.append((bounds, indices[start:start + batch_size]))
+
+    def run(bounds, batch):
+        if deadline is not None and time.monotonic() > deadline:
+            if skipped is not None:
+                skipped.update(batch)
+            return
+        max_length, min_length = bounds
+        inputs = [jobs[i][0] for i in batch]
+        try:
+            outputs = summarizer(inputs, max_length=max_length, min_length=min_length, do_sample=False, truncation=True, batch_size=len(inputs))
+            for i, output in zip(batch, outputs):
+                summaries[i] = output['summary_text']
+            logger.info(f"Generated {len(batch)} summaries in one batch")
+        except Exception as e:
+            logger.error(f"Batched summary generation failed, retrying individually: {str(e)}", exc_info=True)
+            for i in batch:
+                try:
+                    summaries[i] = summarizer(jobs[i][0], max_length=max_length, min_length=min_length, do_sample=False, truncation=True)[0]['summary_text']
+                except Exception as e:
+                    logger.error(f"Summary generation failed: {str(e)}", exc_info=True)
+
+    if workers > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for future in [pool.submit(run, bounds, batch) for bounds, batch in batches]:
+                future.result()
+    else:
+        for bounds, batch in batches:
+            run(bounds, batch)
+    return summaries
+
+def chunk_text(text, tokenizer, max_tokens):
+    """Split text into chunks of at most ``max_tokens`` tokens on sentence boundaries.
+
+    Sentences longer than the limit are split on word boundaries.
+    """
+    sentences = [s.strip() for s in SENTENCE_BOUNDARY.split(text) if s and s.strip()]
+    if not sentences:
+        return []
+    lengths = [len(ids) for ids in tokenizer(sentences, add_special_tokens=False)['input_ids']]
+    chunks = []
+    current = []
+    current_tokens = 0
+    for sentence, length in zip(sentences, lengths):
+        if current and current_tokens + length > max_tokens:
+            chunks.append(' '.join(current))
+            current = []
+            current_tokens = 0
+        if length > max_tokens:
+            words = sentence.split()
+            step = max(len(words) * max_tokens // length, 1)
+            chunks.extend(' '.join(words[start:start + step]) for start in range(0, len(words), step))
+            continue
+        current.append(sentence)
+        current_tokens += length
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+def summarize_long_text(text, summarizer, batch_size, latency_budget=None, workers=None, max_tokens=None):
+    """Summarize one long document; see ``summarize_long_texts``."""
+    return summarize_long_texts([text], summarizer, batch_size, latency_budget, workers, max_tokens)[0]
+
+def summarize_long_texts(texts, summarizer, batch_size, latency_budget=None, workers=None, max_tokens=None):
+    """Summarize long documents by map-reduce over sentence-bounded chunks.
+
+    Each level summarizes the chunks of every document still being reduced
+    in shared batches (across ``workers`` threads), then the joined chunk
+    summaries of each document are summarized again until they fit in a
+    single chunk. Once ``latency_budget`` seconds have passed no new batches
+    are started and each document gets the best summary produced so far. A
+    document whose chunks fail to summarize comes back as None.
+    """
+    if latency_budget is None:
+        latency_budget = SUMMARY_LATENCY_BUDGET
+    workers = workers or SUMMARY_WORKERS
+    max_tokens = max_tokens or SUMMARY_CHUNK_TOKENS
+    start = time.monotonic()
+    deadline = start + latency_budget if latency_budget > 0 else None
+
+    best = [None] * len(texts)
+    active = {i: chunks for i, text in enumerate(texts) if (chunks := chunk_text(text, summarizer.tokenizer, max_tokens))}
+    for level in range(SUMMARY_MAX_LEVELS):
+        if not active:
+            break
+        # Chunks under ten words are already shorter than any summary of them
+        jobs, owners = [], []
+        for i, chunks in active.items():
+            for chunk in chunks:
+                if len(chunk.split()) >= 10:
+                    jobs.append((chunk, *summary_lengths(chunk)))
+                    owners.append(i)
+        skipped = set()
+        outputs = generate_summaries(summarizer, jobs, batch_size, deadline, workers, skipped)
+        results = {i: [] for i in active}
+        failed = {i: 0 for i in active}
+        budget_hit = {i: False for i in active}
+        for job, (i, output) in enumerate(zip(owners, outputs)):
+            results[i].append(output)
+            if output is None:
+                if job in skipped:
+                    budget_hit[i] = True
+                else:
+                    failed[i] += 1
+
+        reduced = {}
+        for i, chunks in active.items():
+            outputs = iter(results[i])
+            summaries = [next(outputs) if len(chunk.split()) >= 10 else chunk for chunk in chunks]
+            if failed[i]:
+                logger.error(f"Summary generation failed for {failed[i]}/{len(summaries)} chunks at level {level}")
+                best[i] = None
+                continue
+            done = [s for s in summaries if s]
+            if not done:
+                logger.warning(f"Summary latency budget reached before level {level}")
+                continue
+            best[i] = ' '.join(done)
+            if budget_hit[i]:
+                logger.warning(f"Summary latency budget reached at level {level} ({len(done)}/{len(summaries)} chunks)")
+            elif len(done) > 1:
+                reduced[i] = chunk_text(best[i], summarizer.tokenizer, max_tokens)
+        active = reduced
+        if active and deadline is not None and time.monotonic() > deadline:
+            logger.warning(f"Summary latency budget reached after level {level}")
+            break
+    logger.info(f"Summarized {len(texts)} long documents in {time.monotonic() - start:.2f}s")
+    return best
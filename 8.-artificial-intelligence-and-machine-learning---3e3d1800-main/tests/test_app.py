@@ -0,0 +1,70 @@
+import io
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+TEXT = (
+    "The project plan lists a due date for every milestone. The team agreed that the due date "
+    "for the design review is Friday, and that the budget needs another look before then. "
+    "Nobody expects the date to move again, but the budget is due for approval next week."
+)
+
+class AnalyzeEndpointTest(unittest.TestCase):
+    """/analyze through the Flask test client, with stub models and no Watson."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.mkdtemp(prefix='analyzer-test-')
+        os.environ.update({
+            'ANALYZE_WORKERS': '0',
+            'MODEL_PRELOAD': '',
+            'ANALYZER_PRELOAD': '',
+            'WATSON_API_KEY': '',
+            'CACHE_ENABLED': 'false',
+            'NEAR_DUP_ENABLED': 'false',
+            'JOB_RESUME': 'false',
+            'JOB_DB_PATH': os.path.join(cls.workdir, 'jobs.sqlite3'),
+            'RESULT_DB_PATH': os.path.join(cls.workdir, 'results.sqlite3'),
+            'WATSON_BREAKER_PATH': '',
+        })
+        # The app creates its upload, output and log folders in the working directory
+        cls.cwd = os.getcwd()
+        os.chdir(cls.workdir)
+        import app
+        from model_registry import registry
+        from benchmarks.backends import stub_loader
+        registry._loader = stub_loader()
+        cls.app = app
+        cls.client = app.app.test_client()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.app.job_runner.shutdown()
+        os.chdir(cls.cwd)
+        shutil.rmtree(cls.workdir, ignore_errors=True)
+
+    def test_parse_custom_keywords_keeps_phrases(self):
+        self.assertEqual(self.app.parse_custom_keywords(' due date,budget , ,design review '), ['due date', 'budget', 'design review'])
+        self.assertEqual(self.app.parse_custom_keywords(''), [])
+
+    def test_multi_word_custom_keyword(self):
+        response = self.client.post(
+            '/analyze',
+            data={'files': (io.BytesIO(TEXT.encode('utf-8')), 'plan.txt'), 'custom_keywords': 'due date, budget, launch party'},
+            content_type='multipart/form-data'
+        )
+        self.assertEqual(response.status_code, 200)
+        [result] = response.get_json()
+        self.assertNotIn('error', result)
+        keywords = {k['text']: k['relevance'] for k in result['custom_keywords']}
+        self.assertEqual(set(keywords), {'due date', 'budget'})
+        self.assertGreater(keywords['due date'], 0)
+
+if __name__ == '__main__':
+    unittest.main()
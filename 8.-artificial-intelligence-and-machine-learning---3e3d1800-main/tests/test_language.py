@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+from language import identify_language, is_mixed
+
+ENGLISH = (
+    "The quarterly report shows that revenue grew across every region, and the team expects the new product to ship on schedule. "
+    "Customers asked for better support, so the company hired more staff and improved its training programme for new employees. "
+)
+GERMAN = (
+    "Der Bericht zeigt, dass der Umsatz in allen Regionen gestiegen ist, und das Team erwartet, dass das neue Produkt pünktlich erscheint. "
+    "Die Kunden wünschten sich besseren Service, deshalb hat die Firma mehr Personal eingestellt und die Schulung verbessert. "
+)
+
+class IdentifyLanguageTest(unittest.TestCase):
+    """Language identification of single-language and mixed documents with the real langdetect."""
+
+    def test_single_language(self):
+        self.assertEqual(identify_language(ENGLISH * 8)['language'], 'en')
+        self.assertEqual(identify_language(GERMAN * 8)['language'], 'de')
+
+    def test_mostly_english_with_german_paragraphs(self):
+        # German paragraphs in the middle used to be sampled by most windows and relabel the document
+        for english, german in ((6, 5), (8, 7), (10, 9), (8, 3)):
+            with self.subTest(english=english, german=german):
+                text = ENGLISH * (english // 2) + GERMAN * german + ENGLISH * (english - english // 2)
+                result = identify_language(text)
+                self.assertEqual(result['language'], 'en')
+                self.assertTrue(is_mixed(result))
+
+    def test_mostly_german_with_english_paragraphs(self):
+        for german, english in ((8, 3), (10, 4)):
+            with self.subTest(german=german, english=english):
+                text = GERMAN * (german // 2) + ENGLISH * english + GERMAN * (german - german // 2)
+                self.assertEqual(identify_language(text)['language'], 'de')
+
+    def test_windows_weighted_by_letters(self):
+        # A window of mostly numbers counts for little against one of prose
+        table = ' '.join(f'{i} {i * 7} {i * 13}' for i in range(60)) + ' Umsatz Regionen '
+        result = identify_language(ENGLISH * 2 + table, windows=2, window_chars=len(ENGLISH * 2))
+        self.assertEqual(result['language'], 'en')
+
+if __name__ == '__main__':
+    unittest.main()
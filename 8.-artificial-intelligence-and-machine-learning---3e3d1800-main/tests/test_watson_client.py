@@ -0,0 +1,137 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PROJECT_DIR not in sys.path:
+    sys.path.insert(0, PROJECT_DIR)
+
+import watson_client
+from watson_client import CircuitBreaker, WatsonClient, backoff_delay
+from benchmarks.backends import StubWatsonServer
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class WatsonClientTest(unittest.TestCase):
+    """Retries, backoff and the circuit breaker against the local stub Watson server."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubWatsonServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.server.failing = False
+        self.server.analyze_requests = 0
+        self.clock = FakeClock()
+        # Keep retries fast; the delays themselves are checked in test_backoff_delay_is_bounded
+        patcher = mock.patch.object(watson_client, 'WATSON_BACKOFF_BASE', 0.001)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def client(self, max_attempts=3, breaker=None):
+        breaker = breaker or CircuitBreaker(threshold=100, cooldown=30, clock=self.clock)
+        return WatsonClient('test-key', self.server.url, iam_url=self.server.url, max_attempts=max_attempts, breaker=breaker)
+
+    def test_success(self):
+        result = self.client().analyze('Quarterly revenue grew strongly across every region this quarter.')
+        self.assertIsNotNone(result)
+        self.assertIn('revenue', [k['text'] for k in result['keywords']])
+        self.assertEqual(self.server.analyze_requests, 1)
+
+    def test_retries_transient_failures_then_falls_back(self):
+        self.server.failing = True
+        self.assertIsNone(self.client(max_attempts=3).analyze('Some text to analyze.'))
+        self.assertEqual(self.server.analyze_requests, 3)
+
+    def test_recovers_on_retry(self):
+        self.server.failing = True
+        client = self.client(max_attempts=3)
+        with mock.patch.object(watson_client.time, 'sleep', side_effect=lambda seconds: setattr(self.server, 'failing', False)):
+            result = client.analyze('Some text to analyze.')
+        self.assertIsNotNone(result)
+        self.assertEqual(self.server.analyze_requests, 2)
+
+    def test_backoff_delay_is_bounded(self):
+        for attempt in range(6):
+            for _ in range(50):
+                delay = backoff_delay(attempt, base=0.5, cap=4)
+                self.assertGreaterEqual(delay, 0)
+                self.assertLessEqual(delay, min(4, 0.5 * 2 ** attempt))
+
+    def test_breaker_opens_and_rejects_without_calling(self):
+        self.server.failing = True
+        breaker = CircuitBreaker(threshold=2, cooldown=30, clock=self.clock)
+        client = self.client(max_attempts=1, breaker=breaker)
+        client.analyze('First.')
+        self.assertEqual(breaker.state, 'closed')
+        client.analyze('Second.')
+        self.assertEqual(breaker.state, 'open')
+        self.assertIsNone(client.analyze('Third.'))
+        self.assertEqual(self.server.analyze_requests, 2)
+
+    def test_open_breaker_stops_retries(self):
+        self.server.failing = True
+        breaker = CircuitBreaker(threshold=2, cooldown=30, clock=self.clock)
+        self.assertIsNone(self.client(max_attempts=5, breaker=breaker).analyze('Text.'))
+        self.assertEqual(self.server.analyze_requests, 2)
+
+    def test_half_open_trial(self):
+        self.server.failing = True
+        breaker = CircuitBreaker(threshold=1, cooldown=30, clock=self.clock)
+        client = self.client(max_attempts=1, breaker=breaker)
+        client.analyze('Opens the breaker.')
+        self.clock.now += 31
+        self.assertEqual(breaker.state, 'half-open')
+
+        # A failed trial opens the breaker for another cooldown
+        client.analyze('Failing trial.')
+        self.assertEqual(self.server.analyze_requests, 2)
+        self.assertEqual(breaker.state, 'open')
+        client.analyze('Rejected.')
+        self.assertEqual(self.server.analyze_requests, 2)
+
+        # A successful trial closes it
+        self.server.failing = False
+        self.clock.now += 31
+        self.assertIsNotNone(client.analyze('Successful trial.'))
+        self.assertEqual(breaker.state, 'closed')
+        self.assertEqual(self.server.analyze_requests, 3)
+
+    def test_only_one_trial_at_a_time(self):
+        breaker = CircuitBreaker(threshold=1, cooldown=30, clock=self.clock)
+        breaker.record_failure()
+        self.clock.now += 31
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        # A trial whose caller never reports back is given up after another cooldown
+        self.clock.now += 31
+        self.assertTrue(breaker.allow())
+
+    def test_shared_breaker(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, 'breaker.sqlite3')
+        self.server.failing = True
+        first = self.client(max_attempts=1, breaker=CircuitBreaker(threshold=2, cooldown=30, clock=self.clock, path=path))
+        second = self.client(max_attempts=1, breaker=CircuitBreaker(threshold=2, cooldown=30, clock=self.clock, path=path))
+        first.analyze('One.')
+        second.analyze('Two.')
+        self.assertIsNone(first.analyze('Three.'))
+        self.assertIsNone(second.analyze('Four.'))
+        self.assertEqual(self.server.analyze_requests, 2)
+        self.assertEqual(second.breaker.state, 'open')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import io
+import hashlib
+import tempfile
+import logging
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+# Uploads larger than this spill from memory to a temp file in the upload folder
+UPLOAD_SPOOL_MB = float(os.getenv('UPLOAD_SPOOL_MB', '4'))
+
+class UploadTooLarge(RequestEntityTooLarge):
+    """Raised while an uploaded file is still streaming in, once it passes the size limit."""
+
+    def __init__(self, filename, max_bytes):
+        super().__init__(f"File {filename} too large. Maximum size is {max_bytes // (1024 * 1024)}MB.")
+        self.filename = filename
+
+class UploadSpool:
+    """Upload buffer that hashes and size-checks data as the request body is parsed.
+
+    Data stays in memory until it passes ``spool_bytes``; only then is it
+    moved to a temp file in ``spool_dir``. ``source()`` returns the bytes or
+    that file's path, ready for ``extract_text``.
+    """
+
+    def __init__(self, filename, max_bytes, spool_bytes, spool_dir):
+        self.filename = filename
+        self.max_bytes = max_bytes
+        self.spool_bytes = spool_bytes
+        self.spool_dir = spool_dir
+        self.size = 0
+        self.path = None
+        self._digest = hashlib.sha256()
+        self._file = io.BytesIO()
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            logger.error(f"File {self.filename} too large, rejected after {self.size} bytes")
+            self.close()
+            raise UploadTooLarge(self.filename, self.max_bytes)
+        self._digest.update(data)
+        if self.path is None and self.size > self.spool_bytes:
+            self._spill()
+        return self._file.write(data)
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def flush(self):
+        self._file.flush()
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    @property
+    def sha256(self):
+        """Hex SHA-256 of everything written so far."""
+        return self._digest.hexdigest()
+
+    def source(self):
+        """Return the upload as bytes, or as a file path if it spilled to disk."""
+        if self.path is not None:
+            self._file.flush()
+            return self.path
+        return self._file.getvalue()
+
+    def save(self, path):
+        """Persist the upload at ``path``, moving the spill file instead of copying it."""
+        if self.path is not None:
+            self._file.close()
+            os.replace(self.path, path)
+            self.path = None
+        else:
+            with open(path, 'wb') as f:
+                f.write(self._file.getbuffer())
+
+    def close(self):
+        self._file.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+        self.path = None
+
+    def _spill(self):
+        fd, path = tempfile.mkstemp(dir=self.spool_dir, suffix=os.path.splitext(self.filename)[1])
+        spill = os.fdopen(fd, 'w+b')
+        spill.write(self._file.getbuffer())
+        self._file.close()
+        self._file = spill
+        self.path = path
+
+class UploadRequest(Request):
+    """Request class that parses uploaded files into UploadSpool buffers."""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return UploadSpool(
+            filename or '',
+            max_bytes=current_app.config['MAX_CONTENT_LENGTH'],
+            spool_bytes=int(UPLOAD_SPOOL_MB * 1024 * 1024),
+            spool_dir=current_app.config['UPLOAD_FOLDER']
+        )
+
+def upload_source(file):
+    """Return (source, sha256) for an uploaded FileStorage.
+
+    ``source`` is bytes, or a path when the upload spilled to disk.
+    """
+    if isinstance(file.stream, UploadSpool):
+        return file.stream.source(), file.stream.sha256
+    data = file.read()
+    return data, hashlib.sha256(data).hexdigest()
+
+def save_upload(file, path):
+    """Write an uploaded FileStorage to ``path``."""
+    if isinstance(file.stream, UploadSpool):
+        file.stream.save(path)
+    else:
+        file.save(path)
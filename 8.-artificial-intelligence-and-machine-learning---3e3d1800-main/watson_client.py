@@ -0,0 +1,246 @@
+import os
+import time
+import random
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+import metrics
+
+logger = logging.getLogger(__name__)
+
+WATSON_VERSION = '2021-08-01'
+WATSON_MAX_ATTEMPTS = int(os.getenv('WATSON_MAX_ATTEMPTS', '3'))
+WATSON_BACKOFF_BASE = float(os.getenv('WATSON_BACKOFF_BASE', '0.5'))  # seconds
+WATSON_BACKOFF_MAX = float(os.getenv('WATSON_BACKOFF_MAX', '4'))
+WATSON_TIMEOUT = float(os.getenv('WATSON_TIMEOUT', '15'))
+WATSON_POOL_SIZE = int(os.getenv('WATSON_POOL_SIZE', '10'))
+WATSON_BREAKER_THRESHOLD = int(os.getenv('WATSON_BREAKER_THRESHOLD', '3'))
+WATSON_BREAKER_COOLDOWN = float(os.getenv('WATSON_BREAKER_COOLDOWN', '30'))
+# Breaker state shared by every process on the host ('' keeps it per process)
+WATSON_BREAKER_PATH = os.getenv('WATSON_BREAKER_PATH', os.path.join('cache', 'watson_breaker.sqlite3'))
+
+BREAKER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS breaker (
+    name TEXT PRIMARY KEY,
+    failures INTEGER NOT NULL,
+    opened_at REAL,
+    trial_started REAL
+)
+"""
+
+class CircuitBreaker:
+    """Stop calling a failing service until a cooldown has passed.
+
+    After ``threshold`` consecutive failures the breaker opens and ``allow``
+    returns False. Once ``cooldown`` seconds have passed a single trial call
+    is let through (half-open); its outcome closes or re-opens the breaker.
+    A trial with no outcome after another ``cooldown`` (its caller died) is
+    given up.
+
+    Without a ``path`` the state lives in this process. Each analysis pool
+    worker and each preforked server worker would then open its own breaker,
+    so an outage could cost every process ``threshold`` calls. With a
+    ``path`` the state is kept in SQLite under ``name``, shared by all
+    processes on the host. If that database cannot be used, the breaker
+    carries on with its in-process state.
+    """
+
+    def __init__(self, threshold=None, cooldown=None, clock=None, path=None, name='watson'):
+        self.threshold = max(threshold or WATSON_BREAKER_THRESHOLD, 1)
+        self.cooldown = cooldown if cooldown is not None else WATSON_BREAKER_COOLDOWN
+        self.path = path
+        self.name = name
+        # Shared state needs timestamps every process agrees on
+        self._clock = clock or (time.time if path else time.monotonic)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._unavailable = False
+        self._failures = 0
+        self._opened_at = None
+        self._trial_started = None
+
+    def _connection(self):
+        # One connection per process (a forked child must not reuse its parent's)
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute(BREAKER_SCHEMA)
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    @contextmanager
+    def _state(self):
+        """Hold the lock with the current state loaded; with a ``path``, store it afterwards."""
+        with self._lock:
+            conn = None
+            if self.path:
+                try:
+                    conn = self._connection()
+                    conn.execute('BEGIN IMMEDIATE')
+                    row = conn.execute('SELECT failures, opened_at, trial_started FROM breaker WHERE name = ?', (self.name,)).fetchone()
+                    self._failures, self._opened_at, self._trial_started = row or (0, None, None)
+                except (sqlite3.Error, OSError) as e:
+                    if not self._unavailable:
+                        logger.warning(f"Circuit breaker state unavailable, using this process's: {str(e)}")
+                    self._unavailable = True
+                    self._rollback(conn)
+                    conn = None
+            if self._trial_started is not None and self._clock() - self._trial_started >= self.cooldown:
+                self._trial_started = None
+            try:
+                yield
+            finally:
+                if conn is not None:
+                    try:
+                        conn.execute(
+                            'INSERT OR REPLACE INTO breaker (name, failures, opened_at, trial_started) VALUES (?, ?, ?, ?)',
+                            (self.name, self._failures, self._opened_at, self._trial_started)
+                        )
+                        conn.execute('COMMIT')
+                    except sqlite3.Error as e:
+                        logger.warning(f"Could not store circuit breaker state: {str(e)}")
+                        self._rollback(conn)
+
+    @staticmethod
+    def _rollback(conn):
+        try:
+            if conn is not None and conn.in_transaction:
+                conn.execute('ROLLBACK')
+        except sqlite3.Error:
+            pass
+
+    @property
+    def state(self):
+        with self._state():
+            if self._opened_at is None:
+                return 'closed'
+            if self._trial_started is not None or self._clock() - self._opened_at >= self.cooldown:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        """Return True if a call may be attempted now."""
+        with self._state():
+            if self._opened_at is None:
+                return True
+            if self._trial_started is not None or self._clock() - self._opened_at < self.cooldown:
+                return False
+            self._trial_started = self._clock()
+            return True
+
+    def record_success(self):
+        with self._state():
+            if self._opened_at is not None:
+                logger.info("Watson circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_started = None
+
+    def record_failure(self):
+        with self._state():
+            self._failures += 1
+            if self._trial_started is not None or (self._opened_at is None and self._failures >= self.threshold):
+                logger.warning(f"Watson circuit opened for {self.cooldown:g}s after {self._failures} consecutive failures")
+                self._opened_at = self._clock()
+            self._trial_started = None
+
+def is_retryable(error):
+    """Return True for errors worth retrying: network problems, throttling and 5xx responses."""
+    import requests
+    from ibm_cloud_sdk_core import ApiException
+    if isinstance(error, ApiException):
+        return error.code in (408, 429) or error.code >= 500 or error.code == 0
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Exponential backoff with full jitter for the given zero-based attempt."""
+    base = WATSON_BACKOFF_BASE if base is None else base
+    cap = WATSON_BACKOFF_MAX if cap is None else cap
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+class WatsonClient:
+    """Watson NLU client shared by every analysis in a process.
+
+    The IAM token is fetched once and refreshed by the authenticator, HTTP
+    connections are pooled, transient failures are retried with jittered
+    exponential backoff, and a circuit breaker skips Watson entirely while it
+    is failing so callers can go straight to the local fallback.
+    """
+
+    def __init__(self, api_key, service_url, iam_url=None, max_attempts=None, breaker=None):
+        # The Watson SDK and requests are only imported once a client is configured
+        import requests
+        from requests.adapters import HTTPAdapter
+        from ibm_watson import NaturalLanguageUnderstandingV1
+        from ibm_cloud_sdk_core.authenticators import IAMAuthenticator
+        authenticator = IAMAuthenticator(api_key, url=iam_url) if iam_url else IAMAuthenticator(api_key)
+        self._nlu = NaturalLanguageUnderstandingV1(version=WATSON_VERSION, authenticator=authenticator)
+        self._nlu.set_service_url(service_url)
+        self._nlu.set_http_config({'timeout': WATSON_TIMEOUT})
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=WATSON_POOL_SIZE, pool_maxsize=WATSON_POOL_SIZE)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        self._nlu.set_http_client(session)
+        self.max_attempts = max(max_attempts or WATSON_MAX_ATTEMPTS, 1)
+        self.breaker = breaker or CircuitBreaker(path=WATSON_BREAKER_PATH, name=service_url)
+
+    def analyze(self, text, language=None):
+        """Return the Watson NLU result dict, or None when the local fallback should be used."""
+        if not self.breaker.allow():
+            logger.warning("Watson circuit open, using local analysis")
+            metrics.inc(metrics.WATSON_REJECTED)
+            metrics.inc(metrics.FALLBACKS, reason='circuit_open')
+            return None
+        from ibm_watson.natural_language_understanding_v1 import Features, KeywordsOptions, EntitiesOptions, SentimentOptions
+        for attempt in range(self.max_attempts):
+            start = time.perf_counter()
+            try:
+                result = self._nlu.analyze(
+                    text=text,
+                    features=Features(
+                        keywords=KeywordsOptions(limit=10),
+                        entities=EntitiesOptions(limit=10),
+                        sentiment=SentimentOptions()
+                    ),
+                    language=language
+                ).get_result()
+                metrics.observe(metrics.WATSON_ATTEMPT_SECONDS, time.perf_counter() - start, outcome='success')
+                self.breaker.record_success()
+                return result
+            except Exception as e:
+                logger.error(f"Watson NLU attempt {attempt + 1} failed: {str(e)}", exc_info=True)
+                if not is_retryable(e):
+                    metrics.observe(metrics.WATSON_ATTEMPT_SECONDS, time.perf_counter() - start, outcome='error')
+                    metrics.inc(metrics.FALLBACKS, reason='watson_error')
+                    # The service answered (e.g. unsupported language), so it is not down
+                    self.breaker.record_success()
+                    return None
+                metrics.observe(metrics.WATSON_ATTEMPT_SECONDS, time.perf_counter() - start, outcome='transient_error')
+                self.breaker.record_failure()
+                if attempt + 1 >= self.max_attempts or not self.breaker.allow():
+                    break
+                metrics.inc(metrics.WATSON_RETRIES)
+                time.sleep(backoff_delay(attempt))
+        logger.warning("Watson NLU unavailable, using local analysis")
+        metrics.inc(metrics.FALLBACKS, reason='watson_unavailable')
+        return None
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_watson_client():
+    """Return the process-wide Watson client, or None if credentials are missing."""
+    global _client
+    api_key = os.getenv('WATSON_API_KEY')
+    service_url = os.getenv('WATSON_SERVICE_URL')
+    if not api_key or not service_url:
+        return None
+    with _client_lock:
+        if _client is None:
+            _client = WatsonClient(api_key, service_url, iam_url=os.getenv('WATSON_IAM_URL'))
+        return _client
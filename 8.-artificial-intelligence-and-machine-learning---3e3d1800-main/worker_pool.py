@@ -0,0 +1,223 @@
+import os
+import time
+import queue
+import atexit
+import logging
+import itertools
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# 0 runs work inline in the calling thread
+ANALYZE_WORKERS = int(os.getenv('ANALYZE_WORKERS', str(os.cpu_count() or 1)))
+ANALYZE_FILE_TIMEOUT = float(os.getenv('ANALYZE_FILE_TIMEOUT', '300'))  # seconds, 0 = no limit
+WATCHDOG_INTERVAL = 0.5  # seconds between checks of running tasks against their timeout
+
+_pool = None
+_pool_lock = threading.Lock()
+_tasks = {}  # dispatch id -> task submitted and not yet settled, on any pool
+_retired = set()  # pools killed by the watchdog; their unfinished tasks are resubmitted
+_started = {}  # pool -> queue on which its workers report (dispatch id, time) as they start a task
+_dispatch_ids = itertools.count()
+_watchdog = None
+_worker_started = None  # in a worker process: its pool's start queue
+
+class _Task:
+    """One call submitted to the pool: the caller's Future plus the pool Future currently running it."""
+
+    __slots__ = ('fn', 'args', 'timeout', 'future', 'inner', 'pool', 'id', 'started_at')
+
+    def __init__(self, fn, args, timeout):
+        self.fn = fn
+        self.args = args
+        self.timeout = timeout
+        self.future = Future()
+        self.inner = None
+        self.pool = None
+        self.id = None
+        self.started_at = None
+
+def _init_worker(started):
+    global _worker_started
+    _worker_started = started
+
+def _call(dispatch_id, fn, args):
+    """Run ``fn(*args)`` in a worker, first reporting that the task has started."""
+    _worker_started.put((dispatch_id, time.time()))
+    return fn(*args)
+
+def get_pool():
+    """Return the shared process pool, creating it on first use."""
+    with _pool_lock:
+        return _current_pool()
+
+def _current_pool():
+    global _pool
+    if _pool is None:
+        started = multiprocessing.get_context().Queue()
+        _pool = ProcessPoolExecutor(max_workers=ANALYZE_WORKERS, initializer=_init_worker, initargs=(started,))
+        _started[_pool] = started
+        logger.info(f"Started analysis process pool with {ANALYZE_WORKERS} workers")
+    return _pool
+
+def shutdown_pool(wait=True):
+    """Stop the shared process pool; the next call to get_pool starts a new one."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+atexit.register(shutdown_pool, wait=False)
+
+def _forget_pool():
+    global _pool, _pool_lock, _watchdog
+    _pool, _pool_lock, _watchdog = None, threading.Lock(), None
+    _tasks.clear()
+    _retired.clear()
+    _started.clear()
+
+# A forked child cannot use its parent's pool or watchdog thread
+os.register_at_fork(after_in_child=_forget_pool)
+
+def _dispatch(task):
+    """Submit ``task`` to the current pool, starting a new pool if that one is broken."""
+    global _pool, _watchdog
+    with _pool_lock:
+        for attempt in range(2):
+            pool = _current_pool()
+            try:
+                dispatch_id = next(_dispatch_ids)
+                inner = pool.submit(_call, dispatch_id, task.fn, task.args)
+                break
+            except BrokenProcessPool:
+                if attempt:
+                    raise
+                logger.error("Analysis process pool broke; restarting it")
+                _pool = None
+                pool.shutdown(wait=False, cancel_futures=True)
+        task.inner, task.pool, task.id, task.started_at = inner, pool, dispatch_id, None
+        _tasks[dispatch_id] = task
+        if task.timeout and (_watchdog is None or not _watchdog.is_alive()):
+            _watchdog = threading.Thread(target=_watch, name='worker-pool-watchdog', daemon=True)
+            _watchdog.start()
+    inner.add_done_callback(lambda done: _settle(task, done))
+
+def _settle(task, inner):
+    """Pass the outcome of ``inner`` on to the caller, or resubmit if its pool was killed under it."""
+    global _pool
+    broken_pool = None
+    with _pool_lock:
+        if inner is not task.inner or task.future.done():
+            return  # a stale pool Future, or the task already timed out
+        killed = task.pool in _retired
+        broken = inner.cancelled() or isinstance(inner.exception(), BrokenProcessPool)
+        if not (killed and broken):
+            _tasks.pop(task.id, None)
+        if broken and not killed and _pool is task.pool:
+            # A worker died (e.g. out of memory): every task on the pool fails, the next one starts a new pool
+            logger.error("Analysis process pool broke; restarting it on next use")
+            _pool, broken_pool = None, task.pool
+    if broken_pool is not None:
+        broken_pool.shutdown(wait=False)
+    if killed and broken:
+        # Killed only because another task overran its timeout: run it again
+        _dispatch(task)
+    elif inner.cancelled():
+        task.future.set_exception(BrokenProcessPool("Analysis process pool was shut down"))
+    elif inner.exception() is not None:
+        task.future.set_exception(inner.exception())
+    else:
+        task.future.set_result(inner.result())
+
+def _watch():
+    """Fail tasks that run longer than their timeout, replacing the pool to stop them.
+
+    A task's clock starts when a worker reports starting it, so time spent
+    queued behind other files does not count. Running tasks cannot be
+    cancelled; the only way to stop one is to kill the pool's workers. The
+    other tasks of that pool, from any caller, are resubmitted to a new pool.
+    """
+    global _pool
+    while True:
+        time.sleep(WATCHDOG_INTERVAL)
+        expired = []
+        with _pool_lock:
+            for started in _started.values():
+                while True:
+                    try:
+                        dispatch_id, started_at = started.get_nowait()
+                    except queue.Empty:
+                        break
+                    if dispatch_id in _tasks:
+                        _tasks[dispatch_id].started_at = started_at
+            now = time.time()
+            for task in _tasks.values():
+                if task.timeout and task.started_at is not None and now - task.started_at > task.timeout:
+                    expired.append(task)
+            pools = {task.pool for task in expired}
+            for task in expired:
+                del _tasks[task.id]
+            if _pool in pools:
+                _pool = None
+            _retired.update(pools)
+            for pool in pools:
+                _started.pop(pool, None)
+        for task in expired:
+            logger.error(f"Worker task timed out after {task.timeout:g}s; restarting the analysis process pool")
+            task.future.set_exception(TimeoutError(f"Processing timed out after {task.timeout:g} seconds"))
+        for pool in pools:
+            # ProcessPoolExecutor has no public way to kill its workers before Python 3.14
+            for process in list((pool._processes or {}).values()):
+                process.terminate()
+            pool.shutdown(wait=False, cancel_futures=True)
+
+def submit(fn, *args, timeout=None):
+    """Schedule ``fn(*args)`` on the shared pool and return its Future.
+
+    The Future fails with ``TimeoutError`` if the call runs longer than
+    ``timeout`` seconds (default ``ANALYZE_FILE_TIMEOUT``, 0 = no limit),
+    counted from when a worker picks it up; see ``_watch``.
+    """
+    if ANALYZE_WORKERS <= 0:
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+    task = _Task(fn, args, ANALYZE_FILE_TIMEOUT if timeout is None else timeout)
+    try:
+        _dispatch(task)
+    except BrokenProcessPool as e:
+        task.future.set_exception(e)
+    return task.future
+
+def map_ordered(fn, args_list, timeout=None):
+    """Run ``fn(*args)`` for every args tuple and return outcomes in input order.
+
+    Each outcome is either the return value or the exception raised for that
+    item, so one failing file never affects the others. ``timeout`` bounds how
+    long each item may run once a worker has picked it up; an item that
+    overruns it fails with ``TimeoutError`` (see ``submit``).
+    """
+    if ANALYZE_WORKERS <= 0:
+        outcomes = []
+        for args in args_list:
+            try:
+                outcomes.append(fn(*args))
+            except Exception as e:
+                outcomes.append(e)
+        return outcomes
+
+    futures = [submit(fn, *args, timeout=timeout) for args in args_list]
+    outcomes = []
+    for future in futures:
+        try:
+            outcomes.append(future.result())
+        except Exception as e:
+            outcomes.append(e)
+    return outcomes